@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Measure the ingest throughput of the request handlers with and without journal.
+
+Requests are submitted concurrently by several client threads, like the
+threadpool of the HTTP API does, and nothing consumes the queue.
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from unittest.mock import Mock
+
+from wazo_sysconfd.plugins.request_handlers.asterisk import AsteriskCommandFactory
+from wazo_sysconfd.plugins.request_handlers.journal import RequestJournal
+from wazo_sysconfd.plugins.request_handlers.request import (
+    DuplicateRequestOptimizer,
+    RequestFactory,
+    RequestHandlers,
+    RequestQueue,
+)
+
+ARGS = {
+    'ipbx': ['dialplan reload', 'module reload res_pjsip.so'],
+    'context': [{'resource_type': 'user', 'resource_action': 'edited'}],
+}
+
+
+def run(journal, requests, clients):
+    executor = Mock()
+    request_factory = RequestFactory(AsteriskCommandFactory(executor), Mock())
+    request_queue = RequestQueue(DuplicateRequestOptimizer(executor))
+    request_handlers = RequestHandlers(request_factory, request_queue, Mock(), journal)
+
+    def client():
+        for _ in range(requests // clients):
+            request_handlers.handle_request(ARGS, {})
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return requests // clients * clients / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=40)
+    parser.add_argument('--commit-delay', type=float, default=0)
+    parser.add_argument('--directory', help='where to write the journal')
+    args = parser.parse_args()
+
+    print(f'no journal: {run(None, args.requests, args.clients):10.0f} requests/s')
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        journal = RequestJournal(
+            f'{directory}/request-handlers.journal', commit_delay=args.commit_delay
+        )
+        journal.open()
+        throughput = run(journal, args.requests, args.clients)
+    print(f'journal:    {throughput:10.0f} requests/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,9 @@
-# Copyright 2023-2025 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2023-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from __future__ import annotations
 
+import multiprocessing
 from collections.abc import Callable
 from functools import lru_cache
 from multiprocessing.managers import BaseManager, BaseProxy
@@ -13,6 +14,7 @@ from wazo_bus.publisher import BusPublisher as Publisher
 from xivo.status import Status, StatusDict
 
 from .plugins.request_handlers import dependencies as request_handlers_deps
+from .plugins.request_handlers import metrics as request_handlers_metrics
 
 
 class BusConsumer(Consumer):
@@ -24,6 +26,10 @@ class BusConsumer(Consumer):
     def from_config(cls, config: dict):
         return cls(config['uuid'], **config['bus'])
 
+    def metrics(self) -> str:
+        # the metrics recorded by the handlers of the bus manager process
+        return request_handlers_metrics.BUS_REGISTRY.expose()
+
     # Override ConsumerMixin to add headers to callbacks
     def _ConsumerMixin__dispatch(
         self, event_name: str, payload: dict, headers: dict = None
@@ -45,6 +51,7 @@ class BusConsumerProxy(BaseProxy):
     _exposed_ = (
         '__getattribute__',
         'consumer_connected',
+        'metrics',
         'provide_status',
         'subscribe',
         'unsubscribe',
@@ -53,6 +60,9 @@ class BusConsumerProxy(BaseProxy):
     def consumer_connected(self) -> bool:
         return self._callmethod('consumer_connected', ())
 
+    def metrics(self) -> str:
+        return self._callmethod('metrics', ())
+
     def provide_status(self, status: StatusDict) -> None:
         status['bus_consumer']['status'] = (
             Status.ok if self._callmethod('consumer_connected', ()) else Status.fail
@@ -88,6 +98,10 @@ class BusManager:
         self._config: dict = config
         self._manager = self._ProxyManager()
         self._manager.register('bus_consumer', self._consumer, BusConsumerProxy)
+        # Note: the requests received from the bus are forwarded to the API
+        # process, which owns the only request queue. The queue must be created
+        # before the bus process and the API worker are forked.
+        request_handlers_deps.remote_requests = multiprocessing.Queue()
 
     @lru_cache
     def _consumer(self) -> BusConsumer:
@@ -96,10 +110,6 @@ class BusManager:
     def _initialize(self, config: dict) -> None:
         _setproctitle('bus manager [sysconfd]')
 
-        # Note: must call so request_handler callback can work in bus process, since
-        # it will be configured after the bus process has already started
-        request_handlers_deps.config = config
-
         bus_consumer = self._consumer()
         bus_consumer.start()
 
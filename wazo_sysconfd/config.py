@@ -1,4 +1,4 @@
-# Copyright 2021-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2021-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import argparse
@@ -46,6 +46,95 @@ _DEFAULT_CONFIG = {
     },
     'request_handlers': {
         'synchronous': False,
+        'synchronous_timeout': 30,
+        'pipeline': 'threaded',
+        'ami': {
+            'enabled': False,
+            'host': '127.0.0.1',
+            'port': 5038,
+            'username': 'wazo-sysconfd',
+            'password': '',
+            'connect_timeout': 5,
+            'timeout': 300,
+        },
+        'debounce': {
+            'window': 0,
+            'max_latency': 5,
+        },
+        'lanes': {},
+        'journal': {
+            'enabled': False,
+            'path': '/var/lib/wazo-sysconfd/request-handlers.journal',
+            'commit_delay': 0,
+            'compact_threshold': 1000,
+        },
+        'status': {
+            'max_requests': 10000,
+            'ttl': 3600,
+            'max_commands': 100,
+        },
+        'event_stream': {
+            'buffer_size': 100,
+            'keepalive': 15,
+        },
+        'outbox': {
+            'enabled': True,
+            'max_size': 10000,
+            'batch_size': 100,
+            'spill_path': '/var/lib/wazo-sysconfd/bus-outbox.spill',
+            'retry_interval': 5,
+        },
+        'retry': {
+            'initial_delay': 0.5,
+            'max_delay': 5,
+            'jitter': 0.5,
+        },
+        'priority': {
+            'aging': 10,
+        },
+        'fairness': {
+            'default_weight': 1,
+            'weights': {},
+        },
+        'remote': {
+            'seen_max_entries': 10000,
+            'seen_ttl': 600,
+        },
+        'admission': {
+            'max_pending': 10000,
+            'max_pending_commands': 0,
+            'retry_after': 5,
+        },
+        'confgen': {
+            'warm_up': False,
+        },
+        'costs': {
+            'path': '/var/lib/wazo-sysconfd/command-costs.json',
+            'alpha': 0.3,
+            'expensive_threshold': 2,
+            'interval_factor': 1,
+        },
+        'availability': {
+            'enabled': True,
+            'socket_path': '/var/run/asterisk/asterisk.ctl',
+            'cache_ttl': 1,
+            'retry_interval': 2,
+        },
+        'watchdog': {
+            'default_timeout': 300,
+            'timeouts': {},
+            'kill_grace': 5,
+        },
+        'deduplication': {
+            'enabled': True,
+            'max_keys': 10000,
+            'key_ttl': 600,
+        },
+        'batching': {
+            'max_size': 100,
+            'concurrency': 4,
+            'interval': 0.1,
+        },
     },
     'bus': {
         'username': 'guest',
@@ -1,4 +1,4 @@
-# Copyright 2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2022-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
@@ -6,6 +6,7 @@ from http.server import BaseHTTPRequestHandler
 
 
 class HttpReqError(Exception):
-    def __init__(self, code: int, message: str = None):
+    def __init__(self, code: int, message: str = None, headers: dict = None):
         self.code = code
         self.message = message or BaseHTTPRequestHandler.responses[code][1]
+        self.headers = headers
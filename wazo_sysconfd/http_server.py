@@ -1,4 +1,4 @@
-# Copyright 2022-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2022-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
@@ -84,4 +84,5 @@ async def unicorn_exception_handler(request: Request, exc: HttpReqError):
     return JSONResponse(
         status_code=exc.code,
         content={"code": exc.code, "message": exc.message},
+        headers=exc.headers,
     )
@@ -0,0 +1,327 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import select
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_EOL = '\r\n'
+_END_OF_MESSAGE = b'\r\n\r\n'
+
+
+class AMIError(Exception):
+    pass
+
+
+class AMIOutcomeUnknown(Exception):
+    """The command was sent, but it is unknown whether Asterisk executed it.
+
+    Such a command must not be sent again, since it may have been executed.
+    """
+
+
+def format_action(action: str, action_id: str, **fields) -> bytes:
+    lines = [f'Action: {action}', f'ActionID: {action_id}']
+    lines.extend(f'{key}: {value}' for key, value in fields.items())
+    return (_EOL.join(lines) + _EOL + _EOL).encode('utf-8')
+
+
+def parse_message(raw: bytes) -> tuple[dict, list]:
+    headers = {}
+    output = []
+    for line in raw.decode('utf-8', errors='replace').split(_EOL):
+        key, sep, value = line.partition(': ')
+        if not sep:
+            continue
+        if key == 'Output':
+            output.append(value)
+        else:
+            headers[key] = value
+    return headers, output
+
+
+def command_output(headers: dict, output: list) -> str:
+    if headers.get('Response') != 'Success':
+        raise AMIError(headers.get('Message', 'command failed'))
+    # mimic the stdout of `asterisk -rx`
+    return ''.join(f'{line}\n' for line in output)
+
+
+class AMIClient:
+    """Long-lived connection to the Asterisk manager interface.
+
+    Commands are serialized on a single connection, which is opened lazily and
+    reopened when it was closed by Asterisk. A command is only sent again when
+    it could not be sent at all: once sent, a lost or late response raises
+    AMIOutcomeUnknown.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        timeout: float = 300,
+        connect_timeout: float = 5,
+    ):
+        self._host = host
+        self._port = port
+        self._username = username
+        self._password = password
+        self._timeout = timeout
+        self._connect_timeout = connect_timeout
+        self._lock = threading.Lock()
+        self._socket = None
+        self._buffer = b''
+        self._action_ids = itertools.count(1)
+
+    @classmethod
+    def from_config(cls, config: dict) -> AMIClient:
+        return cls(
+            config['host'],
+            config['port'],
+            config['username'],
+            config['password'],
+            timeout=config.get('timeout', 300),
+            connect_timeout=config.get('connect_timeout', 5),
+        )
+
+    def command(self, command: str) -> str:
+        with self._lock:
+            action_id = self._send_command(command)
+            try:
+                headers, output = self._read_response(action_id)
+            except (OSError, AMIError) as e:
+                self._close()
+                raise AMIOutcomeUnknown(f'no response to "{command}": {e}') from e
+        return command_output(headers, output)
+
+    def commands(self, commands: list, concurrency: int = 1, interval: float = 0):
+        """Pipeline the commands on the connection, return the result of each.
+
+        At most ``concurrency`` commands are sent without their response, each
+        one ``interval`` seconds after the previous. The result of a command is
+        its output, or the AMIError raised when it could not be sent, or the
+        AMIError or AMIOutcomeUnknown raised after it was sent.
+        """
+        results = [None] * len(commands)
+        # action id -> index of the command sent without its response
+        in_flight = {}
+        sent = 0
+        with self._lock:
+            try:
+                for command in commands:
+                    while len(in_flight) >= concurrency:
+                        self._read_result(in_flight, results)
+                    if sent and interval:
+                        time.sleep(interval)
+                    in_flight[self._send_command(command)] = sent
+                    sent += 1
+                while in_flight:
+                    self._read_result(in_flight, results)
+            except AMIError as e:
+                # the connection is closed: the outcome of the commands in
+                # flight is unknown, the others were not sent
+                for index in in_flight.values():
+                    results[index] = AMIOutcomeUnknown(f'no response: {e}')
+                results[sent:] = [AMIError(str(e))] * (len(commands) - sent)
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _read_result(self, in_flight, results):
+        # Reads the response of one of the commands in flight
+        try:
+            headers, output = self._read_response(*in_flight)
+        except (OSError, AMIError) as e:
+            self._close()
+            raise AMIError(str(e)) from e
+        index = in_flight.pop(headers['ActionID'])
+        try:
+            results[index] = command_output(headers, output)
+        except AMIError as e:
+            results[index] = e
+
+    def _send_command(self, command: str) -> str:
+        if self._socket is not None and self._is_closed():
+            logger.info('AMI connection closed by Asterisk, reconnecting')
+            self._close()
+        try:
+            if self._socket is None:
+                self._connect()
+            return self._send('Command', Command=command)
+        except (OSError, AMIError) as e:
+            self._close()
+            raise AMIError(str(e)) from e
+
+    def _is_closed(self) -> bool:
+        try:
+            readable, _, _ = select.select([self._socket], [], [], 0)
+            return bool(readable) and not self._socket.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def _connect(self) -> None:
+        self._socket = socket.create_connection(
+            (self._host, self._port), timeout=self._connect_timeout
+        )
+        self._buffer = b''
+        banner = self._read_until(b'\r\n')
+        logger.debug('Connected to %s', banner.decode('utf-8', errors='replace'))
+        headers, _ = self._read_response(
+            self._send(
+                'Login', Username=self._username, Secret=self._password, Events='off'
+            )
+        )
+        if headers.get('Response') != 'Success':
+            raise AMIError(headers.get('Message', 'authentication failed'))
+        self._socket.settimeout(self._timeout)
+
+    def _close(self) -> None:
+        if self._socket is None:
+            return
+        try:
+            self._socket.close()
+        except OSError:
+            pass
+        self._socket = None
+        self._buffer = b''
+
+    def _send(self, action: str, **fields) -> str:
+        action_id = str(next(self._action_ids))
+        self._socket.sendall(format_action(action, action_id, **fields))
+        return action_id
+
+    def _read_response(self, *action_ids: str) -> tuple[dict, list]:
+        while True:
+            headers, output = parse_message(self._read_until(_END_OF_MESSAGE))
+            if headers.get('ActionID') in action_ids:
+                return headers, output
+            logger.debug('Ignoring unrelated AMI message %s', headers)
+
+    def _read_until(self, separator: bytes) -> bytes:
+        while separator not in self._buffer:
+            data = self._socket.recv(4096)
+            if not data:
+                raise AMIError('connection closed by Asterisk')
+            self._buffer += data
+        message, _, self._buffer = self._buffer.partition(separator)
+        return message
+
+
+class AsyncAMIClient:
+    """asyncio counterpart of AMIClient, to be used from a single event loop."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        timeout: float = 300,
+        connect_timeout: float = 5,
+    ):
+        self._host = host
+        self._port = port
+        self._username = username
+        self._password = password
+        self._timeout = timeout
+        self._connect_timeout = connect_timeout
+        self._lock = asyncio.Lock()
+        self._reader = None
+        self._writer = None
+        self._action_ids = itertools.count(1)
+
+    @classmethod
+    def from_config(cls, config: dict) -> AsyncAMIClient:
+        return cls(
+            config['host'],
+            config['port'],
+            config['username'],
+            config['password'],
+            timeout=config.get('timeout', 300),
+            connect_timeout=config.get('connect_timeout', 5),
+        )
+
+    async def command(self, command: str) -> str:
+        async with self._lock:
+            action_id = await self._send_command(command)
+            try:
+                headers, output = await asyncio.wait_for(
+                    self._read_response(action_id), self._timeout
+                )
+            except (OSError, asyncio.TimeoutError, AMIError) as e:
+                self._close()
+                raise AMIOutcomeUnknown(f'no response to "{command}": {e}') from e
+        return command_output(headers, output)
+
+    async def close(self) -> None:
+        async with self._lock:
+            self._close()
+
+    async def _send_command(self, command: str) -> str:
+        if self._writer is not None and (
+            self._reader.at_eof() or self._writer.is_closing()
+        ):
+            logger.info('AMI connection closed by Asterisk, reconnecting')
+            self._close()
+        try:
+            if self._writer is None:
+                await asyncio.wait_for(self._connect(), self._connect_timeout)
+            return await asyncio.wait_for(
+                self._send('Command', Command=command), self._connect_timeout
+            )
+        except (OSError, asyncio.TimeoutError, AMIError) as e:
+            self._close()
+            raise AMIError(str(e)) from e
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(
+            self._host, self._port
+        )
+        banner = await self._read_until(b'\r\n')
+        logger.debug('Connected to %s', banner.decode('utf-8', errors='replace'))
+        headers, _ = await self._read_response(
+            await self._send(
+                'Login', Username=self._username, Secret=self._password, Events='off'
+            )
+        )
+        if headers.get('Response') != 'Success':
+            raise AMIError(headers.get('Message', 'authentication failed'))
+
+    def _close(self) -> None:
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._reader = self._writer = None
+
+    async def _send(self, action: str, **fields) -> str:
+        action_id = str(next(self._action_ids))
+        self._writer.write(format_action(action, action_id, **fields))
+        await self._writer.drain()
+        return action_id
+
+    async def _read_response(self, action_id: str) -> tuple[dict, list]:
+        while True:
+            headers, output = parse_message(await self._read_until(_END_OF_MESSAGE))
+            if headers.get('ActionID') == action_id:
+                return headers, output
+            logger.debug('Ignoring unrelated AMI message %s', headers)
+
+    async def _read_until(self, separator: bytes) -> bytes:
+        try:
+            data = await self._reader.readuntil(separator)
+        except asyncio.IncompleteReadError as e:
+            raise AMIError('connection closed by Asterisk') from e
+        return data[: -len(separator)]
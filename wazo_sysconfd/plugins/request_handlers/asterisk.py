@@ -1,17 +1,35 @@
-# Copyright 2015-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
 import logging
-import os
-import subprocess
 import time
 import uuid
 
 from wazo_bus.resources.sysconfd.event import AsteriskReloadProgressEvent
 
-from wazo_sysconfd.plugins.request_handlers.command import Command
+from wazo_sysconfd.plugins.request_handlers.ami import (
+    AMIClient,
+    AMIError,
+    AMIOutcomeUnknown,
+    AsyncAMIClient,
+)
+from wazo_sysconfd.plugins.request_handlers.availability import AsteriskAvailability
+from wazo_sysconfd.plugins.request_handlers.command import Command, RetryCommand
+from wazo_sysconfd.plugins.request_handlers.confgen import ConfgenInvalidator
+from wazo_sysconfd.plugins.request_handlers.cost import CommandCostModel
+from wazo_sysconfd.plugins.request_handlers.metrics import (
+    ASTERISK_COMMAND_DURATION,
+    ASTERISK_COMMAND_PARKED,
+    ASTERISK_COMMAND_RETRIES,
+)
+from wazo_sysconfd.plugins.request_handlers.watchdog import Watchdog
 
 MAX_ATTEMPTS = 10
+PJSIP_RELOAD_COMMAND = 'module reload res_pjsip.so'
 RELOAD_IN_PROGRESS_MSG = (
     'A module reload request is already in progress; please be patient\n'
 )
@@ -37,13 +55,25 @@ class AsteriskCommandFactory:
         'module reload res_hep.so',
     ]
     _ARG_COMMANDS = ['sccp reset']
+    # commands issued interactively for a single device
+    _HIGH_PRIORITY_COMMANDS = ['sccp reset']
+    # commands issued in bulk, e.g. for every device after a firmware upgrade
+    _BATCH_COMMANDS = ['sccp reset']
 
     def __init__(self, asterisk_command_executor):
         self._executor = asterisk_command_executor
 
     def new_command(self, value, request, **options):
         self._check_validity(value)
-        return Command(value, request, self._executor, value, **options)
+        command = Command(value, request, self._executor, value, **options)
+        for high_priority_command in self._HIGH_PRIORITY_COMMANDS:
+            if value.startswith(high_priority_command):
+                command.priority = 'high'
+        for batch_command in self._BATCH_COMMANDS:
+            if value.startswith(batch_command):
+                command.batch_key = batch_command
+        self._executor.prepare(command)
+        return command
 
     def _check_validity(self, value):
         if value in self._COMMANDS:
@@ -53,55 +83,358 @@ class AsteriskCommandFactory:
                 return
         raise ValueError('unauthorized command')
 
+    @classmethod
+    def command_name(cls, value):
+        """Return the command without its argument, e.g. to label metrics."""
+        for arg_cmd in cls._ARG_COMMANDS:
+            if value.startswith(arg_cmd):
+                return arg_cmd
+        return value
+
+
+_MODULE_RELOAD_COMMANDS = frozenset(
+    [
+        'dialplan reload',
+        'moh reload',
+        'iax2 reload',
+        'module reload app_queue.so',
+        'module reload features',
+        'module reload res_parking.so',
+        PJSIP_RELOAD_COMMAND,
+        'voicemail reload',
+        'module reload chan_sccp.so',
+        'module reload app_confbridge.so',
+        'module reload res_rtp_asterisk.so',
+        'module reload res_hep.so',
+    ]
+)
 
-def try_reload_command(command: str, attempt: int = 1):
-    result = subprocess.run(
-        ['asterisk', '-rx', command], capture_output=True, text=True
+# A pending command makes the pending commands it subsumes pointless
+SUBSUMED_COMMANDS = {
+    'core restart now': _MODULE_RELOAD_COMMANDS | {'core reload'},
+    'core reload': _MODULE_RELOAD_COMMANDS,
+}
+
+
+def _run_command(
+    command: str,
+    ami_client: AMIClient | None = None,
+    watchdog: Watchdog | None = None,
+) -> str | None:
+    if ami_client:
+        try:
+            return ami_client.command(command)
+        except AMIOutcomeUnknown:
+            # the command may have been executed, it must not be run again
+            raise
+        except AMIError as e:
+            logger.warning('AMI command failed (%s), falling back to asterisk -rx', e)
+
+    watchdog = watchdog or Watchdog()
+    result = watchdog.run(
+        ['asterisk', '-rx', command],
+        AsteriskCommandFactory.command_name(command),
+        capture_output=True,
+        text=True,
     )
     if result.returncode:
         logger.error('Asterisk returned non-zero status code %s', result.returncode)
-        return
+        return None
+    return result.stdout
+
+
+async def _run_command_async(
+    command: str,
+    ami_client: AsyncAMIClient | None = None,
+    watchdog: Watchdog | None = None,
+) -> str | None:
+    if ami_client:
+        try:
+            return await ami_client.command(command)
+        except AMIOutcomeUnknown:
+            raise
+        except AMIError as e:
+            logger.warning('AMI command failed (%s), falling back to asterisk -rx', e)
+
+    watchdog = watchdog or Watchdog()
+    returncode, stdout = await watchdog.run_async(
+        ['asterisk', '-rx', command], AsteriskCommandFactory.command_name(command)
+    )
+    if returncode:
+        logger.error('Asterisk returned non-zero status code %s', returncode)
+        return None
+    return stdout.decode()
+
+
+def _should_retry(output: str | None, attempt: int) -> bool:
+    if output is None:
+        return False
 
-    if result.stdout == RELOAD_IN_PROGRESS_MSG:
+    if output == RELOAD_IN_PROGRESS_MSG:
         if attempt <= MAX_ATTEMPTS:
             logger.error(
                 f"Asterisk didn't actually reload. Attempt {attempt}. Will retry."
             )
-            time.sleep(1)
-            try_reload_command(command, attempt + 1)
-        else:
-            logger.error(
-                "Asterisk didn't actually reload. Max retries exceeded. Giving up."
-            )
+            return True
+        logger.error(
+            "Asterisk didn't actually reload. Max retries exceeded. Giving up."
+        )
     else:
-        logger.debug(f'Asterisk command output: {result.stdout}')
+        logger.debug(f'Asterisk command output: {output}')
+    return False
+
+
+def try_reload_command(
+    command: str,
+    attempt: int = 1,
+    ami_client: AMIClient | None = None,
+    watchdog: Watchdog | None = None,
+) -> bool:
+    """Run the command, return False when it must be retried later."""
+    output = _run_command(command, ami_client, watchdog)
+    return not _should_retry(output, attempt)
+
+
+async def try_reload_command_async(
+    command: str,
+    attempt: int = 1,
+    ami_client: AsyncAMIClient | None = None,
+    watchdog: Watchdog | None = None,
+) -> bool:
+    output = await _run_command_async(command, ami_client, watchdog)
+    return not _should_retry(output, attempt)
 
 
 class AsteriskCommandExecutor:
-    def __init__(self, bus_publisher):
+    def __init__(
+        self,
+        bus_publisher,
+        ami_client: AMIClient | None = None,
+        confgen_warm_up: bool = False,
+        cost_model: CommandCostModel | None = None,
+        availability: AsteriskAvailability | None = None,
+        watchdog: Watchdog | None = None,
+        max_batch_size: int = 1,
+        batch_concurrency: int = 1,
+        batch_interval: float = 0,
+    ):
         self._bus_publisher = bus_publisher
-        self._null = open(os.devnull)
+        self._ami_client = ami_client
+        self._cost_model = cost_model
+        self._availability = availability
+        self._watchdog = watchdog or Watchdog()
+        self.max_batch_size = max_batch_size
+        self._batch_concurrency = batch_concurrency
+        self._batch_interval = batch_interval
+        self._pjsip_invalidator = ConfgenInvalidator(
+            'asterisk/pjsip.conf', warm_up=confgen_warm_up, watchdog=self._watchdog
+        )
+
+    def prepare(self, command: Command):
+        # invalidate the confgen cache while the new command waits to be executed
+        if self._invalidates_pjsip(command, command.data):
+            self._pjsip_invalidator.request()
 
     def execute(self, command: Command, data, *, publish: bool = True):
         command_string = data
-        request_uuids = [request.uuid for request in command.requests]
-        task_uuid = str(uuid.uuid4())
+        # a retried command is the same task, already started
+        first_attempt = command.task_uuid is None
+        self._check_availability(command, command_string)
+        if first_attempt:
+            self._check_interval(command, command_string)
+            command.task_uuid = str(uuid.uuid4())
 
-        if publish:
-            self.publish_status(task_uuid, 'starting', command_string, request_uuids)
+        if publish and first_attempt:
+            self.publish_status(command, 'starting', command_string)
 
-        if command_string == 'module reload res_pjsip.so':
-            cmd = ['wazo-confgen', 'asterisk/pjsip.conf', '--invalidate']
-            subprocess.call(cmd, stdout=self._null, close_fds=True)
+        command_name = AsteriskCommandFactory.command_name(command_string)
+        with ASTERISK_COMMAND_DURATION.time(command=command_name):
+            if first_attempt and self._invalidates_pjsip(command, command_string):
+                self._pjsip_invalidator.wait()
 
-        try_reload_command(command_string)
+            started_at = time.monotonic()
+            reloaded = try_reload_command(
+                command_string, command.attempts, self._ami_client, self._watchdog
+            )
+        if not reloaded:
+            ASTERISK_COMMAND_RETRIES.inc(command=command_name)
+            raise RetryCommand(command)
+        self._record_cost(command_name, time.monotonic() - started_at)
 
         if publish:
-            self.publish_status(task_uuid, 'completed', command_string, request_uuids)
+            self.publish_status(command, 'completed', command_string)
+
+    def execute_batch(self, commands: list[Command]) -> list:
+        """Execute the commands, at most ``batch_concurrency`` at a time.
+
+        Each command is started ``batch_interval`` seconds after the previous
+        one. With the AMI, they are pipelined on its connection. Return the
+        error of each command, None if it succeeded.
+        """
+        self._start_batch(commands)
+        values = [command.data for command in commands]
+        if not self._ami_client:
+            return self._finish_batch(commands, self._run_batch(values))
 
-    def publish_status(
-        self, task_uuid: str, status: str, command: str, request_uuids: list
-    ) -> None:
+        outputs = self._ami_client.commands(
+            values, self._batch_concurrency, self._batch_interval
+        )
+        # the commands that failed with the AMI were not executed
+        failed = [i for i, output in enumerate(outputs) if type(output) is AMIError]
+        if failed:
+            logger.warning(
+                'AMI commands failed (%s), falling back to asterisk -rx',
+                outputs[failed[0]],
+            )
+            for index, output in zip(
+                failed, self._run_batch([values[i] for i in failed])
+            ):
+                outputs[index] = output
+        return self._finish_batch(commands, outputs)
+
+    def publish_status(self, command: Command, status: str, command_string: str):
+        request_uuids = [request.uuid for request in command.requests]
         self._bus_publisher.publish(
-            AsteriskReloadProgressEvent(task_uuid, status, command, request_uuids)
+            AsteriskReloadProgressEvent(
+                command.task_uuid, status, command_string, request_uuids
+            )
+        )
+
+    def _start_batch(self, commands):
+        # the whole batch is parked while Asterisk is down
+        self._check_availability(commands[0], commands[0].data)
+        for command in commands:
+            if command.task_uuid is None:
+                command.task_uuid = str(uuid.uuid4())
+                if command.options.get('publish', True):
+                    self.publish_status(command, 'starting', command.data)
+
+    def _finish_batch(self, commands, outputs):
+        errors = []
+        for command, output in zip(commands, outputs):
+            if isinstance(output, Exception):
+                errors.append(output)
+                continue
+            logger.debug('Asterisk command output: %s', output)
+            if command.options.get('publish', True):
+                self.publish_status(command, 'completed', command.data)
+            errors.append(None)
+        return errors
+
+    def _run_batch(self, values):
+        # Returns the output of each command, or the error it raised
+        with concurrent.futures.ThreadPoolExecutor(
+            self._batch_concurrency, thread_name_prefix='asterisk-batch'
+        ) as pool:
+            futures = []
+            for value in values:
+                if futures and self._batch_interval:
+                    time.sleep(self._batch_interval)
+                futures.append(pool.submit(_run_command, value, None, self._watchdog))
+        return [future.exception() or future.result() for future in futures]
+
+    def _check_availability(self, command: Command, command_string: str):
+        # The commands are parked while Asterisk is down instead of failing.
+        # The same commands put meanwhile are merged into the parked ones, so
+        # that each is executed once when Asterisk is back.
+        if self._availability is None or self._availability.available:
+            return
+        ASTERISK_COMMAND_PARKED.inc(
+            command=AsteriskCommandFactory.command_name(command_string)
+        )
+        raise RetryCommand(command, self._availability.retry_interval)
+
+    def _check_interval(self, command: Command, command_string: str):
+        # An expensive command executed again too soon is delayed, the same
+        # commands put meanwhile being merged into it. The commands with an
+        # argument are distinct commands.
+        if self._cost_model is None:
+            return
+        if AsteriskCommandFactory.command_name(command_string) != command_string:
+            return
+        delay = self._cost_model.delay(command_string)
+        if delay > 0:
+            raise RetryCommand(command, delay)
+
+    def _record_cost(self, command_name: str, duration: float):
+        if self._cost_model is not None:
+            self._cost_model.record(command_name, duration)
+
+    @staticmethod
+    def _invalidates_pjsip(command: Command, command_string: str) -> bool:
+        return PJSIP_RELOAD_COMMAND in (command_string, *command.absorbed)
+
+
+class AsyncAsteriskCommandExecutor(AsteriskCommandExecutor):
+    def __init__(
+        self,
+        bus_publisher,
+        ami_client: AsyncAMIClient | None = None,
+        confgen_warm_up: bool = False,
+        cost_model: CommandCostModel | None = None,
+        availability: AsteriskAvailability | None = None,
+        watchdog: Watchdog | None = None,
+        max_batch_size: int = 1,
+        batch_concurrency: int = 1,
+        batch_interval: float = 0,
+    ):
+        super().__init__(
+            bus_publisher,
+            confgen_warm_up=confgen_warm_up,
+            cost_model=cost_model,
+            availability=availability,
+            watchdog=watchdog,
+            max_batch_size=max_batch_size,
+            batch_concurrency=batch_concurrency,
+            batch_interval=batch_interval,
+        )
+        self._async_ami_client = ami_client
+
+    async def execute_async(self, command: Command, data, *, publish: bool = True):
+        command_string = data
+        first_attempt = command.task_uuid is None
+        self._check_availability(command, command_string)
+        if first_attempt:
+            self._check_interval(command, command_string)
+            command.task_uuid = str(uuid.uuid4())
+
+        if publish and first_attempt:
+            self.publish_status(command, 'starting', command_string)
+
+        command_name = AsteriskCommandFactory.command_name(command_string)
+        with ASTERISK_COMMAND_DURATION.time(command=command_name):
+            if first_attempt and self._invalidates_pjsip(command, command_string):
+                await asyncio.to_thread(self._pjsip_invalidator.wait)
+
+            started_at = time.monotonic()
+            reloaded = await try_reload_command_async(
+                command_string,
+                command.attempts,
+                self._async_ami_client,
+                self._watchdog,
+            )
+        if not reloaded:
+            ASTERISK_COMMAND_RETRIES.inc(command=command_name)
+            raise RetryCommand(command)
+        self._record_cost(command_name, time.monotonic() - started_at)
+
+        if publish:
+            self.publish_status(command, 'completed', command_string)
+
+    async def execute_batch_async(self, commands: list[Command]) -> list:
+        # The AMI client serializes the commands on its connection
+        self._start_batch(commands)
+        semaphore = asyncio.Semaphore(self._batch_concurrency)
+
+        async def run(index, value):
+            await asyncio.sleep(index * self._batch_interval)
+            async with semaphore:
+                return await _run_command_async(
+                    value, self._async_ami_client, self._watchdog
+                )
+
+        outputs = await asyncio.gather(
+            *(run(index, command.data) for index, command in enumerate(commands)),
+            return_exceptions=True,
         )
+        return self._finish_batch(commands, outputs)
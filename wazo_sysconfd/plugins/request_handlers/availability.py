@@ -0,0 +1,72 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import logging
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = '/var/run/asterisk/asterisk.ctl'
+
+
+class AsteriskAvailability:
+    """Tells whether Asterisk is running, by connecting to its control socket.
+
+    The result of a probe is cached for ``cache_ttl`` seconds, so that the
+    commands executed in a row probe Asterisk once. While Asterisk is not
+    available, the commands are parked for ``retry_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        cache_ttl: float = 1,
+        retry_interval: float = 2,
+        timeout: float = 1,
+        timer=time.monotonic,
+    ):
+        self.retry_interval = retry_interval
+        self._socket_path = socket_path
+        self._cache_ttl = cache_ttl
+        self._timeout = timeout
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._available = None
+        self._probed_at = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> AsteriskAvailability:
+        return cls(
+            socket_path=config.get('socket_path', DEFAULT_SOCKET_PATH),
+            cache_ttl=config.get('cache_ttl', 1),
+            retry_interval=config.get('retry_interval', 2),
+        )
+
+    @property
+    def available(self) -> bool:
+        with self._lock:
+            now = self._timer()
+            if self._probed_at is None or now - self._probed_at >= self._cache_ttl:
+                available = self._probe()
+                if available and self._available is False:
+                    logger.info('Asterisk is available again')
+                elif not available and self._available is not False:
+                    logger.warning('Asterisk is not available, parking its commands')
+                self._available = available
+                self._probed_at = now
+            return self._available
+
+    def _probe(self) -> bool:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self._timeout)
+        try:
+            sock.connect(self._socket_path)
+        except OSError:
+            return False
+        finally:
+            sock.close()
+        return True
@@ -0,0 +1,66 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe mapping holding at most ``maxsize`` entries.
+
+    Entries expire ``ttl`` seconds after they were set, and the least recently
+    used entry is evicted when the cache is full.
+    """
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        # key -> (expires_at, value), from the least to the most recently used
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= self._timer():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            now = self._timer()
+            self._entries[key] = (now + self._ttl, value)
+            self._entries.move_to_end(key)
+            self._evict(now)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def _evict(self, now):
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+        # the recently used entries may hide expired ones, they are removed
+        # when looked up or when the cache is full
+        while self._entries:
+            expires_at, _ = next(iter(self._entries.values()))
+            if expires_at > now:
+                break
+            self._entries.popitem(last=False)
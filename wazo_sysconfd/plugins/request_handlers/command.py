@@ -1,10 +1,36 @@
-# Copyright 2015-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import asyncio
 import logging
 
+from wazo_sysconfd.plugins.request_handlers.metrics import COMMANDS
+
 logger = logging.getLogger(__name__)
 
+# from the most to the least urgent
+PRIORITIES = ('high', 'normal', 'low')
+DEFAULT_PRIORITY = 'normal'
+
+
+def priority_rank(priority):
+    if priority not in PRIORITIES:
+        priority = DEFAULT_PRIORITY
+    return PRIORITIES.index(priority)
+
+
+class RetryCommand(Exception):
+    """Raised by an executor when the command must be executed again later.
+
+    The command is retried after ``delay`` seconds if given, otherwise after
+    the backoff delay of its attempt.
+    """
+
+    def __init__(self, command, delay=None):
+        super().__init__(f'command "{command.value}" must be retried')
+        self.command = command
+        self.delay = delay
+
 
 class Command:
     def __init__(self, value, request, executor, data, **options):
@@ -13,22 +39,177 @@ class Command:
         self.data = data
         self.optimized = False
         self.requests = {request}
+        # values of the commands that were merged into this one
+        self.absorbed = set()
         self.options = options
+        self.attempts = 0
+        # identifies the execution of the command across its attempts
+        self.task_uuid = None
+        # priority inferred from the command, None if it has none
+        self.priority = None
+        # the consecutive commands with the same key are executed as a batch,
+        # None if the command is executed alone
+        self.batch_key = None
 
     def execute(self):
+        if not self._should_execute():
+            return
+
+        try:
+            self.executor.execute(self, self.data, **self.options)
+        except RetryCommand as e:
+            self._on_retry(e)
+            raise
+        except Exception as e:
+            self._on_failure(e)
+        else:
+            self._on_success()
+
+    async def execute_async(self):
+        if not self._should_execute():
+            return
+
+        try:
+            if execute_async := getattr(self.executor, 'execute_async', None):
+                await execute_async(self, self.data, **self.options)
+            else:
+                # not blocking the event loop
+                await asyncio.to_thread(
+                    self.executor.execute, self, self.data, **self.options
+                )
+        except RetryCommand as e:
+            self._on_retry(e)
+            raise
+        except Exception as e:
+            self._on_failure(e)
+        else:
+            self._on_success()
+
+    def _on_success(self):
+        COMMANDS.inc(outcome='executed')
+        self._notify('notify_command_executed')
+
+    def _on_failure(self, error):
+        logger.error(
+            'Error while executing command "%s" with %s',
+            self.value,
+            self.executor,
+            exc_info=error,
+        )
+        COMMANDS.inc(outcome='failed')
+        self._notify('notify_command_failed')
+
+    def _on_retry(self, retry):
+        if retry.delay is not None:
+            # delayed before being executed, it was not an attempt
+            logger.info(
+                'Command "%s" is delayed by %.2f seconds', self.value, retry.delay
+            )
+            self.attempts -= 1
+            COMMANDS.inc(outcome='delayed')
+        else:
+            logger.info('Command "%s" will be retried', self.value)
+            COMMANDS.inc(outcome='retried')
+
+    def _should_execute(self):
         if self.optimized:
             logger.debug(
                 'Not executing command "%s" since it has been optimized out', self.value
             )
-            return
+            COMMANDS.inc(outcome='optimized')
+            return False
 
         logger.info('Executing command "%s"', self.value)
+        self.attempts += 1
+        self._notify('notify_command_started')
+        return True
+
+    def _notify(self, method_name):
+        for request in self.requests:
+            getattr(request, method_name)(self)
+
+
+class CommandBatch:
+    """Consecutive commands of a request executed together by their executor.
+
+    The commands with the same ``batch_key`` are grouped, at most
+    ``max_batch_size`` of them as given by their executor. The executor returns
+    the error of each command of the batch, None if it succeeded. It may raise
+    RetryCommand before executing any of them, to retry the whole batch.
+    """
+
+    def __init__(self, commands):
+        self.commands = commands
+
+    @classmethod
+    def split(cls, commands):
+        batch = []
+        for command in commands:
+            if batch and not cls._extends(batch, command):
+                yield cls(batch)
+                batch = []
+            batch.append(command)
+        if batch:
+            yield cls(batch)
+
+    @staticmethod
+    def _extends(batch, command):
+        first = batch[0]
+        return (
+            command.batch_key is not None
+            and command.batch_key == first.batch_key
+            and command.executor is first.executor
+            and len(batch) < getattr(first.executor, 'max_batch_size', 1)
+        )
+
+    def execute(self):
+        if len(self.commands) == 1:
+            return self.commands[0].execute()
+
+        commands = [command for command in self.commands if command._should_execute()]
+        if not commands:
+            return
         try:
-            self.executor.execute(self, self.data, **self.options)
-        except Exception:
-            logger.exception(
-                'Error while executing command "%s" with %s', self.value, self.executor
-            )
+            errors = commands[0].executor.execute_batch(commands)
+        except RetryCommand as e:
+            self._on_retry(commands, e)
+            raise
+        except Exception as e:
+            errors = [e] * len(commands)
+        self._on_executed(commands, errors)
+
+    async def execute_async(self):
+        if len(self.commands) == 1:
+            return await self.commands[0].execute_async()
+
+        commands = [command for command in self.commands if command._should_execute()]
+        if not commands:
+            return
+        executor = commands[0].executor
+        try:
+            if execute_batch_async := getattr(executor, 'execute_batch_async', None):
+                errors = await execute_batch_async(commands)
+            else:
+                errors = await asyncio.to_thread(executor.execute_batch, commands)
+        except RetryCommand as e:
+            self._on_retry(commands, e)
+            raise
+        except Exception as e:
+            errors = [e] * len(commands)
+        self._on_executed(commands, errors)
+
+    @staticmethod
+    def _on_retry(commands, retry):
+        for command in commands:
+            command._on_retry(retry)
+
+    @staticmethod
+    def _on_executed(commands, errors):
+        for command, error in zip(commands, errors):
+            if error is None:
+                command._on_success()
+            else:
+                command._on_failure(error)
 
 
 class SimpleCommandFactory:
@@ -0,0 +1,128 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import logging
+import subprocess
+import threading
+import time
+
+from wazo_sysconfd.plugins.request_handlers.metrics import CONFGEN_WARM_UP_SAVED
+from wazo_sysconfd.plugins.request_handlers.watchdog import Watchdog
+
+logger = logging.getLogger(__name__)
+
+
+class ConfgenInvalidator:
+    """Invalidates the confgen cache of a file in a background thread.
+
+    An invalidation is requested when a command that needs it is accepted, and
+    awaited when the command is executed. The requests received while an
+    invalidation runs are collapsed into a single invalidation run after it,
+    since the running one may have read the configuration before they were
+    made.
+
+    With ``warm_up``, the file is generated again after the invalidation, so
+    that it is already in the cache when Asterisk reads it while reloading.
+    """
+
+    def __init__(
+        self, filename: str, warm_up: bool = False, watchdog: Watchdog | None = None
+    ):
+        self._filename = filename
+        self._warm_up = warm_up
+        self._watchdog = watchdog or Watchdog()
+        # (started_at, finished_at) of the last warm-up
+        self._last_warm_up = None
+        self._condition = threading.Condition()
+        # generations of the invalidations requested, covered by the last
+        # finished invalidation, and awaited by the last execution
+        self._requested = 0
+        self._done = 0
+        self._awaited = 0
+        self._running = False
+
+    def request(self) -> None:
+        with self._condition:
+            self._requested += 1
+            if self._running:
+                return
+            self._running = True
+        t = threading.Thread(
+            target=self._run, name=f'confgen-invalidate-{self._filename}'
+        )
+        t.daemon = True
+        t.start()
+
+    def wait(self) -> None:
+        """Wait until the cache is invalidated after the last request.
+
+        The cache is invalidated now when nothing was requested since the last
+        execution, e.g. for a command absorbed by another one.
+        """
+        with self._condition:
+            if self._requested == self._awaited:
+                self._requested += 1
+                start = not self._running
+                self._running = True
+            else:
+                start = False
+            generation = self._requested
+        waited_at = time.monotonic()
+        if start:
+            self._run()
+        with self._condition:
+            self._condition.wait_for(lambda: self._done >= generation)
+            self._awaited = max(self._awaited, generation)
+            last_warm_up = self._last_warm_up
+        if self._warm_up and last_warm_up:
+            self._report_warm_up(waited_at, *last_warm_up)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if self._done >= self._requested:
+                    self._running = False
+                    return
+                generation = self._requested
+            self._invalidate()
+            warm_up = self._generate() if self._warm_up else None
+            with self._condition:
+                self._done = generation
+                self._last_warm_up = warm_up or self._last_warm_up
+                self._condition.notify_all()
+
+    def _report_warm_up(self, waited_at, started_at, finished_at):
+        # the warm-up saved the time it ran before the execution waited for it
+        waited = max(0, finished_at - max(waited_at, started_at))
+        saved = finished_at - started_at - waited
+        CONFGEN_WARM_UP_SAVED.observe(saved, filename=self._filename)
+        logger.info('Warming up %s saved %.3f seconds', self._filename, saved)
+
+    def _generate(self):
+        # Returns (started_at, finished_at) of the generation
+        started_at = time.monotonic()
+        try:
+            self._watchdog.call(
+                ['wazo-confgen', self._filename],
+                'wazo-confgen',
+                stdout=subprocess.DEVNULL,
+                close_fds=True,
+            )
+        except Exception:
+            logger.exception(
+                'Failed to warm up the confgen cache of %s', self._filename
+            )
+        return started_at, time.monotonic()
+
+    def _invalidate(self) -> None:
+        cmd = ['wazo-confgen', self._filename, '--invalidate']
+        try:
+            self._watchdog.call(
+                cmd, 'wazo-confgen', stdout=subprocess.DEVNULL, close_fds=True
+            )
+        except Exception:
+            logger.exception(
+                'Failed to invalidate the confgen cache of %s', self._filename
+            )
@@ -0,0 +1,120 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CommandCostModel:
+    """Learned duration of the commands, to space out the expensive ones.
+
+    The cost of a command is the exponentially weighted moving average of its
+    durations, with the weight ``alpha`` given to the last one. A command
+    costing at least ``expensive_threshold`` seconds is not executed again
+    before ``interval_factor`` times its cost has elapsed since its previous
+    execution ended. The costs are saved to ``path`` to survive restarts.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        alpha: float = 0.3,
+        expensive_threshold: float = 2,
+        interval_factor: float = 1,
+        timer=time.monotonic,
+    ):
+        self._path = path
+        self._alpha = alpha
+        self._expensive_threshold = expensive_threshold
+        self._interval_factor = interval_factor
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # command -> {'cost': seconds, 'count': executions}
+        self._costs = {}
+        # command -> when its last execution ended
+        self._executed_at = {}
+
+    @classmethod
+    def from_config(cls, config: dict) -> CommandCostModel:
+        model = cls(
+            path=config.get('path'),
+            alpha=config.get('alpha', 0.3),
+            expensive_threshold=config.get('expensive_threshold', 2),
+            interval_factor=config.get('interval_factor', 1),
+        )
+        model.load()
+        return model
+
+    def load(self) -> None:
+        if not self._path:
+            return
+        try:
+            with open(self._path) as f:
+                costs = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning('Ignoring the command costs of %s: %s', self._path, e)
+            return
+        with self._lock:
+            self._costs = {
+                command: {'cost': float(cost['cost']), 'count': int(cost['count'])}
+                for command, cost in costs.items()
+            }
+
+    def record(self, command: str, duration: float) -> None:
+        with self._lock:
+            cost = self._costs.get(command)
+            if cost is None:
+                cost = self._costs[command] = {'cost': duration, 'count': 0}
+            else:
+                cost['cost'] += self._alpha * (duration - cost['cost'])
+            cost['count'] += 1
+            self._executed_at[command] = self._timer()
+            costs = json.dumps(self._costs)
+        self._save(costs)
+
+    def min_interval(self, command: str) -> float:
+        with self._lock:
+            return self._min_interval(command)
+
+    def delay(self, command: str) -> float:
+        """Return how long the command must wait before being executed again."""
+        with self._lock:
+            executed_at = self._executed_at.get(command)
+            if executed_at is None:
+                return 0
+            return max(0, executed_at + self._min_interval(command) - self._timer())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                command: {**cost, 'min_interval': self._min_interval(command)}
+                for command, cost in self._costs.items()
+            }
+
+    def _min_interval(self, command):
+        cost = self._costs.get(command)
+        if cost is None or cost['cost'] < self._expensive_threshold:
+            return 0
+        return self._interval_factor * cost['cost']
+
+    def _save(self, costs: str) -> None:
+        if not self._path:
+            return
+        tmp_path = f'{self._path}.tmp'
+        try:
+            with self._save_lock:
+                with open(tmp_path, 'w') as f:
+                    f.write(costs)
+                os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning('Failed to save the command costs to %s: %s', self._path, e)
@@ -1,11 +1,20 @@
-# Copyright 2021-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2021-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import logging
 from functools import lru_cache
 
 from wazo_sysconfd.plugins.request_handlers.request import RequestHandlersProxy
 
+logger = logging.getLogger(__name__)
+
 config = None
+bus_consumer = None
+
+# Queue of the requests received from the bus in the bus manager process, to be
+# executed by the request handlers of the API process. It is created before the
+# processes are forked, so that both of them share it.
+remote_requests = None
 
 
 @lru_cache
@@ -13,4 +22,26 @@ def get_request_handlers_proxy():
     request_handlers_proxy = RequestHandlersProxy()
     request_handlers_proxy.safe_init_from_config(config)
     request_handlers_proxy.at_start(None)
+    if remote_requests is not None:
+        request_handlers_proxy.consume_remote_requests(remote_requests)
     return request_handlers_proxy
+
+
+def forward_request(args, options):
+    remote_requests.put((args, options))
+
+
+def provide_metrics():
+    request_handlers_metrics = get_request_handlers_proxy().metrics()
+    if bus_consumer is None:
+        return request_handlers_metrics
+    try:
+        bus_metrics = bus_consumer.metrics()
+    except Exception:
+        logger.exception('Failed to get the metrics of the bus manager process')
+        bus_metrics = ''
+    return request_handlers_metrics + bus_metrics
+
+
+def provide_status(status):
+    get_request_handlers_proxy().provide_status(status)
@@ -0,0 +1,145 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class EventStreamSubscription:
+    """Events matching the filters of a subscriber, buffered for its stream.
+
+    A subscriber that lets its buffer fill up is disconnected instead of
+    buffering more events.
+    """
+
+    def __init__(self, loop, buffer_size, request_uuid=None, resource_type=None):
+        self._loop = loop
+        self._queue = asyncio.Queue(buffer_size)
+        self._request_uuid = request_uuid
+        self._resource_type = resource_type
+        self._closed = asyncio.Event()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def matches(self, payload: dict) -> bool:
+        if self._request_uuid is not None:
+            request_uuids = payload.get('request_uuids') or [payload.get('uuid')]
+            if self._request_uuid not in request_uuids:
+                return False
+        if self._resource_type is not None:
+            # only the request handlers progress events have a context
+            resource_types = {
+                item.get('resource_type') for item in payload.get('context') or []
+            }
+            if self._resource_type not in resource_types:
+                return False
+        return True
+
+    def put_threadsafe(self, name: str, payload: dict) -> None:
+        self._loop.call_soon_threadsafe(self._put, name, payload)
+
+    def _put(self, name: str, payload: dict) -> None:
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait((name, payload))
+        except asyncio.QueueFull:
+            logger.warning('Disconnecting slow event stream subscriber')
+            self._closed.set()
+
+    async def wait_closed(self) -> None:
+        await self._closed.wait()
+
+    async def get(self, timeout: float) -> tuple[str, dict] | None:
+        """Return the next event, or None when no event came within timeout.
+
+        None is also returned as soon as the subscription is closed.
+        """
+        get = asyncio.ensure_future(self._queue.get())
+        closed = asyncio.ensure_future(self._closed.wait())
+        done, pending = await asyncio.wait(
+            {get, closed}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        for future in pending:
+            future.cancel()
+        return get.result() if get in done else None
+
+
+class EventStream:
+    """Fan out the published progress events to the HTTP stream subscribers."""
+
+    def __init__(self, buffer_size: int = 100, keepalive: float = 15):
+        self._buffer_size = buffer_size
+        self._keepalive = keepalive
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    @classmethod
+    def from_config(cls, config: dict) -> EventStream:
+        return cls(
+            buffer_size=config.get('buffer_size', 100),
+            keepalive=config.get('keepalive', 15),
+        )
+
+    def publish(self, event) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        if not subscriptions:
+            return
+
+        payload = event.marshal()
+        for subscription in subscriptions:
+            if subscription.matches(payload):
+                subscription.put_threadsafe(event.name, payload)
+
+    def subscribe(self, **filters) -> EventStreamSubscription:
+        subscription = EventStreamSubscription(
+            asyncio.get_running_loop(), self._buffer_size, **filters
+        )
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventStreamSubscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    async def stream(self, subscription=None, **filters):
+        """Yield the matching events formatted as server-sent events."""
+        subscription = subscription or self.subscribe(**filters)
+        try:
+            while not subscription.closed:
+                event = await subscription.get(self._keepalive)
+                if subscription.closed:
+                    return
+                if event is None:
+                    # let the client (and proxies) know the connection is alive
+                    yield ': keepalive\n\n'
+                    continue
+                name, payload = event
+                yield f'event: {name}\ndata: {json.dumps(payload)}\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+
+class EventStreamPublisher:
+    """Bus publisher that also publishes the events to the HTTP event stream."""
+
+    def __init__(self, bus_publisher, event_stream: EventStream):
+        self._bus_publisher = bus_publisher
+        self._event_stream = event_stream
+
+    def publish(self, event, *args, **kwargs):
+        self._bus_publisher.publish(event, *args, **kwargs)
+        try:
+            self._event_stream.publish(event)
+        except Exception:
+            logger.exception('Failed to publish %s to the event stream', event.name)
@@ -1,17 +1,33 @@
-# Copyright 2023-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2023-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import logging
+
 from wazo_bus.resources.sysconfd.event import AsteriskReloadProgressEvent
 
 from wazo_sysconfd.bus import BusConsumerProxy
 
-from .dependencies import get_request_handlers_proxy
+from .cache import TTLCache
+from .dependencies import forward_request
+from .metrics import REMOTE_RELOADS
+
+logger = logging.getLogger(__name__)
 
 
 class EventHandler:
-    def __init__(self, wazo_uuid: str, bus_consumer: BusConsumerProxy):
+    def __init__(
+        self,
+        wazo_uuid: str,
+        bus_consumer: BusConsumerProxy,
+        seen_max_entries: int = 10000,
+        seen_ttl: float = 600,
+    ):
         self.uuid = wazo_uuid
         self.bus = bus_consumer
+        self._seen_max_entries = seen_max_entries
+        self._seen_ttl = seen_ttl
+        # created in the bus manager process, where the events are handled
+        self._seen = None
 
     def subscribe(self):
         self.bus.subscribe(AsteriskReloadProgressEvent.name, self._on_asterisk_reload)
@@ -22,9 +38,36 @@ class EventHandler:
 
         # only execute handlers if event originated from another WAZO
         if (origin_uuid := headers.get('origin_uuid')) and origin_uuid != self.uuid:
+            if self._already_seen(event):
+                logger.debug('Ignoring already executed remote reload %s', event)
+                REMOTE_RELOADS.inc(result='ignored')
+                return
+
             payload = {
                 'ipbx': [event['command']],
                 'request_uuids': event['request_uuids'],
             }
-            request_handlers_proxy = get_request_handlers_proxy()
-            request_handlers_proxy.handle_request(payload, {'publish': False})
+            # executed by the request handlers of the API process, so that the
+            # remote requests are optimized and ordered with the local ones
+            forward_request(payload, {'publish': False})
+            REMOTE_RELOADS.inc(result='forwarded')
+
+    def _already_seen(self, event: dict) -> bool:
+        # The same reload may be received several times: redelivered, or
+        # published by several Wazo for the same requests. It is seen when its
+        # task is, or when its command was executed for all of its requests.
+        if self._seen is None:
+            self._seen = TTLCache(self._seen_max_entries, self._seen_ttl)
+
+        task_key = ('task', event.get('uuid'))
+        request_keys = [
+            ('request', event['command'], request_uuid)
+            for request_uuid in event.get('request_uuids') or []
+        ]
+        seen = (event.get('uuid') is not None and task_key in self._seen) or (
+            bool(request_keys) and all(key in self._seen for key in request_keys)
+        )
+        for key in [task_key, *request_keys]:
+            if key[1] is not None:
+                self._seen.set(key, True)
+        return seen
@@ -1,19 +1,108 @@
-# Copyright 2022-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2022-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from fastapi import APIRouter, Body, Depends
+import anyio
+from fastapi import APIRouter, Body, Depends, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
+from wazo_sysconfd.exceptions import HttpReqError
+from wazo_sysconfd.plugins.request_handlers import metrics
 from wazo_sysconfd.plugins.request_handlers.dependencies import (
     get_request_handlers_proxy,
+    provide_metrics,
 )
 from wazo_sysconfd.plugins.request_handlers.request import RequestHandlersProxy
 
 router = APIRouter()
 
 
+class EventStreamResponse(StreamingResponse):
+    """Stream of server-sent events, closed when its subscriber is disconnected.
+
+    A client that stopped reading blocks the stream while sending, so the
+    response is cancelled instead of waiting for the stream to notice.
+    """
+
+    def __init__(self, subscription, content, **kwargs):
+        super().__init__(content, media_type='text/event-stream', **kwargs)
+        self._subscription = subscription
+
+    async def __call__(self, scope, receive, send):
+        try:
+            async with anyio.create_task_group() as task_group:
+
+                async def close_when_disconnected():
+                    await self._subscription.wait_closed()
+                    task_group.cancel_scope.cancel()
+
+                task_group.start_soon(close_when_disconnected)
+                await super().__call__(scope, receive, send)
+                task_group.cancel_scope.cancel()
+        finally:
+            await self.body_iterator.aclose()
+
+
+@router.on_event('startup')
+async def start_request_handlers():
+    # create the request handlers from the event loop, so that the asyncio
+    # pipeline can run in it
+    get_request_handlers_proxy()
+
+
 @router.post('/exec_request_handlers', status_code=200)
-def exec_request_handlers(
+async def exec_request_handlers(
     body: dict = Body(default={}),
+    timeout: float = None,
+    idempotency_key: str = Header(default=None),
+    request_handlers_proxy: RequestHandlersProxy = Depends(get_request_handlers_proxy),
+):
+    return await request_handlers_proxy.handle_request_async(
+        body, None, timeout, idempotency_key
+    )
+
+
+@router.post('/exec_request_handlers/batch', status_code=200)
+async def exec_request_handlers_batch(
+    body: list[dict] = Body(default=[]),
+    timeout: float = None,
+    request_handlers_proxy: RequestHandlersProxy = Depends(get_request_handlers_proxy),
+):
+    return await request_handlers_proxy.handle_requests_async(body, None, timeout)
+
+
+@router.get('/exec_request_handlers/events', status_code=200)
+async def stream_request_handlers_events(
+    request_uuid: str = None,
+    resource_type: str = None,
+    request_handlers_proxy: RequestHandlersProxy = Depends(get_request_handlers_proxy),
+):
+    # subscribe from the event loop, where the events are delivered
+    subscription = request_handlers_proxy.subscribe_events(request_uuid, resource_type)
+    return EventStreamResponse(
+        subscription,
+        request_handlers_proxy.stream_events(subscription),
+        headers={'Cache-Control': 'no-cache'},
+    )
+
+
+@router.get('/metrics', status_code=200, response_class=PlainTextResponse)
+def get_metrics(content: str = Depends(provide_metrics)):
+    return PlainTextResponse(content, media_type=metrics.CONTENT_TYPE)
+
+
+@router.get('/exec_request_handlers/costs', status_code=200)
+def get_request_handlers_costs(
+    request_handlers_proxy: RequestHandlersProxy = Depends(get_request_handlers_proxy),
+):
+    return request_handlers_proxy.get_command_costs()
+
+
+@router.get('/exec_request_handlers/{request_uuid}', status_code=200)
+def get_request_handlers_status(
+    request_uuid: str,
     request_handlers_proxy: RequestHandlersProxy = Depends(get_request_handlers_proxy),
 ):
-    return request_handlers_proxy.handle_request(body, None)
+    status = request_handlers_proxy.get_request_status(request_uuid)
+    if status is None:
+        raise HttpReqError(404)
+    return status
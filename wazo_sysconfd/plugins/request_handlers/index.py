@@ -0,0 +1,115 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+
+from wazo_sysconfd.plugins.request_handlers.cache import TTLCache
+from wazo_sysconfd.plugins.request_handlers.metrics import REQUESTS_DEDUPLICATED
+
+
+class _IndexEntry:
+    # Observes its request, to remove it from the index once started
+    def __init__(self, index, request, digest):
+        self.index = index
+        self.request = request
+        self.digest = digest
+        self.executed = False
+
+    def on_command_optimized(self, request, command, actual_command):
+        pass
+
+    def on_command_started(self, request, command):
+        self.index._started(self)
+
+    def on_command_executed(self, request, command):
+        pass
+
+    def on_command_failed(self, request, command):
+        pass
+
+    def on_request_executed(self, request):
+        self.index._executed(self)
+
+
+class RequestIndex:
+    """Index of the requests by the digest of their body and by idempotency key.
+
+    A request whose body is identical to the body of a request not started yet
+    is a duplicate of it, since executing the latter is enough. A request with
+    the idempotency key of a request received less than ``key_ttl`` seconds ago
+    is a duplicate of it, executed or not. At most ``max_keys`` idempotency
+    keys are remembered.
+    """
+
+    def __init__(self, max_keys: int = 10000, key_ttl: float = 600):
+        self._lock = threading.Lock()
+        # digest of the body -> entry of the request not started yet
+        self._pending = {}
+        # idempotency key -> entry of the request
+        self._keys = TTLCache(max_keys, key_ttl)
+
+    @classmethod
+    def from_config(cls, config: dict) -> RequestIndex:
+        return cls(
+            max_keys=config.get('max_keys', 10000),
+            key_ttl=config.get('key_ttl', 600),
+        )
+
+    @staticmethod
+    def digest(args, options) -> str:
+        body = json.dumps([args, options], sort_keys=True, default=str)
+        return hashlib.sha256(body.encode()).hexdigest()
+
+    def join(self, digest: str, idempotency_key=None, observers=()) -> str | None:
+        """Return the uuid of the request the new one is a duplicate of.
+
+        The observers of the new request observe the existing one instead, and
+        are notified at once if it is already executed. None is returned when
+        the new request is not a duplicate.
+        """
+        with self._lock:
+            entry = self._keys.get(idempotency_key) if idempotency_key else None
+            by = 'idempotency_key'
+            if entry is None:
+                entry = self._pending.get(digest)
+                by = 'body'
+                if entry is None:
+                    return None
+                if idempotency_key:
+                    self._keys.set(idempotency_key, entry)
+            executed = entry.executed
+            if not executed:
+                # they follow the entry in the observers of the request, so
+                # they are notified when it is executed
+                entry.request.observers.extend(observers)
+        if executed:
+            for observer in observers:
+                observer.on_request_executed(entry.request)
+        REQUESTS_DEDUPLICATED.inc(by=by)
+        return entry.request.uuid
+
+    def add(self, request, digest: str, idempotency_key=None) -> None:
+        if not request.commands:
+            # executed without starting any command
+            return
+        entry = _IndexEntry(self, request, digest)
+        request.observers.append(entry)
+        with self._lock:
+            self._pending[digest] = entry
+            if idempotency_key:
+                self._keys.set(idempotency_key, entry)
+
+    def _started(self, entry):
+        with self._lock:
+            if self._pending.get(entry.digest) is entry:
+                del self._pending[entry.digest]
+
+    def _executed(self, entry):
+        with self._lock:
+            entry.executed = True
+            if self._pending.get(entry.digest) is entry:
+                del self._pending[entry.digest]
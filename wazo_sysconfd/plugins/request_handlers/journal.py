@@ -0,0 +1,171 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class RequestJournal:
+    """Append-only journal of the accepted requests and of their progress.
+
+    Records are written by a single writer thread: every record appended while
+    the previous batch was being written is committed with a single fsync.
+    """
+
+    def __init__(self, path: str, commit_delay: float = 0, compact_threshold=1000):
+        self._path = path
+        self._commit_delay = commit_delay
+        self._compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._records = []
+        # uuid -> accepted record of the requests that are not completed yet
+        self._accepted = {}
+        self._completed_count = 0
+        self._file = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> RequestJournal:
+        return cls(
+            config['path'],
+            commit_delay=config.get('commit_delay', 0),
+            compact_threshold=config.get('compact_threshold', 1000),
+        )
+
+    def open(self) -> list[dict]:
+        """Open the journal and return the accepted records of unfinished requests.
+
+        The commands that were already executed are removed from the returned
+        records, and the journal is compacted to only contain them.
+        """
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        try:
+            with open(self._path) as f:
+                self._replay(f)
+        except FileNotFoundError:
+            pass
+
+        self._compact()
+        thread = threading.Thread(target=self._run, name='request-journal')
+        thread.daemon = True
+        thread.start()
+        return list(self._accepted.values())
+
+    def request_accepted(self, request_uuid: str, args: dict, options: dict) -> Future:
+        record = {
+            'type': 'accepted',
+            'uuid': request_uuid,
+            'args': args,
+            'options': options,
+        }
+        with self._lock:
+            self._apply(record)
+            return self._append(record)
+
+    def command_executed(self, request_uuid: str, values: list) -> None:
+        record = {'type': 'command', 'uuid': request_uuid, 'commands': values}
+        with self._lock:
+            self._apply(record)
+            self._append(record)
+
+    def request_executed(self, request_uuid: str) -> None:
+        record = {'type': 'completed', 'uuid': request_uuid}
+        with self._lock:
+            self._apply(record)
+            self._append(record)
+
+    def _append(self, record: dict) -> Future:
+        future = Future()
+        self._records.append((record, future))
+        self._condition.notify()
+        return future
+
+    def _apply(self, record: dict) -> None:
+        request_uuid = record['uuid']
+        if record['type'] == 'accepted':
+            self._accepted[request_uuid] = dict(record)
+        elif record['type'] == 'command':
+            if accepted := self._accepted.get(request_uuid):
+                accepted['args'] = _without_commands(accepted['args'], record)
+        elif record['type'] == 'completed':
+            if self._accepted.pop(request_uuid, None):
+                self._completed_count += 1
+
+    def _replay(self, f) -> None:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the last record may be truncated by a crash
+                logger.warning('Ignoring corrupted request journal record %r', line)
+                continue
+            self._apply(record)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._records:
+                    self._condition.wait()
+            if self._commit_delay:
+                time.sleep(self._commit_delay)
+            with self._lock:
+                records, self._records = self._records, []
+                should_compact = self._completed_count >= self._compact_threshold
+
+            try:
+                self._write(record for record, _ in records)
+                if should_compact:
+                    self._compact()
+            except Exception as e:
+                logger.exception('Failed to write the request journal')
+                for _, future in records:
+                    future.set_exception(e)
+            else:
+                for _, future in records:
+                    future.set_result(None)
+
+    def _write(self, records) -> None:
+        for record in records:
+            self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _compact(self) -> None:
+        with self._lock:
+            accepted = list(self._accepted.values())
+            self._completed_count = 0
+
+        tmp_path = f'{self._path}.tmp'
+        with open(tmp_path, 'w') as f:
+            for record in accepted:
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path)
+
+        if self._file:
+            self._file.close()
+        self._file = open(self._path, 'a')
+        logger.debug('Compacted request journal to %s records', len(accepted))
+
+
+def _without_commands(args: dict, record: dict) -> dict:
+    executed = set(record['commands'])
+
+    def is_executed(value):
+        return isinstance(value, str) and value in executed
+
+    return {
+        key: [v for v in value if not is_executed(v)]
+        if isinstance(value, list)
+        else value
+        for key, value in args.items()
+    }
@@ -0,0 +1,200 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Metrics of the request handlers, in the Prometheus text exposition format.
+
+The metrics recorded while the requests are executed are kept here. The
+metrics already counted by the request queue are read when exposed instead.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import math
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+        for value in labels.values()
+    )
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+    return f'{{{pairs}}}'
+
+
+def expose_family(name: str, type_: str, help_: str, samples) -> str:
+    """Return a metric family, given its samples as (suffix, labels, value)."""
+    lines = [f'# HELP {name} {help_}', f'# TYPE {name} {type_}']
+    for suffix, labels, value in samples:
+        lines.append(f'{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def expose(self) -> str:
+        return ''.join(metric.expose() for metric in self._metrics)
+
+
+class _Metric:
+    type_ = None
+
+    def __init__(self, name, help_, labelnames=(), registry=None):
+        self.name = name
+        self.help = help_
+        self._labelnames = tuple(labelnames)
+        # the lock is only held to update the values of the metric
+        self._lock = threading.Lock()
+        self._values = {}
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self._labelnames)
+
+    def _labels(self, key, **extra):
+        return {**dict(zip(self._labelnames, key)), **extra}
+
+    def expose(self) -> str:
+        with self._lock:
+            samples = list(self._samples())
+        return expose_family(self.name, self.type_, self.help, samples)
+
+    def _samples(self):
+        raise NotImplementedError()
+
+
+class Counter(_Metric):
+    type_ = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield '', self._labels(key), value
+
+
+class Histogram(_Metric):
+    type_ = 'histogram'
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # the last count is of the observations above the last bucket
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self._buckets) + 1), 0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels)) or ([], 0)
+            return sum(counts)
+
+    def _samples(self):
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self._buckets, math.inf), counts):
+                cumulative += count
+                yield '_bucket', self._labels(key, le=_format_value(bound)), cumulative
+            yield '_sum', self._labels(key), total
+            yield '_count', self._labels(key), cumulative
+
+
+# metrics of the API process
+REGISTRY = Registry()
+# metrics of the bus manager process, exposed by the API process
+BUS_REGISTRY = Registry()
+
+COMMANDS = Counter(
+    'wazo_sysconfd_commands_total',
+    'Commands executed, by outcome',
+    ('outcome',),
+    registry=REGISTRY,
+)
+REQUESTS_DEDUPLICATED = Counter(
+    'wazo_sysconfd_requests_deduplicated_total',
+    'Requests answered with the uuid of an identical request, by what matched',
+    ('by',),
+    registry=REGISTRY,
+)
+REQUEST_WAIT = Histogram(
+    'wazo_sysconfd_request_wait_seconds',
+    'Time between the queuing of a request and the start of its execution',
+    ('lane', 'priority'),
+    registry=REGISTRY,
+)
+ASTERISK_COMMAND_DURATION = Histogram(
+    'wazo_sysconfd_asterisk_command_duration_seconds',
+    'Duration of the execution of the Asterisk commands',
+    ('command',),
+    registry=REGISTRY,
+)
+ASTERISK_COMMAND_RETRIES = Counter(
+    'wazo_sysconfd_asterisk_command_retries_total',
+    'Asterisk commands retried because Asterisk was already reloading',
+    ('command',),
+    registry=REGISTRY,
+)
+ASTERISK_COMMAND_PARKED = Counter(
+    'wazo_sysconfd_asterisk_command_parked_total',
+    'Asterisk commands parked because Asterisk was not available',
+    ('command',),
+    registry=REGISTRY,
+)
+COMMAND_TIMEOUTS = Counter(
+    'wazo_sysconfd_command_timeouts_total',
+    'Child processes of the commands killed because they exceeded their deadline',
+    ('command',),
+    registry=REGISTRY,
+)
+CONFGEN_WARM_UP_SAVED = Histogram(
+    'wazo_sysconfd_confgen_warm_up_saved_seconds',
+    'Time saved by generating a file in the confgen cache before reloading',
+    ('filename',),
+    registry=REGISTRY,
+)
+REMOTE_RELOADS = Counter(
+    'wazo_sysconfd_remote_reloads_total',
+    'Reloads started by other Wazo, by whether they were forwarded or ignored',
+    ('result',),
+    registry=BUS_REGISTRY,
+)
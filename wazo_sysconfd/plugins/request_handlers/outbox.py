@@ -0,0 +1,256 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# weight of the last batch in the publish latency moving average
+_LATENCY_SMOOTHING = 0.2
+
+
+class SpilledEvent:
+    """Bus event reloaded from the spill file, published as it was marshalled."""
+
+    def __init__(self, name, routing_key, headers, payload):
+        self.name = name
+        self.routing_key = routing_key
+        self.headers = headers
+        self._payload = payload
+
+    @classmethod
+    def from_event(cls, event) -> SpilledEvent:
+        return cls(
+            event.name,
+            getattr(event, 'routing_key', None),
+            dict(getattr(event, 'headers', None) or {}),
+            event.marshal(),
+        )
+
+    def marshal(self) -> dict:
+        return self._payload
+
+
+def _dump_event(event, headers) -> str:
+    event = SpilledEvent.from_event(event)
+    return json.dumps(
+        {
+            'name': event.name,
+            'routing_key': event.routing_key,
+            'event_headers': event.headers,
+            'payload': event.marshal(),
+            'headers': headers,
+        }
+    )
+
+
+def _load_event(line: str) -> tuple:
+    record = json.loads(line)
+    event = SpilledEvent(
+        record['name'],
+        record['routing_key'],
+        record['event_headers'],
+        record['payload'],
+    )
+    return event, record['headers']
+
+
+class BusOutbox:
+    """Publish the events to the bus from a dedicated thread.
+
+    ``publish`` only queues the event, so that the request processors are never
+    blocked by the broker. The thread takes up to ``batch_size`` events at a
+    time and publishes them one by one; when the broker is unreachable, they
+    are spilled to ``spill_path`` as JSON lines and published again, in order,
+    once it is back. When the outbox is full, the oldest events are dropped.
+    """
+
+    def __init__(
+        self,
+        bus_publisher,
+        max_size: int = 10000,
+        batch_size: int = 100,
+        spill_path: str | None = None,
+        retry_interval: float = 5,
+    ):
+        self._bus_publisher = bus_publisher
+        self._max_size = max_size
+        self._batch_size = batch_size
+        self._spill_path = spill_path
+        self._retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._events = collections.deque()
+        self._spilled_count = 0
+        self._published_count = 0
+        self._dropped_count = 0
+        self._publish_latency = None
+
+    @classmethod
+    def from_config(cls, bus_publisher, config: dict) -> BusOutbox:
+        return cls(
+            bus_publisher,
+            max_size=config.get('max_size', 10000),
+            batch_size=config.get('batch_size', 100),
+            spill_path=config.get('spill_path'),
+            retry_interval=config.get('retry_interval', 5),
+        )
+
+    def start(self) -> None:
+        self._load_spilled_count()
+        thread = threading.Thread(target=self._run, name='bus-outbox')
+        thread.daemon = True
+        thread.start()
+
+    def publish(self, event, headers=None) -> None:
+        with self._lock:
+            if len(self._events) >= self._max_size:
+                self._events.popleft()
+                self._dropped_count += 1
+                logger.warning('Bus outbox is full, dropping the oldest event')
+            self._events.append((event, headers))
+            self._condition.notify()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'depth': len(self._events),
+                'spilled': self._spilled_count,
+                'published': self._published_count,
+                'dropped': self._dropped_count,
+                'publish_latency': self._publish_latency,
+            }
+
+    def _run(self) -> None:
+        while True:
+            if not self._run_once():
+                time.sleep(self._retry_interval)
+
+    def _run_once(self) -> bool:
+        """Publish the next batch of events, return False if the bus failed."""
+        if self._spilled_count:
+            if self._publish_spilled():
+                return True
+            # keep the events published meanwhile after the spilled ones
+            self._requeue([])
+            return False
+
+        with self._lock:
+            while not self._events:
+                self._condition.wait()
+            batch = [
+                self._events.popleft()
+                for _ in range(min(self._batch_size, len(self._events)))
+            ]
+
+        published_count = self._publish_batch(batch)
+        if published_count < len(batch):
+            self._requeue(batch[published_count:])
+            return False
+        return True
+
+    def _publish_batch(self, batch: list) -> int:
+        start = time.monotonic()
+        published_count = 0
+        try:
+            for event, headers in batch:
+                self._bus_publisher.publish(event, headers=headers)
+                published_count += 1
+        except Exception as e:
+            logger.warning('Failed to publish to the bus: %s', e)
+
+        if published_count:
+            latency = (time.monotonic() - start) / published_count
+            with self._lock:
+                self._published_count += published_count
+                if self._publish_latency is None:
+                    self._publish_latency = latency
+                else:
+                    self._publish_latency += _LATENCY_SMOOTHING * (
+                        latency - self._publish_latency
+                    )
+        return published_count
+
+    def _requeue(self, events: list) -> None:
+        with self._lock:
+            if not self._spill_path:
+                self._events.extendleft(reversed(events))
+                while len(self._events) > self._max_size:
+                    self._events.popleft()
+                    self._dropped_count += 1
+                return
+            events = [*events, *self._events]
+            self._events.clear()
+        if not events:
+            return
+
+        try:
+            with open(self._spill_path, 'a') as f:
+                for event, headers in events:
+                    f.write(_dump_event(event, headers) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            logger.exception('Failed to spill %s events to disk', len(events))
+            with self._lock:
+                self._dropped_count += len(events)
+            return
+
+        with self._lock:
+            self._spilled_count += len(events)
+        logger.info('Spilled %s events to %s', len(events), self._spill_path)
+
+    def _publish_spilled(self) -> bool:
+        try:
+            events = self._load_spilled()
+        except Exception:
+            logger.exception('Failed to read the spilled events, dropping them')
+            events = []
+
+        published_count = 0
+        for start in range(0, len(events), self._batch_size):
+            batch = events[start : start + self._batch_size]
+            count = self._publish_batch(batch)
+            published_count += count
+            if count < len(batch):
+                break
+        if events and not published_count:
+            return False
+
+        remaining = events[published_count:]
+        tmp_path = f'{self._spill_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            for event, headers in remaining:
+                f.write(_dump_event(event, headers) + '\n')
+        os.replace(tmp_path, self._spill_path)
+        if not remaining:
+            os.unlink(self._spill_path)
+
+        with self._lock:
+            self._spilled_count = len(remaining)
+        return not remaining
+
+    def _load_spilled_count(self) -> None:
+        if self._spill_path:
+            self._spilled_count = len(self._load_spilled())
+
+    def _load_spilled(self) -> list:
+        events = []
+        try:
+            with open(self._spill_path) as f:
+                for line in f:
+                    try:
+                        events.append(_load_event(line))
+                    except (ValueError, KeyError):
+                        # the last event may be truncated by a crash
+                        logger.warning('Ignoring corrupted spilled event %r', line)
+        except FileNotFoundError:
+            pass
+        return events
@@ -1,4 +1,4 @@
-# Copyright 2022-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2022-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from wazo_sysconfd.bus import BusConsumerProxy
@@ -13,10 +13,20 @@ class Plugin:
         api = dependencies['api']
         config = dependencies['config']
         bus_proxy: BusConsumerProxy = dependencies['get_bus_consumer']()
+        status_aggregator = dependencies['status_aggregator']
 
         dependencies_module.config = dependencies['config']
+        dependencies_module.bus_consumer = bus_proxy
 
-        events_handler = EventHandler(config['uuid'], bus_proxy)
+        remote_config = config['request_handlers'].get('remote', {})
+        events_handler = EventHandler(
+            config['uuid'],
+            bus_proxy,
+            seen_max_entries=remote_config.get('seen_max_entries', 10000),
+            seen_ttl=remote_config.get('seen_ttl', 600),
+        )
         events_handler.subscribe()
 
+        status_aggregator.add_provider(dependencies_module.provide_status)
+
         api.include_router(router)
@@ -1,40 +1,220 @@
-# Copyright 2015-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import asyncio
 import collections
+import concurrent.futures
+import heapq
+import itertools
 import logging
+import math
 import threading
+import time
 import uuid
 
 from wazo_bus.publisher import BusPublisher
 from wazo_bus.resources.sysconfd.event import RequestHandlersProgressEvent
+from xivo.status import Status
 
-from wazo_sysconfd.plugin_helpers.exceptions import HttpReqError
+from wazo_sysconfd.exceptions import HttpReqError
+from wazo_sysconfd.plugins.request_handlers import metrics
+from wazo_sysconfd.plugins.request_handlers.ami import AMIClient, AsyncAMIClient
 from wazo_sysconfd.plugins.request_handlers.asterisk import (
+    SUBSUMED_COMMANDS,
     AsteriskCommandExecutor,
     AsteriskCommandFactory,
+    AsyncAsteriskCommandExecutor,
 )
+from wazo_sysconfd.plugins.request_handlers.availability import AsteriskAvailability
 from wazo_sysconfd.plugins.request_handlers.chown_autoprov_config import (
     ChownAutoprovCommandExecutor,
     ChownAutoprovCommandFactory,
 )
+from wazo_sysconfd.plugins.request_handlers.command import (
+    DEFAULT_PRIORITY,
+    PRIORITIES,
+    CommandBatch,
+    RetryCommand,
+    priority_rank,
+)
+from wazo_sysconfd.plugins.request_handlers.cost import CommandCostModel
+from wazo_sysconfd.plugins.request_handlers.event_stream import (
+    EventStream,
+    EventStreamPublisher,
+)
+from wazo_sysconfd.plugins.request_handlers.index import RequestIndex
+from wazo_sysconfd.plugins.request_handlers.journal import RequestJournal
+from wazo_sysconfd.plugins.request_handlers.outbox import BusOutbox
+from wazo_sysconfd.plugins.request_handlers.retry import RetryBackoff
+from wazo_sysconfd.plugins.request_handlers.status import RequestStatusStore
+from wazo_sysconfd.plugins.request_handlers.watchdog import Watchdog
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_LANE = 'default'
+DEFAULT_TENANT = 'default'
+
 
 class Request:
-    def __init__(self, commands, context=None):
+    def __init__(self, commands, context=None, priority=DEFAULT_PRIORITY):
         self.commands = commands
         self.observers = []
         self.uuid = str(uuid.uuid4())
         self.context = context
+        self.priority = priority
+        # commands already executed, when resuming after a retry
+        self.executed_count = 0
+        self.completed = False
+        self._lock = threading.Lock()
+        # commands that were executed or failed, and where the others were merged
+        self._finished_commands = set()
+        self._merged_into = {}
+
+    @property
+    def pending_commands(self):
+        return self.commands[self.executed_count :]
 
     def execute(self):
-        for command in self.commands:
-            command.execute()
+        for batch in CommandBatch.split(self.pending_commands):
+            batch.execute()
+            self.executed_count += len(batch.commands)
+        self.complete()
+
+    async def execute_async(self):
+        for batch in CommandBatch.split(self.pending_commands):
+            await batch.execute_async()
+            self.executed_count += len(batch.commands)
+        self.complete()
+
+    def notify_command_optimized(self, command, actual_command):
+        with self._lock:
+            self._merged_into[command] = actual_command
+        for observer in self.observers:
+            observer.on_command_optimized(self, command, actual_command)
+
+    def notify_command_started(self, command):
+        for observer in self.observers:
+            observer.on_command_started(self, command)
+
+    def notify_command_executed(self, command):
+        for observer in self.observers:
+            observer.on_command_executed(self, command)
+        self._command_finished(command)
+
+    def notify_command_failed(self, command):
+        for observer in self.observers:
+            observer.on_command_failed(self, command)
+        self._command_finished(command)
+
+    def complete(self):
+        """Notify that the request is executed, once all its commands are.
+
+        A command merged into a command that is not executed yet completes the
+        request when it is executed.
+        """
+        with self._lock:
+            waiting = any(
+                command in self._merged_into and not self._is_finished(command)
+                for command in self.commands
+            )
+        if not waiting:
+            self.notify_executed()
+
+    def notify_executed(self):
+        with self._lock:
+            if self.completed:
+                return
+            self.completed = True
         for observer in self.observers:
             observer.on_request_executed(self)
 
+    def _command_finished(self, command):
+        # A command merged into the command of other requests is finished by
+        # them, so the request is completed as soon as the last of its commands
+        # is, without waiting for its turn in the queue
+        with self._lock:
+            self._finished_commands.add(command)
+            finished = all(self._is_finished(command) for command in self.commands)
+        if finished:
+            self.notify_executed()
+
+    def _is_finished(self, command):
+        while command not in self._finished_commands:
+            command = self._merged_into.get(command)
+            if command is None:
+                return False
+        return True
+
+
+class RequestObserver:
+    def on_command_optimized(self, request, command, actual_command):
+        pass
+
+    def on_command_started(self, request, command):
+        pass
+
+    def on_command_executed(self, request, command):
+        pass
+
+    def on_command_failed(self, request, command):
+        pass
+
+    def on_request_executed(self, request):
+        pass
+
+
+class RequestPart:
+    """Commands of a request that are executed by the same lane.
+
+    A part is only executed once the previous part of the same request is done,
+    and the last part notifies the request observers.
+    """
+
+    def __init__(self, request, commands, previous=None, last=True):
+        self.request = request
+        self.commands = commands
+        self.previous = previous
+        self.last = last
+        self.done = False
+        self.executed_count = 0
+
+    @property
+    def ready(self):
+        return self.previous is None or self.previous.done
+
+    @property
+    def pending_commands(self):
+        return self.commands[self.executed_count :]
+
+    def execute(self):
+        try:
+            for batch in CommandBatch.split(self.pending_commands):
+                batch.execute()
+                self.executed_count += len(batch.commands)
+        except RetryCommand:
+            raise
+        except BaseException:
+            self.done = True
+            raise
+        self._finish()
+
+    async def execute_async(self):
+        try:
+            for batch in CommandBatch.split(self.pending_commands):
+                await batch.execute_async()
+                self.executed_count += len(batch.commands)
+        except RetryCommand:
+            raise
+        except BaseException:
+            self.done = True
+            raise
+        self._finish()
+
+    def _finish(self):
+        self.done = True
+        if self.last:
+            self.request.complete()
+
 
 class RequestFactory:
     def __init__(self, asterisk_command_factory, chown_autoprov_command_factory):
@@ -44,12 +224,25 @@ class RequestFactory:
         }
 
     def new_request(self, args, **options):
+        priority = args.get('priority')
+        if priority is not None and priority not in PRIORITIES:
+            raise ValueError(f'invalid priority "{priority}"')
+
         request = Request([], context=args.get('context'))
         # asterisk commands must be executed first
         self._generate_asterisk_commands(request, args, **options)
         self._generate_autoprov_commands(request, args, **options)
+        request.priority = priority or self._infer_priority(request)
         return request
 
+    def _infer_priority(self, request: Request):
+        priorities = [
+            priority
+            for command in request.commands
+            if (priority := getattr(command, 'priority', None))
+        ]
+        return min(priorities, key=priority_rank, default=DEFAULT_PRIORITY)
+
     def _generate_asterisk_commands(self, request: Request, args, **options):
         self._generate_commands('ipbx', request, args, **options)
 
@@ -76,94 +269,810 @@ class RequestFactory:
 
 
 class DuplicateRequestOptimizer:
-    def __init__(self, executor):
+    def __init__(self, executor, subsumptions=None):
         self._executor = executor
+        self._subsumptions = subsumptions or {}
         self._cache = {}
         self._lock = threading.RLock()
+        self.put_count = 0
+        self.merged_count = 0
+
+    @property
+    def pending_count(self):
+        return len(self._cache)
+
+    def is_pending(self, command):
+        """Return whether the command would be merged into a pending command."""
+        if command.executor != self._executor:
+            return False
+        with self._lock:
+            return (
+                command.value in self._cache
+                or self._find_subsuming_command(command.value) is not None
+            )
 
     def on_request_put(self, request):
         for command in request.commands:
             if command.executor != self._executor:
                 continue
             with self._lock:
-                if command.value in self._cache:
-                    command.optimized = True
-                    actual_command = self._cache[command.value]
-                    actual_command.requests.add(request)
-                else:
-                    self._cache[command.value] = command
+                self.put_count += 1
+                self._optimize(command)
 
     def on_request_get(self, request):
         for command in request.commands:
             if command.executor != self._executor:
                 continue
             with self._lock:
-                if not command.optimized:
-                    self._cache.pop(command.value, None)
+                if not command.optimized and self._cache.get(command.value) is command:
+                    del self._cache[command.value]
+
+    def on_request_retry(self, request):
+        # the commands waiting for their retry are pending again, so that the
+        # commands put meanwhile are merged with them
+        for command in request.pending_commands:
+            if command.executor != self._executor or command.optimized:
+                continue
+            with self._lock:
+                if self._cache.get(command.value) is not command:
+                    self._optimize(command)
+
+    def _optimize(self, command):
+        actual_command = self._cache.get(command.value)
+        if actual_command is None:
+            actual_command = self._find_subsuming_command(command.value)
+        if actual_command is not None:
+            if self._rank(command) < self._rank(actual_command):
+                self._replace(actual_command, command)
+            else:
+                self._merge(command, actual_command)
+            return
+
+        subsumed_commands = self._find_subsumed_commands(command.value)
+        if not subsumed_commands:
+            self._cache[command.value] = command
+            return
+
+        # The earliest of the most urgent commands is kept: a pending subsumed
+        # command is upgraded in place, so that the requests waiting on it are
+        # not delayed by the subsuming command
+        actual_command = min([*subsumed_commands, command], key=self._rank)
+        if actual_command is command:
+            for other_command in subsumed_commands:
+                del self._cache[other_command.value]
+                self._merge(other_command, command)
+            self._cache[command.value] = command
+            return
+
+        self._upgrade(actual_command, command.value)
+        for other_command in subsumed_commands:
+            if other_command is not actual_command:
+                del self._cache[other_command.value]
+                self._merge(other_command, actual_command)
+        self._merge(command, actual_command)
+
+    def _rank(self, command):
+        # a command is as urgent as the most urgent request waiting on it
+        return min(
+            priority_rank(getattr(request, 'priority', None))
+            for request in command.requests
+        )
+
+    def _replace(self, pending_command, command):
+        # The pending command is executed by the more urgent command instead,
+        # which takes its place
+        logger.debug(
+            'Replacing pending command "%s" by "%s" of a more urgent request',
+            pending_command.value,
+            command.value,
+        )
+        if command.value != pending_command.value:
+            command.absorbed.add(command.value)
+            command.value = command.data = pending_command.value
+        self._cache[command.value] = command
+        self._merge(pending_command, command)
+
+    def _find_subsuming_command(self, value):
+        for pending_command in self._cache.values():
+            if value in self._subsumptions.get(pending_command.value, ()):
+                return pending_command
+        return None
+
+    def _find_subsumed_commands(self, value):
+        subsumed_values = self._subsumptions.get(value, ())
+        return [
+            pending_command
+            for pending_command in self._cache.values()
+            if pending_command.value in subsumed_values
+        ]
+
+    def _upgrade(self, command, value):
+        logger.debug('Upgrading pending command "%s" to "%s"', command.value, value)
+        command.absorbed.add(command.value)
+        self._cache = {
+            (value if pending is command else pending_value): pending
+            for pending_value, pending in self._cache.items()
+        }
+        command.value = command.data = value
+
+    def _merge(self, command, actual_command):
+        command.optimized = True
+        actual_command.requests.update(command.requests)
+        actual_command.absorbed.update(command.absorbed)
+        if command.value != actual_command.value:
+            actual_command.absorbed.add(command.value)
+        self.merged_count += 1
+        for request in command.requests:
+            request.notify_command_optimized(command, actual_command)
+
+
+def request_tenant(request):
+    """Return the tenant of a request, found in its context."""
+    context = getattr(request, 'context', None)
+    if not isinstance(context, list):
+        return DEFAULT_TENANT
+    for item in context:
+        if not isinstance(item, dict):
+            continue
+        body = item.get('resource_body')
+        tenant_uuid = item.get('tenant_uuid') or (
+            body.get('tenant_uuid') if isinstance(body, dict) else None
+        )
+        if tenant_uuid:
+            return tenant_uuid
+    return DEFAULT_TENANT
+
+
+def _entry_request(entry):
+    return entry.request if isinstance(entry, RequestPart) else entry
+
+
+def _entry_priority(entry):
+    priority = getattr(_entry_request(entry), 'priority', DEFAULT_PRIORITY)
+    return priority if priority in PRIORITIES else DEFAULT_PRIORITY
+
+
+def _entry_cost(entry):
+    commands = getattr(entry, 'commands', None)
+    return max(len(commands), 1) if isinstance(commands, list) else 1
+
+
+def _entry_completed(entry):
+    return getattr(_entry_request(entry), 'completed', False) is True
+
+
+class _FairQueue:
+    """Entries of a priority class, in one FIFO queue per tenant.
+
+    The tenants are served by self-clocked fair queuing: an entry is tagged with
+    the virtual time at which its tenant will have received its share, given
+    its weight and the number of commands of its previous entries, and the
+    ready entry with the smallest tag goes first.
+    """
+
+    def __init__(self, weights=None, default_weight=1):
+        self._weights = weights or {}
+        self._default_weight = default_weight
+        # tenant -> deque of (tag, queued_at, entry)
+        self._queues = {}
+        self._last_tags = {}
+        self._virtual_time = 0
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def depths(self):
+        return {tenant: len(queue) for tenant, queue in self._queues.items()}
+
+    def append(self, queued_at, entry):
+        tenant = request_tenant(_entry_request(entry))
+        weight = self._weights.get(tenant, self._default_weight)
+        start = max(self._virtual_time, self._last_tags.get(tenant, 0))
+        tag = self._last_tags[tenant] = start + _entry_cost(entry) / weight
+        queue = self._queues.setdefault(tenant, collections.deque())
+        queue.append((tag, queued_at, entry))
+
+    def appendleft(self, queued_at, entry):
+        # a retried entry is not charged again
+        tenant = request_tenant(_entry_request(entry))
+        self._last_tags.setdefault(tenant, self._virtual_time)
+        queue = self._queues.setdefault(tenant, collections.deque())
+        queue.appendleft((self._virtual_time, queued_at, entry))
+
+    def oldest_queued_at(self):
+        return min(queue[0][1] for queue in self._queues.values())
+
+    def head(self, is_ready):
+        # Returns (tenant, queued_at) of the next ready entry, None if none is
+        self._drop_completed()
+        head = None
+        for tenant, queue in self._queues.items():
+            tag, queued_at, entry = queue[0]
+            if is_ready(entry) and (head is None or (tag, queued_at) < head[0]):
+                head = ((tag, queued_at), tenant)
+        if head is None:
+            return None
+        (_, queued_at), tenant = head
+        return tenant, queued_at
+
+    def popleft(self, tenant):
+        queue = self._queues[tenant]
+        tag, queued_at, entry = queue.popleft()
+        self._virtual_time = max(self._virtual_time, tag)
+        if not queue:
+            del self._queues[tenant]
+            del self._last_tags[tenant]
+        return queued_at, entry
+
+    def _drop_completed(self):
+        # the requests completed by the commands of other requests are not
+        # executed, nor charged to their tenant
+        for tenant, queue in list(self._queues.items()):
+            while queue and _entry_completed(queue[0][2]):
+                queue.popleft()
+            if not queue:
+                del self._queues[tenant]
+                del self._last_tags[tenant]
+
+
+class _PendingEntries:
+    """Entries waiting in a lane, in one fair queue per priority class.
+
+    The next entry is the head of the most urgent class, but an entry gains one
+    class for every ``aging`` seconds it waits, so that the least urgent
+    classes are not starved.
+    """
+
+    def __init__(self, aging=0, weights=None, default_weight=1):
+        self._aging = aging
+        self._queues = {
+            priority: _FairQueue(weights, default_weight) for priority in PRIORITIES
+        }
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def depths(self):
+        return {priority: len(queue) for priority, queue in self._queues.items()}
+
+    def tenant_depths(self):
+        depths = collections.Counter()
+        for queue in self._queues.values():
+            depths.update(queue.depths())
+        return depths
+
+    def append(self, queued_at, entry):
+        self._queues[_entry_priority(entry)].append(queued_at, entry)
+
+    def appendleft(self, queued_at, entry):
+        self._queues[_entry_priority(entry)].appendleft(queued_at, entry)
+
+    def oldest_queued_at(self):
+        return min(queue.oldest_queued_at() for queue in self._queues.values() if queue)
+
+    def head(self, now, is_ready):
+        # Returns (priority, tenant) of the next entry, None if none is ready
+        next_head = next_score = None
+        for rank, (priority, queue) in enumerate(self._queues.items()):
+            head = queue.head(is_ready)
+            if head is None:
+                continue
+            tenant, queued_at = head
+            score = rank
+            if self._aging:
+                score -= (now - queued_at) / self._aging
+            if next_score is None or score < next_score:
+                next_head, next_score = (priority, tenant), score
+        return next_head
+
+    def popleft(self, priority, tenant):
+        return self._queues[priority].popleft(tenant)
+
+
+def _add_wait(waits, key, wait):
+    count, total_wait, max_wait = waits.get(key, (0, 0, 0))
+    waits[key] = (count + 1, total_wait + wait, max(max_wait, wait))
+
+
+def _wait_stats(waits, key, pending):
+    count, total_wait, max_wait = waits.get(key, (0, 0, 0))
+    return {
+        'pending': pending,
+        'dispatched': count,
+        'average_wait': total_wait / count if count else 0,
+        'max_wait': max_wait,
+    }
 
 
 class RequestQueue:
-    def __init__(self, optimizer):
+    def __init__(
+        self,
+        optimizer,
+        debounce_window=0,
+        debounce_max_latency=None,
+        lanes=None,
+        retry_backoff=None,
+        aging=0,
+        tenant_weights=None,
+        default_tenant_weight=1,
+        max_pending=0,
+        max_pending_commands=0,
+        retry_after=5,
+    ):
         self._lock = threading.Lock()
         self._condition = threading.Condition(self._lock)
-        self._queue = collections.deque()
         self._optimizer = optimizer
+        self._retry_backoff = retry_backoff or RetryBackoff()
+        # (retry_at, sequence, lane, entry) of the entries waiting for a retry
+        self._retries = []
+        self._retry_sequence = itertools.count()
+        self.retried_count = 0
+        self.retry_wait = 0
+        self._debounce_window = debounce_window
+        self._debounce_max_latency = debounce_max_latency or debounce_window
+        self._last_put_at = None
+        self._last_merged_count = 0
+        # executor -> lane, commands of unlisted executors go to the default lane
+        self._lane_by_executor = lanes or {}
+        self._queues = {
+            lane: _PendingEntries(aging, tenant_weights, default_tenant_weight)
+            for lane in (DEFAULT_LANE, *self._lane_by_executor.values())
+        }
+        # priority or tenant -> (dispatched count, total wait, max wait)
+        self._priority_waits = {}
+        self._tenant_waits = {}
+        # 0 disables the limit
+        self._max_pending = max_pending
+        self._max_pending_commands = max_pending_commands
+        self._retry_after = retry_after
+        self.rejected_count = 0
+
+    @property
+    def lanes(self):
+        return list(self._queues)
+
+    @property
+    def optimizer(self):
+        return self._optimizer
+
+    def depths(self):
+        with self._lock:
+            return {lane: len(queue) for lane, queue in self._queues.items()}
+
+    def priority_stats(self):
+        with self._lock:
+            return {
+                priority: _wait_stats(
+                    self._priority_waits,
+                    priority,
+                    sum(queue.depths()[priority] for queue in self._queues.values()),
+                )
+                for priority in PRIORITIES
+            }
+
+    def tenant_stats(self):
+        with self._lock:
+            depths = collections.Counter()
+            for queue in self._queues.values():
+                depths.update(queue.tenant_depths())
+            return {
+                tenant: _wait_stats(self._tenant_waits, tenant, depths[tenant])
+                for tenant in {*self._tenant_waits, *depths}
+            }
+
+    def admit(self, requests):
+        """Raise RequestQueueFull if the requests would exceed the limits.
+
+        The requests whose commands would all be merged into pending commands
+        add no work and are always admitted.
+        """
+        with self._lock:
+            new_commands = [
+                command
+                for request in requests
+                for command in request.commands
+                if not self._optimizer.is_pending(command)
+            ]
+            if not new_commands:
+                return
+            pending, pending_commands = self._pending_counts()
+            too_many_requests = (
+                self._max_pending and pending + len(requests) > self._max_pending
+            )
+            too_many_commands = (
+                self._max_pending_commands
+                and pending_commands + len(new_commands) > self._max_pending_commands
+            )
+            if too_many_requests or too_many_commands:
+                self.rejected_count += 1
+                raise RequestQueueFull(self._retry_after)
+
+    def admission_stats(self):
+        with self._lock:
+            pending, pending_commands = self._pending_counts()
+            return {
+                'pending': pending,
+                'max_pending': self._max_pending,
+                'pending_commands': pending_commands,
+                'max_pending_commands': self._max_pending_commands,
+                'rejected': self.rejected_count,
+            }
+
+    def _pending_counts(self):
+        # the pending entries, and the distinct pending commands to optimize
+        pending = sum(len(queue) for queue in self._queues.values())
+        return pending + len(self._retries), self._optimizer.pending_count
 
     def put(self, request):
+        self.put_many([request])
+
+    def put_many(self, requests):
+        # the requests are queued together, so that the optimizer sees all of
+        # them before any is executed
         with self._lock:
-            self._queue.append(request)
-            self._optimizer.on_request_put(request)
-            self._condition.notify()
+            self._last_put_at = time.monotonic()
+            for request in requests:
+                for lane, entry in self._split(request):
+                    self._queues[lane].append(self._last_put_at, entry)
+            for request in requests:
+                self._optimizer.on_request_put(request)
+            self._notify()
 
-    def get(self):
+    def get(self, lane=DEFAULT_LANE):
         with self._lock:
-            while not self._queue:
-                self._condition.wait()
-            request = self._queue.popleft()
-            self._optimizer.on_request_get(request)
-        return request
+            while True:
+                entry, timeout = self._pop(lane)
+                if entry is not None:
+                    return entry
+                self._condition.wait(timeout)
+
+    def retry(self, entry, lane, attempt, delay=None):
+        # the other entries of the lane are executed while the entry waits
+        if delay is None:
+            delay = self._retry_backoff.delay(attempt)
+        logger.info('Retrying in %.2f seconds (attempt %s)', delay, attempt + 1)
+        with self._lock:
+            retry_at = time.monotonic() + delay
+            heapq.heappush(
+                self._retries, (retry_at, next(self._retry_sequence), lane, entry)
+            )
+            self.retried_count += 1
+            self.retry_wait += delay
+            self._optimizer.on_request_retry(entry)
+            self._notify()
+
+    def retry_stats(self):
+        with self._lock:
+            return {
+                'waiting': len(self._retries),
+                'retried': self.retried_count,
+                'total_wait': self.retry_wait,
+            }
+
+    def task_done(self):
+        # the next part of the request may now be ready in another lane
+        with self._lock:
+            self._notify()
+
+    def _notify(self):
+        self._condition.notify_all()
+
+    def _pop(self, lane):
+        # Returns the next entry of the lane, or None and how long to wait before
+        # trying again (None meaning until notified)
+        retry_delay = self._release_retries()
+        queue = self._queues[lane]
+        now = time.monotonic()
+        head = queue.head(now, self._is_ready)
+        if head is None:
+            return None, retry_delay
+
+        delay = self._debounce_delay(queue, now)
+        if delay > 0:
+            return None, min(delay, retry_delay or delay)
+
+        priority, tenant = head
+        queued_at, entry = queue.popleft(priority, tenant)
+        _add_wait(self._priority_waits, priority, now - queued_at)
+        _add_wait(self._tenant_waits, tenant, now - queued_at)
+        metrics.REQUEST_WAIT.observe(now - queued_at, lane=lane, priority=priority)
+        self._optimizer.on_request_get(entry)
+        return entry, None
+
+    def _release_retries(self):
+        # Moves the entries whose retry is due to the front of their lane, and
+        # returns how long until the next retry (None if there is none)
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now:
+            _, _, lane, entry = heapq.heappop(self._retries)
+            self._queues[lane].appendleft(now, entry)
+        if self._retries:
+            return self._retries[0][0] - now
+        return None
+
+    def _split(self, request):
+        if not self._lane_by_executor:
+            return [(DEFAULT_LANE, request)]
+
+        commands_by_lane = {}
+        for command in request.commands:
+            lane = self._lane_by_executor.get(command.executor, DEFAULT_LANE)
+            commands_by_lane.setdefault(lane, []).append(command)
+        if not commands_by_lane:
+            commands_by_lane[DEFAULT_LANE] = []
+
+        entries = []
+        previous = None
+        for i, (lane, commands) in enumerate(commands_by_lane.items()):
+            last = i == len(commands_by_lane) - 1
+            previous = RequestPart(request, commands, previous, last)
+            entries.append((lane, previous))
+        return entries
+
+    def _is_ready(self, entry):
+        return not isinstance(entry, RequestPart) or entry.ready
+
+    def _debounce_delay(self, queue, now):
+        # Let requests arriving in a burst accumulate so the optimizer can merge
+        # their commands, but never delay the oldest request past the max latency
+        if not self._debounce_window:
+            return 0
+
+        first_queued_at = queue.oldest_queued_at()
+        deadline = min(
+            first_queued_at + self._debounce_max_latency,
+            self._last_put_at + self._debounce_window,
+        )
+        if now < deadline:
+            return deadline - now
+
+        merged_count = self._optimizer.merged_count
+        if merged_count != self._last_merged_count:
+            logger.info(
+                'Debounced %s pending requests, %s commands merged',
+                len(queue),
+                merged_count - self._last_merged_count,
+            )
+            self._last_merged_count = merged_count
+        return 0
+
+
+class RequestQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'request queue is full, retry after {retry_after}s')
+        self.retry_after = retry_after
 
 
 class RequestProcessor:
     def __init__(self, request_queue):
         self._request_queue = request_queue
 
-    def run(self):
+    def run(self, lane=DEFAULT_LANE):
         while True:
             try:
-                request = self._request_queue.get()
-                request.execute()
+                entry = self._request_queue.get(lane)
+                try:
+                    entry.execute()
+                except RetryCommand as e:
+                    self._request_queue.retry(entry, lane, e.command.attempts, e.delay)
+                finally:
+                    self._request_queue.task_done()
+            except Exception:
+                logger.exception('Unexpected error')
+
+
+class AsyncRequestQueue(RequestQueue):
+    """RequestQueue whose consumers wait in an asyncio event loop."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = None
+        self._events = {}
+
+    def bind(self, loop):
+        with self._lock:
+            self._loop = loop
+            self._events = {lane: asyncio.Event() for lane in self._queues}
+
+    async def get_async(self, lane=DEFAULT_LANE):
+        event = self._events[lane]
+        while True:
+            with self._lock:
+                entry, timeout = self._pop(lane)
+                if entry is not None:
+                    return entry
+                event.clear()
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _notify(self):
+        super()._notify()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake_up)
+
+    def _wake_up(self):
+        for event in self._events.values():
+            event.set()
+
+
+class AsyncRequestProcessor:
+    def __init__(self, request_queue):
+        self._request_queue = request_queue
+
+    async def run(self, lane=DEFAULT_LANE):
+        while True:
+            try:
+                entry = await self._request_queue.get_async(lane)
+                try:
+                    await entry.execute_async()
+                except RetryCommand as e:
+                    self._request_queue.retry(entry, lane, e.command.attempts, e.delay)
+                finally:
+                    self._request_queue.task_done()
             except Exception:
                 logger.exception('Unexpected error')
 
 
 class RequestHandlers:
-    def __init__(self, request_factory, request_queue, bus_publisher):
+    def __init__(
+        self,
+        request_factory,
+        request_queue,
+        bus_publisher,
+        journal=None,
+        status_store=None,
+        request_index=None,
+    ):
         self._request_factory = request_factory
         self._request_queue = request_queue
         self._bus_publisher = bus_publisher
+        self._journal = journal
+        self._status_store = status_store
+        self._request_index = request_index
+
+    def handle_request(self, args, options, idempotency_key=None):
+        return self._handle_request(args, options, idempotency_key=idempotency_key)
+
+    def handle_request_with_result(self, args, options, idempotency_key=None):
+        """Return the request uuid and a future of its status once executed."""
+        observer = RequestResultObserver(self._status_store)
+        request_uuid = self._handle_request(
+            args, options, observer, idempotency_key=idempotency_key
+        )
+        return request_uuid, observer.future
 
-    def handle_request(self, args, options):
+    def handle_requests(self, args_list, options):
+        """Accept all the requests or none of them, return their uuids."""
+        return self._handle_requests(args_list, options)
+
+    def handle_requests_with_result(self, args_list, options):
+        """Return the requests uuids and futures of their status once executed."""
+        observers = [RequestResultObserver(self._status_store) for _ in args_list]
+        request_uuids = self._handle_requests(args_list, options, observers)
+        return request_uuids, [observer.future for observer in observers]
+
+    def _handle_request(self, args, options, *observers, idempotency_key=None):
+        # Returns the uuid of the request, or of the request it duplicates
+        options = options or {}
+        digest = self._digest(args, options)
+        if digest and (
+            request_uuid := self._request_index.join(digest, idempotency_key, observers)
+        ):
+            logger.info('Request is a duplicate of request %s', request_uuid)
+            return request_uuid
+        request = self._new_request(args, options)
+        self._admit([request])
+        journaled = self._accept_request(request, args, options, observers)
+        if digest:
+            self._request_index.add(request, digest, idempotency_key)
+        self._request_queue.put(request)
+        if journaled:
+            self._wait_journaled(request, journaled)
+        return request.uuid
+
+    def _handle_requests(self, args_list, options, observers=None):
+        # Returns the uuids of the requests, or of the requests they duplicate
         options = options or {}
+        request_uuids = []
+        new_requests = []
+        for index, args in enumerate(args_list):
+            request_observers = [observers[index]] if observers else []
+            digest = self._digest(args, options)
+            request_uuid = digest and self._request_index.join(
+                digest, None, request_observers
+            )
+            if request_uuid:
+                logger.info('Request is a duplicate of request %s', request_uuid)
+                request_uuids.append(request_uuid)
+                continue
+            try:
+                request = self._new_request(args, options)
+            except HttpReqError:
+                raise HttpReqError(400, f'invalid request at index {index}')
+            new_requests.append((request, args, request_observers, digest))
+            request_uuids.append(request.uuid)
+        self._admit([request for request, *_ in new_requests])
+
+        journaled = []
+        for request, args, request_observers, digest in new_requests:
+            journaled.append(
+                self._accept_request(request, args, options, request_observers)
+            )
+            if digest:
+                self._request_index.add(request, digest)
+        self._request_queue.put_many([request for request, *_ in new_requests])
+        for (request, *_), request_journaled in zip(new_requests, journaled):
+            if request_journaled:
+                self._wait_journaled(request, request_journaled)
+        return request_uuids
+
+    def _digest(self, args, options):
+        if self._request_index is None:
+            return None
+        return self._request_index.digest(args, options)
+
+    def _new_request(self, args, options):
         try:
-            request = self._request_factory.new_request(args, **options)
+            return self._request_factory.new_request(args, **options)
         except Exception:
             logger.exception('Error while creating new request %s', args)
             raise HttpReqError(400)
-        else:
-            self._add_completed_observer(request)
-            self._queue_request(request)
-        return request.uuid
 
-    def _queue_request(self, request):
+    def _admit(self, requests):
+        try:
+            self._request_queue.admit(requests)
+        except RequestQueueFull as e:
+            logger.warning('Rejecting requests: %s', e)
+            raise HttpReqError(
+                429,
+                'too many pending requests',
+                headers={'Retry-After': str(math.ceil(e.retry_after))},
+            )
+
+    def _accept_request(self, request, args, options, observers):
+        # Returns the future of the journal record, None without journal
+        journaled = None
+        self._add_completed_observer(request)
+        if self._status_store:
+            self._status_store.add(request)
+        if self._journal:
+            self._add_journal_observer(request)
+            journaled = self._journal.request_accepted(request.uuid, args, options)
+        request.observers.extend(observers)
+        return journaled
+
+    def replay_request(self, record):
+        # the request is already in the journal
+        args, options = record['args'], record['options']
+        request = self._request_factory.new_request(args, **options)
+        request.uuid = record['uuid']
+        self._add_completed_observer(request)
+        if self._status_store:
+            self._status_store.add(request)
+        self._add_journal_observer(request)
         self._request_queue.put(request)
+        return request.uuid
 
     def _add_completed_observer(self, request):
         observer = RequestCompletedEventObserver(self._bus_publisher)
         request.observers.append(observer)
 
+    def _add_journal_observer(self, request):
+        observer = JournalObserver(self._journal)
+        request.observers.append(observer)
+
+    def _wait_journaled(self, request, journaled):
+        try:
+            journaled.result()
+        except Exception:
+            logger.error(
+                'Request %s will be lost if wazo-sysconfd restarts', request.uuid
+            )
+
 
-class RequestCompletedEventObserver:
+class RequestCompletedEventObserver(RequestObserver):
     def __init__(self, bus_publisher):
         self._bus_publisher = bus_publisher
 
@@ -175,31 +1084,60 @@ class RequestCompletedEventObserver:
         )
 
 
-class SyncRequestObserver:
-    def __init__(self, timeout=30):
-        self._event = threading.Event()
-        self._timeout = timeout
+class JournalObserver(RequestObserver):
+    def __init__(self, journal):
+        self._journal = journal
+
+    def on_command_executed(self, request, command):
+        self._journal.command_executed(request.uuid, [command.value, *command.absorbed])
 
     def on_request_executed(self, request):
-        self._event.set()
+        self._journal.request_executed(request.uuid)
 
-    def wait(self):
-        return self._event.wait(self._timeout)
+
+class RequestResultObserver(RequestObserver):
+    def __init__(self, status_store=None):
+        self.future = concurrent.futures.Future()
+        self._status_store = status_store
+
+    def on_request_executed(self, request):
+        status = self._status_store.get(request.uuid) if self._status_store else None
+        if status is None:
+            status = {'request_uuid': request.uuid, 'status': 'completed'}
+        if self.future.set_running_or_notify_cancel():
+            self.future.set_result(status)
 
 
 class SyncRequestHandlers(RequestHandlers):
-    def _queue_request(self, request):
-        observer = SyncRequestObserver()
-        request.observers.append(observer)
-        super()._queue_request(request)
-        if not observer.wait():
+    def __init__(self, *args, timeout=30, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._timeout = timeout
+
+    def handle_request(self, args, options, idempotency_key=None):
+        request_uuid, result = self.handle_request_with_result(
+            args, options, idempotency_key
+        )
+        try:
+            result.result(self._timeout)
+        except concurrent.futures.TimeoutError:
             logger.warning('timeout reached on synchronous request')
+        return request_uuid
 
 
 class RequestHandlersProxy:
     def __init__(self):
+        self._pipeline = None
         self._request_handlers = None
+        self._journal = None
+        self._status_store = None
+        self._synchronous = False
+        self._synchronous_timeout = None
+        self._event_stream = None
+        self._outbox = None
+        self._request_queue = None
         self._request_processor = None
+        self._processor_futures = []
+        self._cost_model = None
 
     def safe_init(self, options):
         # read config from main configuration file
@@ -207,7 +1145,26 @@ class RequestHandlersProxy:
         self.safe_init_from_config(config)
 
     def safe_init_from_config(self, config):
-        synchronous = config.get('request_handlers', {}).get('synchronous')
+        request_handlers_config = config.get('request_handlers', {})
+        synchronous = request_handlers_config.get('synchronous')
+        ami_config = request_handlers_config.get('ami', {})
+        debounce_config = request_handlers_config.get('debounce', {})
+        lanes_config = request_handlers_config.get('lanes') or {}
+        journal_config = request_handlers_config.get('journal', {})
+        status_config = request_handlers_config.get('status', {})
+        event_stream_config = request_handlers_config.get('event_stream', {})
+        outbox_config = request_handlers_config.get('outbox', {})
+        retry_config = request_handlers_config.get('retry', {})
+        priority_config = request_handlers_config.get('priority', {})
+        fairness_config = request_handlers_config.get('fairness', {})
+        admission_config = request_handlers_config.get('admission', {})
+        confgen_config = request_handlers_config.get('confgen', {})
+        costs_config = request_handlers_config.get('costs', {})
+        availability_config = request_handlers_config.get('availability', {})
+        watchdog_config = request_handlers_config.get('watchdog', {})
+        deduplication_config = request_handlers_config.get('deduplication', {})
+        batching_config = request_handlers_config.get('batching', {})
+        self._pipeline = request_handlers_config.get('pipeline', 'threaded')
         uuid = config.get('uuid', None)
         bus_config = config.get('bus', {})
 
@@ -215,9 +1172,50 @@ class RequestHandlersProxy:
         bus_publisher = BusPublisher(
             name='wazo-sysconfd', service_uuid=uuid, **bus_config
         )
+        if self._pipeline == 'asyncio' and not outbox_config.get('enabled'):
+            # the events are published from the event loop of the HTTP server,
+            # which must not wait for the broker
+            logger.info('Enabling the bus outbox required by the asyncio pipeline')
+        if outbox_config.get('enabled') or self._pipeline == 'asyncio':
+            self._outbox = BusOutbox.from_config(bus_publisher, outbox_config)
+            bus_publisher = self._outbox
+        self._event_stream = EventStream.from_config(event_stream_config)
+        bus_publisher = EventStreamPublisher(bus_publisher, self._event_stream)
 
         # instantiate executors
-        asterisk_command_executor = AsteriskCommandExecutor(bus_publisher)
+        self._cost_model = CommandCostModel.from_config(costs_config)
+        availability = None
+        if availability_config.get('enabled'):
+            availability = AsteriskAvailability.from_config(availability_config)
+        watchdog = Watchdog.from_config(watchdog_config)
+        batching = {
+            'max_batch_size': batching_config.get('max_size', 1),
+            'batch_concurrency': batching_config.get('concurrency', 1),
+            'batch_interval': batching_config.get('interval', 0),
+        }
+        ami_enabled = ami_config.get('enabled')
+        if self._pipeline == 'asyncio':
+            ami_client = AsyncAMIClient.from_config(ami_config) if ami_enabled else None
+            asterisk_command_executor = AsyncAsteriskCommandExecutor(
+                bus_publisher,
+                ami_client,
+                confgen_config.get('warm_up', False),
+                self._cost_model,
+                availability,
+                watchdog,
+                **batching,
+            )
+        else:
+            ami_client = AMIClient.from_config(ami_config) if ami_enabled else None
+            asterisk_command_executor = AsteriskCommandExecutor(
+                bus_publisher,
+                ami_client,
+                confgen_config.get('warm_up', False),
+                self._cost_model,
+                availability,
+                watchdog,
+                **batching,
+            )
         chown_autoprov_command_executor = ChownAutoprovCommandExecutor()
 
         # instantiate factories
@@ -230,25 +1228,274 @@ class RequestHandlersProxy:
         request_factory = RequestFactory(
             asterisk_command_factory, chown_autoprov_command_factory
         )
-        request_optimizer = DuplicateRequestOptimizer(asterisk_command_executor)
-        request_queue = RequestQueue(request_optimizer)
+        request_optimizer = DuplicateRequestOptimizer(
+            asterisk_command_executor, SUBSUMED_COMMANDS
+        )
+        executors = {
+            'ipbx': asterisk_command_executor,
+            'chown_autoprov_config': chown_autoprov_command_executor,
+        }
+        lanes = {}
+        for category, lane in lanes_config.items():
+            if category not in executors:
+                logger.warning('Ignoring lane of unknown category "%s"', category)
+                continue
+            lanes[executors[category]] = lane
+        request_queue_class = (
+            AsyncRequestQueue if self._pipeline == 'asyncio' else RequestQueue
+        )
+        request_queue = request_queue_class(
+            request_optimizer,
+            debounce_window=debounce_config.get('window', 0),
+            debounce_max_latency=debounce_config.get('max_latency'),
+            lanes=lanes,
+            retry_backoff=RetryBackoff.from_config(retry_config),
+            aging=priority_config.get('aging', 0),
+            tenant_weights=fairness_config.get('weights'),
+            default_tenant_weight=fairness_config.get('default_weight', 1),
+            max_pending=admission_config.get('max_pending', 0),
+            max_pending_commands=admission_config.get('max_pending_commands', 0),
+            retry_after=admission_config.get('retry_after', 5),
+        )
+        if journal_config.get('enabled'):
+            self._journal = RequestJournal.from_config(journal_config)
+        self._status_store = RequestStatusStore.from_config(status_config)
+        request_index = None
+        if deduplication_config.get('enabled'):
+            request_index = RequestIndex.from_config(deduplication_config)
+        self._synchronous = synchronous
+        self._synchronous_timeout = request_handlers_config.get(
+            'synchronous_timeout', 30
+        )
         if synchronous:
             self._request_handlers = SyncRequestHandlers(
-                request_factory, request_queue, bus_publisher
+                request_factory,
+                request_queue,
+                bus_publisher,
+                self._journal,
+                self._status_store,
+                request_index,
+                timeout=self._synchronous_timeout,
             )
         else:
             self._request_handlers = RequestHandlers(
-                request_factory, request_queue, bus_publisher
+                request_factory,
+                request_queue,
+                bus_publisher,
+                self._journal,
+                self._status_store,
+                request_index,
             )
-        self._request_processor = RequestProcessor(request_queue)
+        self._request_queue = request_queue
+        if self._pipeline == 'asyncio':
+            self._request_processor = AsyncRequestProcessor(request_queue)
+        else:
+            self._request_processor = RequestProcessor(request_queue)
 
     def at_start(self, options):
-        t = threading.Thread(target=self._request_processor.run)
+        if self._outbox:
+            self._outbox.start()
+
+        if self._journal:
+            self._replay_journal()
+
+        if self._pipeline == 'asyncio':
+            self._start_async_processor()
+            return
+
+        for lane in self._request_queue.lanes:
+            t = threading.Thread(
+                target=self._request_processor.run,
+                args=(lane,),
+                name=f'request-processor-{lane}',
+            )
+            t.daemon = True
+            t.start()
+
+    def _replay_journal(self):
+        for record in self._journal.open():
+            try:
+                request_uuid = self._request_handlers.replay_request(record)
+            except Exception:
+                logger.exception('Failed to replay request %s', record['uuid'])
+            else:
+                logger.info('Replayed unfinished request %s', request_uuid)
+
+    def _start_async_processor(self):
+        # run in the Uvicorn event loop when started from it, otherwise in a
+        # dedicated event loop
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = asyncio.new_event_loop()
+            t = threading.Thread(target=loop.run_forever, name='request-processor')
+            t.daemon = True
+            t.start()
+
+        self._request_queue.bind(loop)
+        self._processor_futures = [
+            asyncio.run_coroutine_threadsafe(self._request_processor.run(lane), loop)
+            for lane in self._request_queue.lanes
+        ]
+
+    def consume_remote_requests(self, remote_requests):
+        t = threading.Thread(
+            target=self._handle_remote_requests,
+            args=(remote_requests,),
+            name='remote-requests',
+        )
         t.daemon = True
         t.start()
 
-    def handle_request(self, args, options):
-        request_uuid = self._request_handlers.handle_request(args, options)
+    def _handle_remote_requests(self, remote_requests):
+        while True:
+            args, options = remote_requests.get()
+            try:
+                self.handle_request(args, options)
+            except Exception:
+                logger.exception('Failed to handle remote request %s', args)
+
+    def provide_status(self, status):
+        status['request_handlers'] = {
+            'status': Status.ok,
+            'lanes': {
+                lane: {'pending': depth}
+                for lane, depth in self._request_queue.depths().items()
+            },
+            'retries': self._request_queue.retry_stats(),
+            'priorities': self._request_queue.priority_stats(),
+            'tenants': self._request_queue.tenant_stats(),
+            'admission': self._request_queue.admission_stats(),
+        }
+        if self._outbox:
+            status['request_handlers']['outbox'] = self._outbox.stats()
+
+    def metrics(self):
+        """Return the metrics of the request handlers, as Prometheus text."""
+        queue = self._request_queue
+        retries = queue.retry_stats()
+        optimizer = queue.optimizer
+        families = [
+            (
+                'wazo_sysconfd_request_queue_depth',
+                'gauge',
+                'Requests waiting to be executed, by lane',
+                [('', {'lane': lane}, depth) for lane, depth in queue.depths().items()],
+            ),
+            (
+                'wazo_sysconfd_request_retries_waiting',
+                'gauge',
+                'Requests waiting for the retry of a command',
+                [('', {}, retries['waiting'])],
+            ),
+            (
+                'wazo_sysconfd_request_retries_total',
+                'counter',
+                'Requests retried because of a command',
+                [('', {}, retries['retried'])],
+            ),
+            (
+                'wazo_sysconfd_requests_rejected_total',
+                'counter',
+                'Requests rejected because too many requests were pending',
+                [('', {}, queue.admission_stats()['rejected'])],
+            ),
+            (
+                'wazo_sysconfd_optimizable_commands_total',
+                'counter',
+                'Commands that could be merged into pending commands',
+                [('', {}, optimizer.put_count)],
+            ),
+            (
+                'wazo_sysconfd_merged_commands_total',
+                'counter',
+                'Commands merged into pending commands',
+                [('', {}, optimizer.merged_count)],
+            ),
+        ]
+        return metrics.REGISTRY.expose() + ''.join(
+            metrics.expose_family(*family) for family in families
+        )
+
+    def handle_request(self, args, options, idempotency_key=None):
+        request_uuid = self._request_handlers.handle_request(
+            args, options, idempotency_key=idempotency_key
+        )
         return {
             'request_uuid': request_uuid,
         }
+
+    async def handle_request_async(
+        self, args, options, timeout=None, idempotency_key=None
+    ):
+        # Accepting a request may wait for the journal, but the result of a
+        # synchronous request is awaited without holding a thread
+        loop = asyncio.get_running_loop()
+        if not self._synchronous:
+            return await loop.run_in_executor(
+                None, self.handle_request, args, options, idempotency_key
+            )
+
+        request_uuid, result = await loop.run_in_executor(
+            None,
+            self._request_handlers.handle_request_with_result,
+            args,
+            options,
+            idempotency_key,
+        )
+        if timeout is None:
+            timeout = self._synchronous_timeout
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(result)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning('timeout reached on synchronous request %s', request_uuid)
+        return self._status_store.get(request_uuid) or {'request_uuid': request_uuid}
+
+    def handle_requests(self, args_list, options):
+        return {
+            'request_uuids': self._request_handlers.handle_requests(args_list, options),
+        }
+
+    async def handle_requests_async(self, args_list, options, timeout=None):
+        # a synchronous batch returns the status of each of its requests once
+        # they are all executed
+        loop = asyncio.get_running_loop()
+        if not self._synchronous:
+            return await loop.run_in_executor(
+                None, self.handle_requests, args_list, options
+            )
+
+        request_uuids, results = await loop.run_in_executor(
+            None, self._request_handlers.handle_requests_with_result, args_list, options
+        )
+        if timeout is None:
+            timeout = self._synchronous_timeout
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(
+                    asyncio.gather(*(asyncio.wrap_future(result) for result in results))
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning('timeout reached on synchronous batch of requests')
+        return [
+            self._status_store.get(request_uuid) or {'request_uuid': request_uuid}
+            for request_uuid in request_uuids
+        ]
+
+    def get_command_costs(self):
+        return self._cost_model.stats()
+
+    def get_request_status(self, request_uuid):
+        return self._status_store.get(request_uuid)
+
+    def subscribe_events(self, request_uuid=None, resource_type=None):
+        return self._event_stream.subscribe(
+            request_uuid=request_uuid, resource_type=resource_type
+        )
+
+    def stream_events(self, subscription):
+        return self._event_stream.stream(subscription)
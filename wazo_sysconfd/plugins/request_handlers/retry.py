@@ -0,0 +1,33 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import random
+
+
+class RetryBackoff:
+    """Exponential backoff with jitter between the attempts of a command.
+
+    The delay doubles after each attempt, up to ``max_delay``, and is randomly
+    shortened by up to ``jitter`` of its value so that retries are spread out.
+    """
+
+    def __init__(
+        self, initial_delay: float = 0.5, max_delay: float = 5, jitter: float = 0.5
+    ):
+        self._initial_delay = initial_delay
+        self._max_delay = max_delay
+        self._jitter = jitter
+
+    @classmethod
+    def from_config(cls, config: dict) -> RetryBackoff:
+        return cls(
+            initial_delay=config.get('initial_delay', 0.5),
+            max_delay=config.get('max_delay', 5),
+            jitter=config.get('jitter', 0.5),
+        )
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self._initial_delay * 2 ** (attempt - 1), self._max_delay)
+        return delay * (1 - random.uniform(0, self._jitter))
@@ -0,0 +1,155 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import copy
+import threading
+from datetime import datetime, timezone
+
+from wazo_sysconfd.plugins.request_handlers.cache import TTLCache
+
+QUEUED = 'queued'
+OPTIMIZED = 'optimized'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class _RequestStatus:
+    def __init__(self, request, max_commands):
+        now = _now()
+        self.status = {
+            'request_uuid': request.uuid,
+            'priority': request.priority,
+            'status': QUEUED,
+            'queued_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'commands': [],
+        }
+        if len(request.commands) > max_commands:
+            self.status['omitted_commands'] = len(request.commands) - max_commands
+        # id of a command -> statuses of the commands of the request executed by
+        # it. The commands are not referenced, so that they are not kept alive.
+        self.commands = {}
+        for command in request.commands[:max_commands]:
+            command_status = {
+                'command': command.value,
+                'status': QUEUED,
+                'queued_at': now,
+                'started_at': None,
+                'finished_at': None,
+                'duration': None,
+                # executed by the command of another request
+                'deduplicated': False,
+            }
+            self.status['commands'].append(command_status)
+            self.commands[id(command)] = [command_status]
+
+
+class RequestStatusStore:
+    """Status of the latest requests, updated as they are executed.
+
+    The store holds at most ``max_requests`` requests, each one for at most
+    ``ttl`` seconds and with the status of at most ``max_commands`` of its
+    commands. It observes the requests added to it.
+    """
+
+    def __init__(
+        self, max_requests: int = 10000, ttl: float = 3600, max_commands: int = 100
+    ):
+        self._requests = TTLCache(max_requests, ttl)
+        self._max_commands = max_commands
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> RequestStatusStore:
+        return cls(
+            max_requests=config.get('max_requests', 10000),
+            ttl=config.get('ttl', 3600),
+            max_commands=config.get('max_commands', 100),
+        )
+
+    def add(self, request) -> None:
+        self._requests.set(request.uuid, _RequestStatus(request, self._max_commands))
+        request.observers.append(self)
+
+    def get(self, request_uuid: str) -> dict | None:
+        request_status = self._requests.get(request_uuid)
+        if request_status is None:
+            return None
+        with self._lock:
+            return copy.deepcopy(request_status.status)
+
+    def on_command_optimized(self, request, command, actual_command):
+        request_status = self._requests.get(request.uuid)
+        if request_status is None:
+            return
+        with self._lock:
+            command_statuses = request_status.commands.get(id(command), [])
+            for command_status in command_statuses:
+                command_status['status'] = OPTIMIZED
+                command_status['merged_into'] = actual_command.value
+                command_status['deduplicated'] = True
+            request_status.commands.setdefault(id(actual_command), []).extend(
+                command_statuses
+            )
+            status = request_status.status
+            if status['status'] == QUEUED and all(
+                command_status['status'] == OPTIMIZED
+                for command_status in status['commands']
+            ):
+                status['status'] = OPTIMIZED
+
+    def on_command_started(self, request, command):
+        self._update(request, command, RUNNING)
+
+    def on_command_executed(self, request, command):
+        self._update(request, command, COMPLETED)
+
+    def on_command_failed(self, request, command):
+        self._update(request, command, FAILED)
+
+    def on_request_executed(self, request):
+        request_status = self._requests.get(request.uuid)
+        if request_status is None:
+            return
+        with self._lock:
+            status = request_status.status
+            failed = any(
+                command_status['status'] == FAILED
+                for command_status in status['commands']
+            )
+            status['status'] = FAILED if failed else COMPLETED
+            status['finished_at'] = _now()
+            request_status.commands.clear()
+
+    def _update(self, request, command, command_status_value):
+        request_status = self._requests.get(request.uuid)
+        if request_status is None:
+            return
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for command_status in request_status.commands.get(id(command), []):
+                command_status['status'] = command_status_value
+                if command_status_value == RUNNING:
+                    # a retried command keeps the time of its first attempt
+                    if command_status['started_at'] is None:
+                        command_status['started_at'] = now.isoformat()
+                else:
+                    command_status['finished_at'] = now.isoformat()
+                    started_at = datetime.fromisoformat(command_status['started_at'])
+                    command_status['duration'] = (now - started_at).total_seconds()
+                command_status['attempts'] = command.attempts
+                # the command may have been upgraded to a subsuming command
+                if command.value != command_status['command']:
+                    command_status['merged_into'] = command.value
+            status = request_status.status
+            if status['status'] in (QUEUED, OPTIMIZED):
+                status['status'] = RUNNING
+                status['started_at'] = now.isoformat()
@@ -0,0 +1,295 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import socketserver
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from wazo_sysconfd.plugins.request_handlers.ami import (
+    AMIClient,
+    AMIError,
+    AMIOutcomeUnknown,
+    AsyncAMIClient,
+    parse_message,
+)
+from wazo_sysconfd.plugins.request_handlers.asterisk import try_reload_command
+
+WATCHDOG = 'wazo_sysconfd.plugins.request_handlers.watchdog.Watchdog'
+
+
+class FakeAMIHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.connections += 1
+        self.wfile.write(b'Asterisk Call Manager/9.0.0\r\n')
+        while True:
+            action = self._read_action()
+            if action is None:
+                return
+            action_id = action['ActionID']
+            if action['Action'] == 'Login':
+                if action['Secret'] != self.server.password:
+                    self._reply(action_id, 'Error', 'Authentication failed')
+                    return
+                self._reply(action_id, 'Success', 'Authentication accepted')
+            elif action['Action'] == 'Command':
+                self.server.commands.append(action['Command'])
+                time.sleep(self.server.delay)
+                output = ''.join(f'Output: {line}\r\n' for line in self.server.output)
+                self.wfile.write(
+                    f'Response: Success\r\nActionID: {action_id}\r\n'
+                    f'Message: Command output follows\r\n{output}\r\n'.encode()
+                )
+                if self.server.hang_up_after_command:
+                    return
+
+    def _read_action(self):
+        action = {}
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return None
+            line = line.decode().rstrip('\r\n')
+            if not line:
+                return action
+            key, _, value = line.partition(': ')
+            action[key] = value
+
+    def _reply(self, action_id, response, message):
+        self.wfile.write(
+            f'Response: {response}\r\nActionID: {action_id}\r\n'
+            f'Message: {message}\r\n\r\n'.encode()
+        )
+
+
+class FakeAMIServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password='secret'):
+        super().__init__(('127.0.0.1', 0), FakeAMIHandler)
+        self.password = password
+        self.commands = []
+        self.output = []
+        self.connections = 0
+        self.hang_up_after_command = False
+        self.delay = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class TestAMIClient(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeAMIServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = AMIClient('127.0.0.1', self.server.port, 'sysconfd', 'secret', 1)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_command(self):
+        self.server.output = ['line 1', 'line 2']
+
+        output = self.client.command('dialplan reload')
+
+        self.assertEqual(output, 'line 1\nline 2\n')
+        self.assertEqual(self.server.commands, ['dialplan reload'])
+
+    def test_command_reuses_connection(self):
+        self.client.command('dialplan reload')
+        self.client.command('moh reload')
+
+        self.assertEqual(self.server.commands, ['dialplan reload', 'moh reload'])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_command_reconnects_when_connection_is_lost(self):
+        self.server.hang_up_after_command = True
+
+        self.client.command('dialplan reload')
+        time.sleep(0.1)  # let the server close the connection
+        self.client.command('moh reload')
+
+        self.assertEqual(self.server.commands, ['dialplan reload', 'moh reload'])
+        self.assertEqual(self.server.connections, 2)
+
+    def test_command_is_not_sent_again_without_response(self):
+        self.server.delay = 0.5
+        client = AMIClient(
+            '127.0.0.1', self.server.port, 'sysconfd', 'secret', timeout=0.1
+        )
+
+        self.assertRaises(AMIOutcomeUnknown, client.command, 'core reload')
+        time.sleep(0.5)
+        self.assertEqual(self.server.commands, ['core reload'])
+        client.close()
+
+    def test_commands(self):
+        self.server.output = ['ok']
+
+        outputs = self.client.commands(
+            ['sccp reset SEP001', 'sccp reset SEP002', 'sccp reset SEP003'],
+            concurrency=2,
+        )
+
+        self.assertEqual(outputs, ['ok\n', 'ok\n', 'ok\n'])
+        self.assertEqual(
+            self.server.commands,
+            ['sccp reset SEP001', 'sccp reset SEP002', 'sccp reset SEP003'],
+        )
+        self.assertEqual(self.server.connections, 1)
+
+    def test_commands_without_response(self):
+        self.server.delay = 0.5
+        client = AMIClient(
+            '127.0.0.1', self.server.port, 'sysconfd', 'secret', timeout=0.1
+        )
+
+        outputs = client.commands(
+            ['sccp reset SEP001', 'sccp reset SEP002', 'sccp reset SEP003'],
+            concurrency=2,
+        )
+
+        self.assertIsInstance(outputs[0], AMIOutcomeUnknown)
+        self.assertIsInstance(outputs[1], AMIOutcomeUnknown)
+        self.assertIs(type(outputs[2]), AMIError)
+        client.close()
+
+    def test_commands_connection_refused(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client = AMIClient('127.0.0.1', self.server.port, 'sysconfd', 'secret', 1)
+
+        outputs = client.commands(['sccp reset SEP001', 'sccp reset SEP002'])
+
+        self.assertEqual([type(output) for output in outputs], [AMIError, AMIError])
+
+    def test_command_authentication_failure(self):
+        client = AMIClient('127.0.0.1', self.server.port, 'sysconfd', 'wrong', 1)
+
+        self.assertRaises(AMIError, client.command, 'dialplan reload')
+        self.assertEqual(self.server.commands, [])
+
+    def test_command_connection_refused(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client = AMIClient('127.0.0.1', self.server.port, 'sysconfd', 'secret', 1)
+
+        self.assertRaises(AMIError, client.command, 'dialplan reload')
+
+
+class TestAsyncAMIClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = FakeAMIServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = AsyncAMIClient(
+            '127.0.0.1', self.server.port, 'sysconfd', 'secret', 1
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def test_command(self):
+        self.server.output = ['line 1', 'line 2']
+
+        output = await self.client.command('dialplan reload')
+
+        self.assertEqual(output, 'line 1\nline 2\n')
+        self.assertEqual(self.server.commands, ['dialplan reload'])
+
+    async def test_command_reconnects_when_connection_is_lost(self):
+        self.server.hang_up_after_command = True
+
+        await self.client.command('dialplan reload')
+        await asyncio.sleep(0.1)  # let the server close the connection
+        await self.client.command('moh reload')
+
+        self.assertEqual(self.server.commands, ['dialplan reload', 'moh reload'])
+        self.assertEqual(self.server.connections, 2)
+
+    async def test_command_is_not_sent_again_without_response(self):
+        self.server.delay = 0.5
+        client = AsyncAMIClient(
+            '127.0.0.1', self.server.port, 'sysconfd', 'secret', timeout=0.1
+        )
+
+        with self.assertRaises(AMIOutcomeUnknown):
+            await client.command('core reload')
+        await asyncio.sleep(0.5)
+        self.assertEqual(self.server.commands, ['core reload'])
+        await client.close()
+
+    async def test_command_authentication_failure(self):
+        client = AsyncAMIClient('127.0.0.1', self.server.port, 'sysconfd', 'wrong', 1)
+
+        with self.assertRaises(AMIError):
+            await client.command('dialplan reload')
+
+
+class TestParseMessage(unittest.TestCase):
+    def test_parse_message(self):
+        raw = (
+            b'Response: Success\r\nActionID: 2\r\nMessage: Command output follows\r\n'
+            b'Output: first: line\r\nOutput: \r\nOutput: last'
+        )
+
+        headers, output = parse_message(raw)
+
+        self.assertEqual(
+            headers,
+            {
+                'Response': 'Success',
+                'ActionID': '2',
+                'Message': 'Command output follows',
+            },
+        )
+        self.assertEqual(output, ['first: line', '', 'last'])
+
+
+class TestTryReloadCommand(unittest.TestCase):
+    @patch(f'{WATCHDOG}.run')
+    def test_uses_ami_client(self, mock_run):
+        ami_client = Mock(AMIClient)
+        ami_client.command.return_value = ''
+
+        try_reload_command('dialplan reload', ami_client=ami_client)
+
+        ami_client.command.assert_called_once_with('dialplan reload')
+        mock_run.assert_not_called()
+
+    @patch(f'{WATCHDOG}.run')
+    def test_falls_back_to_subprocess(self, mock_run):
+        ami_client = Mock(AMIClient)
+        ami_client.command.side_effect = AMIError('connection refused')
+        mock_run.return_value = Mock(returncode=0, stdout='')
+
+        try_reload_command('dialplan reload', ami_client=ami_client)
+
+        mock_run.assert_called_once_with(
+            ['asterisk', '-rx', 'dialplan reload'],
+            'dialplan reload',
+            capture_output=True,
+            text=True,
+        )
+
+    @patch(f'{WATCHDOG}.run')
+    def test_does_not_fall_back_when_outcome_is_unknown(self, mock_run):
+        ami_client = Mock(AMIClient)
+        ami_client.command.side_effect = AMIOutcomeUnknown('timed out')
+
+        self.assertRaises(
+            AMIOutcomeUnknown,
+            try_reload_command,
+            'core restart now',
+            ami_client=ami_client,
+        )
+        mock_run.assert_not_called()
@@ -1,16 +1,36 @@
-# Copyright 2015-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import threading
 import unittest
-from unittest.mock import Mock, patch, sentinel
+from unittest.mock import ANY, AsyncMock, Mock, patch
 from uuid import uuid4
 
 from wazo_bus import BusPublisher
 
+from wazo_sysconfd.plugins.request_handlers.ami import (
+    AMIClient,
+    AMIError,
+    AMIOutcomeUnknown,
+)
 from wazo_sysconfd.plugins.request_handlers.asterisk import (
+    MAX_ATTEMPTS,
+    RELOAD_IN_PROGRESS_MSG,
     AsteriskCommandExecutor,
     AsteriskCommandFactory,
+    AsyncAsteriskCommandExecutor,
+)
+from wazo_sysconfd.plugins.request_handlers.availability import AsteriskAvailability
+from wazo_sysconfd.plugins.request_handlers.command import Command, RetryCommand
+from wazo_sysconfd.plugins.request_handlers.cost import CommandCostModel
+from wazo_sysconfd.plugins.request_handlers.metrics import (
+    ASTERISK_COMMAND_DURATION,
+    ASTERISK_COMMAND_PARKED,
+    ASTERISK_COMMAND_RETRIES,
 )
+from wazo_sysconfd.plugins.request_handlers.watchdog import CommandTimeout, Watchdog
+
+WATCHDOG = 'wazo_sysconfd.plugins.request_handlers.watchdog.Watchdog'
 
 
 class TestAsteriskCommandFactory(unittest.TestCase):
@@ -29,6 +49,7 @@ class TestAsteriskCommandFactory(unittest.TestCase):
         self.assertIs(command.executor, self.executor)
         self.assertEqual(command.data, value)
         self.assertEqual(command.requests, {request})
+        self.executor.prepare.assert_called_once_with(command)
 
     def test_new_command_with_arg(self):
         value = 'sccp reset SEP001122334455'
@@ -40,6 +61,20 @@ class TestAsteriskCommandFactory(unittest.TestCase):
         self.assertEqual(command.requests, {request})
         self.assertEqual(command.options, {'some_option': True})
 
+    def test_new_command_priority(self):
+        reset = self.factory.new_command('sccp reset SEP001122334455', Mock())
+        reload = self.factory.new_command('dialplan reload', Mock())
+
+        self.assertEqual(reset.priority, 'high')
+        self.assertIsNone(reload.priority)
+
+    def test_new_command_batch_key(self):
+        reset = self.factory.new_command('sccp reset SEP001122334455', Mock())
+        reload = self.factory.new_command('dialplan reload', Mock())
+
+        self.assertEqual(reset.batch_key, 'sccp reset')
+        self.assertIsNone(reload.batch_key)
+
     def test_new_command_unauthorized(self):
         value = 'foobar'
         request = Mock()
@@ -52,14 +87,368 @@ class TestAsteriskCommandExecutor(unittest.TestCase):
         self.bus_publisher = Mock(BusPublisher)
         self.executor = AsteriskCommandExecutor(self.bus_publisher)
 
-    @patch('subprocess.run')
+    @patch(f'{WATCHDOG}.run')
     def test_execute(self, mock_call):
-        command = Mock(requests=[])
+        command = Mock(requests=[], task_uuid=None, absorbed=set())
         mock_result = Mock()
         mock_result.returncode = 0
         mock_call.return_value = mock_result
 
-        self.executor.execute(command, sentinel.data)
+        self.executor.execute(command, 'dialplan reload')
+
+        expected_args = ['asterisk', '-rx', 'dialplan reload']
+        mock_call.assert_called_once_with(
+            expected_args, 'dialplan reload', capture_output=True, text=True
+        )
+
+    @patch(f'{WATCHDOG}.run')
+    def test_execute_records_metrics(self, mock_run):
+        command = Mock(requests=[], task_uuid=None, absorbed=set(), attempts=1)
+        mock_run.return_value = Mock(returncode=0, stdout=RELOAD_IN_PROGRESS_MSG)
+        durations = ASTERISK_COMMAND_DURATION.count(command='sccp reset')
+        retries = ASTERISK_COMMAND_RETRIES.value(command='sccp reset')
+
+        self.assertRaises(
+            RetryCommand, self.executor.execute, command, 'sccp reset SEP001'
+        )
+
+        self.assertEqual(
+            ASTERISK_COMMAND_DURATION.count(command='sccp reset'), durations + 1
+        )
+        self.assertEqual(
+            ASTERISK_COMMAND_RETRIES.value(command='sccp reset'), retries + 1
+        )
+
+    @patch(f'{WATCHDOG}.run')
+    def test_execute_reload_in_progress(self, mock_run):
+        command = Mock(requests=[], task_uuid=None, absorbed=set(), attempts=1)
+        mock_run.return_value = Mock(returncode=0, stdout=RELOAD_IN_PROGRESS_MSG)
+
+        self.assertRaises(
+            RetryCommand, self.executor.execute, command, 'dialplan reload'
+        )
+        mock_run.assert_called_once()
+        self.assertEqual(self.bus_publisher.publish.call_count, 1)
+
+    @patch(f'{WATCHDOG}.call')
+    @patch(f'{WATCHDOG}.run')
+    def test_execute_retried_command_is_started_once(self, mock_run, mock_call):
+        command = Command('module reload res_pjsip.so', Mock(uuid='r1'), None, None)
+        in_progress = Mock(returncode=0, stdout=RELOAD_IN_PROGRESS_MSG)
+        mock_run.side_effect = [in_progress, in_progress, Mock(returncode=0, stdout='')]
+
+        for _ in range(2):
+            command.attempts += 1
+            self.assertRaises(
+                RetryCommand, self.executor.execute, command, command.value
+            )
+        command.attempts += 1
+        self.executor.execute(command, command.value)
+
+        events = [
+            c.args[0].marshal() for c in self.bus_publisher.publish.call_args_list
+        ]
+        self.assertEqual([e['status'] for e in events], ['starting', 'completed'])
+        self.assertEqual({e['uuid'] for e in events}, {command.task_uuid})
+        mock_call.assert_called_once()
+
+    @patch(f'{WATCHDOG}.call')
+    @patch(f'{WATCHDOG}.run')
+    def test_execute_waits_for_invalidation_of_prepared_command(
+        self, mock_run, mock_call
+    ):
+        command = Command('module reload res_pjsip.so', Mock(), None, None)
+        command.data = command.value
+        invalidated = threading.Event()
+        mock_call.side_effect = lambda *args, **kwargs: invalidated.wait(1)
+        mock_run.return_value = Mock(returncode=0, stdout='')
+
+        self.executor.prepare(command)
+        invalidated.set()
+        self.executor.execute(command, command.value)
+
+        mock_call.assert_called_once()
+        mock_run.assert_called_once()
+
+    @patch(f'{WATCHDOG}.call')
+    def test_prepare_other_command(self, mock_call):
+        command = Command('dialplan reload', Mock(), None, 'dialplan reload')
+
+        self.executor.prepare(command)
+
+        mock_call.assert_not_called()
+
+    @patch(f'{WATCHDOG}.call')
+    @patch(f'{WATCHDOG}.run')
+    def test_execute_invalidates_pjsip_when_absorbed(self, mock_run, mock_call):
+        command = Mock(
+            requests=[], task_uuid=None, absorbed={'module reload res_pjsip.so'}
+        )
+        mock_run.return_value = Mock(returncode=0, stdout='')
+
+        self.executor.execute(command, 'core reload')
+
+        mock_call.assert_called_once_with(
+            ['wazo-confgen', 'asterisk/pjsip.conf', '--invalidate'],
+            'wazo-confgen',
+            stdout=ANY,
+            close_fds=True,
+        )
+        mock_run.assert_called_once_with(
+            ['asterisk', '-rx', 'core reload'],
+            'core reload',
+            capture_output=True,
+            text=True,
+        )
+
+
+class TestAsteriskCommandExecutorWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.watchdog = Watchdog(timeouts={'core reload': 600}, default_timeout=60)
+        self.bus_publisher = Mock(BusPublisher)
+        self.executor = AsteriskCommandExecutor(
+            self.bus_publisher, watchdog=self.watchdog
+        )
+
+    @patch(f'{WATCHDOG}.run')
+    def test_timed_out_command_fails(self, mock_run):
+        mock_run.side_effect = CommandTimeout('core reload', 600)
+        command = Command('core reload', Mock(), None, 'core reload')
+
+        with self.assertRaises(CommandTimeout):
+            self.executor.execute(command, command.data)
+
+        self.assertEqual(self.bus_publisher.publish.call_count, 1)
+
+
+class TestAsteriskCommandExecutorBatch(unittest.TestCase):
+    def setUp(self):
+        self.bus_publisher = Mock(BusPublisher)
+        self.ami_client = Mock(AMIClient)
+        self.executor = AsteriskCommandExecutor(
+            self.bus_publisher, max_batch_size=10, batch_concurrency=2
+        )
+        self.commands = [
+            Command(value, Mock(), self.executor, value)
+            for value in ('sccp reset SEP001', 'sccp reset SEP002')
+        ]
+
+    @patch(f'{WATCHDOG}.run')
+    def test_execute_batch(self, mock_run):
+        mock_run.side_effect = [
+            Mock(returncode=0, stdout=''),
+            CommandTimeout('sccp reset', 60),
+        ]
+
+        errors = self.executor.execute_batch(self.commands)
+
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], CommandTimeout)
+        self.assertEqual(
+            [
+                event.content['status']
+                for (event,), _ in self.bus_publisher.publish.call_args_list
+            ],
+            ['starting', 'starting', 'completed'],
+        )
+        self.assertNotEqual(self.commands[0].task_uuid, self.commands[1].task_uuid)
+
+    @patch(f'{WATCHDOG}.run')
+    def test_execute_batch_with_ami(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout='')
+        self.ami_client.commands.return_value = [
+            'ok\n',
+            AMIError('connection refused'),
+        ]
+        executor = AsteriskCommandExecutor(
+            self.bus_publisher, self.ami_client, batch_concurrency=2
+        )
+
+        errors = executor.execute_batch(self.commands)
+
+        self.assertEqual(errors, [None, None])
+        self.ami_client.commands.assert_called_once_with(
+            ['sccp reset SEP001', 'sccp reset SEP002'], 2, 0
+        )
+        mock_run.assert_called_once_with(
+            ['asterisk', '-rx', 'sccp reset SEP002'],
+            'sccp reset',
+            capture_output=True,
+            text=True,
+        )
+
+    def test_execute_batch_with_ami_outcome_unknown(self):
+        self.ami_client.commands.return_value = ['ok\n', AMIOutcomeUnknown('timeout')]
+        executor = AsteriskCommandExecutor(self.bus_publisher, self.ami_client)
+
+        errors = executor.execute_batch(self.commands)
+
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], AMIOutcomeUnknown)
+
+    @patch(f'{WATCHDOG}.run')
+    def test_execute_batch_parked_while_asterisk_is_down(self, mock_run):
+        availability = Mock(AsteriskAvailability, available=False, retry_interval=2)
+        executor = AsteriskCommandExecutor(
+            self.bus_publisher, availability=availability
+        )
+
+        self.assertRaises(RetryCommand, executor.execute_batch, self.commands)
+
+        mock_run.assert_not_called()
+        self.bus_publisher.publish.assert_not_called()
+
+
+class TestAsteriskCommandExecutorCosts(unittest.TestCase):
+    def setUp(self):
+        self.cost_model = CommandCostModel(expensive_threshold=1)
+        self.executor = AsteriskCommandExecutor(
+            Mock(BusPublisher), cost_model=self.cost_model
+        )
+
+    @patch(f'{WATCHDOG}.run')
+    def test_execute_records_cost(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout='')
+        command = Command('sccp reset SEP001', Mock(), None, 'sccp reset SEP001')
+
+        self.executor.execute(command, command.data)
+
+        self.assertEqual(self.cost_model.stats()['sccp reset']['count'], 1)
+
+    @patch(f'{WATCHDOG}.run')
+    def test_expensive_command_executed_again_is_delayed(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout='')
+        self.cost_model.record('core reload', 10)
+        command = Command('core reload', Mock(), None, 'core reload')
+
+        with self.assertRaises(RetryCommand) as context:
+            self.executor.execute(command, command.data)
+
+        self.assertGreater(context.exception.delay, 9)
+        self.assertIsNone(command.task_uuid)
+        mock_run.assert_not_called()
+
+    @patch(f'{WATCHDOG}.run')
+    def test_command_with_argument_is_not_delayed(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout='')
+        self.cost_model.record('sccp reset', 10)
+        command = Command('sccp reset SEP002', Mock(), None, 'sccp reset SEP002')
+
+        self.executor.execute(command, command.data)
+
+        mock_run.assert_called_once()
+
+
+class TestAsteriskCommandExecutorAvailability(unittest.TestCase):
+    def setUp(self):
+        self.availability = Mock(AsteriskAvailability, retry_interval=2)
+        self.bus_publisher = Mock(BusPublisher)
+        self.executor = AsteriskCommandExecutor(
+            self.bus_publisher, availability=self.availability
+        )
+
+    @patch(f'{WATCHDOG}.run')
+    def test_command_is_parked_while_asterisk_is_down(self, mock_run):
+        self.availability.available = False
+        command = Command('core reload', Mock(), None, 'core reload')
+        parked = ASTERISK_COMMAND_PARKED.value(command='core reload')
+
+        with self.assertRaises(RetryCommand) as context:
+            self.executor.execute(command, command.data)
+
+        self.assertEqual(context.exception.delay, 2)
+        self.assertIsNone(command.task_uuid)
+        self.assertEqual(
+            ASTERISK_COMMAND_PARKED.value(command='core reload'), parked + 1
+        )
+        mock_run.assert_not_called()
+        self.bus_publisher.publish.assert_not_called()
+
+    @patch(f'{WATCHDOG}.run')
+    def test_command_is_executed_when_asterisk_is_back(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout='')
+        self.availability.available = True
+        command = Command('core reload', Mock(), None, 'core reload')
+
+        self.executor.execute(command, command.data)
+
+        mock_run.assert_called_once()
+
+
+class TestAsyncAsteriskCommandExecutor(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bus_publisher = Mock(BusPublisher)
+        self.executor = AsyncAsteriskCommandExecutor(self.bus_publisher)
+
+    @patch('asyncio.create_subprocess_exec')
+    async def test_execute_async(self, mock_exec):
+        command = Mock(requests=[], task_uuid=None, absorbed=set())
+        mock_exec.return_value = self._new_process(b'')
+
+        await self.executor.execute_async(command, 'dialplan reload')
+
+        mock_exec.assert_awaited_once_with(
+            'asterisk', '-rx', 'dialplan reload', stdout=ANY, stderr=ANY
+        )
+        self.assertEqual(self.bus_publisher.publish.call_count, 2)
+
+    @patch(f'{WATCHDOG}.call')
+    @patch('asyncio.create_subprocess_exec')
+    async def test_execute_async_pjsip(self, mock_exec, mock_call):
+        command = Mock(requests=[], task_uuid=None, absorbed=set())
+        mock_exec.return_value = self._new_process(b'')
+
+        await self.executor.execute_async(command, 'module reload res_pjsip.so')
+
+        mock_call.assert_called_once_with(
+            ['wazo-confgen', 'asterisk/pjsip.conf', '--invalidate'],
+            'wazo-confgen',
+            stdout=ANY,
+            close_fds=True,
+        )
+        mock_exec.assert_awaited_once_with(
+            'asterisk', '-rx', 'module reload res_pjsip.so', stdout=ANY, stderr=ANY
+        )
+
+    @patch('asyncio.create_subprocess_exec')
+    async def test_execute_async_reload_in_progress(self, mock_exec):
+        command = Mock(requests=[], task_uuid=None, absorbed=set(), attempts=1)
+        mock_exec.return_value = self._new_process(RELOAD_IN_PROGRESS_MSG.encode())
+
+        with self.assertRaises(RetryCommand) as context:
+            await self.executor.execute_async(command, 'dialplan reload', publish=False)
+
+        self.assertIs(context.exception.command, command)
+        self.assertEqual(mock_exec.await_count, 1)
+        self.bus_publisher.publish.assert_not_called()
+
+    @patch('asyncio.create_subprocess_exec')
+    async def test_execute_async_reload_in_progress_max_attempts(self, mock_exec):
+        command = Mock(
+            requests=[], task_uuid=None, absorbed=set(), attempts=MAX_ATTEMPTS + 1
+        )
+        mock_exec.return_value = self._new_process(RELOAD_IN_PROGRESS_MSG.encode())
+
+        await self.executor.execute_async(command, 'dialplan reload', publish=False)
+
+        self.assertEqual(mock_exec.await_count, 1)
+
+    @patch('asyncio.create_subprocess_exec')
+    async def test_execute_batch_async(self, mock_exec):
+        mock_exec.return_value = self._new_process(b'')
+        commands = [
+            Command(value, Mock(), self.executor, value)
+            for value in ('sccp reset SEP001', 'sccp reset SEP002')
+        ]
+
+        errors = await self.executor.execute_batch_async(commands)
+
+        self.assertEqual(errors, [None, None])
+        self.assertEqual(mock_exec.await_count, 2)
+        self.assertEqual(self.bus_publisher.publish.call_count, 4)
 
-        expected_args = ['asterisk', '-rx', sentinel.data]
-        mock_call.assert_called_once_with(expected_args, capture_output=True, text=True)
+    def _new_process(self, stdout):
+        process = Mock(returncode=0)
+        process.communicate = AsyncMock(return_value=(stdout, b''))
+        process.wait = AsyncMock(return_value=0)
+        return process
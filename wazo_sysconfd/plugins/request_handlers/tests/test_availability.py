@@ -0,0 +1,69 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import socket
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from wazo_sysconfd.plugins.request_handlers.availability import AsteriskAvailability
+
+
+class TestAsteriskAvailability(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp_dir.name, 'asterisk.ctl')
+        self.server = None
+        self.timer = Mock(return_value=100)
+        self.availability = AsteriskAvailability(
+            self.socket_path, cache_ttl=1, timer=self.timer
+        )
+
+    def tearDown(self):
+        self._stop_asterisk()
+        self.tmp_dir.cleanup()
+
+    def _start_asterisk(self):
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.socket_path)
+        self.server.listen()
+
+    def _stop_asterisk(self):
+        if self.server:
+            self.server.close()
+            self.server = None
+            os.unlink(self.socket_path)
+
+    def test_available(self):
+        self._start_asterisk()
+
+        self.assertTrue(self.availability.available)
+
+    def test_not_available_without_socket(self):
+        self.assertFalse(self.availability.available)
+
+    def test_not_available_with_stale_socket(self):
+        self._start_asterisk()
+        self.server.close()
+        self.server = None
+
+        self.assertFalse(self.availability.available)
+        os.unlink(self.socket_path)
+
+    def test_probe_is_cached(self):
+        self.assertFalse(self.availability.available)
+        self._start_asterisk()
+
+        self.timer.return_value = 100.5
+        self.assertFalse(self.availability.available)
+        self.timer.return_value = 101
+        self.assertTrue(self.availability.available)
+
+    def test_from_config(self):
+        availability = AsteriskAvailability.from_config(
+            {'socket_path': self.socket_path, 'retry_interval': 3}
+        )
+
+        self.assertEqual(availability.retry_interval, 3)
+        self.assertFalse(availability.available)
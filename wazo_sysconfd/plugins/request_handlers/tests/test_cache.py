@@ -0,0 +1,57 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+from unittest.mock import Mock
+
+from wazo_sysconfd.plugins.request_handlers.cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.timer = Mock(return_value=0)
+        self.cache = TTLCache(3, 10, timer=self.timer)
+
+    def test_get(self):
+        self.cache.set('a', 1)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+
+    def test_entries_expire(self):
+        self.cache.set('a', 1)
+        self.timer.return_value = 9
+        self.cache.set('b', 2)
+        self.timer.return_value = 10
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('b'), 2)
+
+    def test_expired_entries_are_evicted_on_set(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.timer.return_value = 10
+
+        self.cache.set('c', 3)
+
+        self.assertEqual(len(self.cache), 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.set('c', 3)
+        self.cache.get('a')
+
+        self.cache.set('d', 4)
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertNotIn('b', self.cache)
+        self.assertIn('a', self.cache)
+
+    def test_pop(self):
+        self.cache.set('a', 1)
+
+        self.assertEqual(self.cache.pop('a'), 1)
+        self.assertIsNone(self.cache.pop('a'))
@@ -1,10 +1,16 @@
-# Copyright 2015-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import threading
 import unittest
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock
 
-from wazo_sysconfd.plugins.request_handlers.command import Command, SimpleCommandFactory
+from wazo_sysconfd.plugins.request_handlers.command import (
+    Command,
+    CommandBatch,
+    RetryCommand,
+    SimpleCommandFactory,
+)
 
 
 class TestCommand(unittest.TestCase):
@@ -19,6 +25,8 @@ class TestCommand(unittest.TestCase):
         self.command.execute()
 
         self.executor.execute.assert_called_once_with(self.command, self.data)
+        self.request.notify_command_started.assert_called_once_with(self.command)
+        self.request.notify_command_executed.assert_called_once_with(self.command)
 
     def test_execute_catch_executor_exception(self):
         self.executor.execute.side_effect = Exception()
@@ -26,6 +34,8 @@ class TestCommand(unittest.TestCase):
         self.command.execute()
 
         self.executor.execute.assert_called_once_with(self.command, self.data)
+        self.request.notify_command_failed.assert_called_once_with(self.command)
+        self.request.notify_command_executed.assert_not_called()
 
     def test_execute_optimized(self):
         self.command.optimized = True
@@ -34,6 +44,152 @@ class TestCommand(unittest.TestCase):
 
         self.assertFalse(self.executor.execute.called)
 
+    def test_execute_retry(self):
+        self.executor.execute.side_effect = RetryCommand(self.command)
+
+        self.assertRaises(RetryCommand, self.command.execute)
+
+        self.assertEqual(self.command.attempts, 1)
+
+    def test_execute_delayed_is_not_an_attempt(self):
+        self.executor.execute.side_effect = RetryCommand(self.command, delay=1)
+
+        self.assertRaises(RetryCommand, self.command.execute)
+
+        self.assertEqual(self.command.attempts, 0)
+
+
+class TestCommandAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.request = Mock()
+        self.data = Mock()
+
+    async def test_execute_async(self):
+        executor = Mock(execute_async=AsyncMock())
+        command = Command('foo', self.request, executor, self.data)
+
+        await command.execute_async()
+
+        executor.execute_async.assert_awaited_once_with(command, self.data)
+
+    async def test_execute_async_sync_executor(self):
+        executor = Mock(spec=['execute'])
+        command = Command('foo', self.request, executor, self.data)
+
+        await command.execute_async()
+
+        executor.execute.assert_called_once_with(command, self.data)
+
+    async def test_execute_async_sync_executor_does_not_block_event_loop(self):
+        threads = []
+        executor = Mock(spec=['execute'])
+        executor.execute.side_effect = lambda *_: threads.append(
+            threading.current_thread()
+        )
+        command = Command('foo', self.request, executor, self.data)
+
+        await command.execute_async()
+
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    async def test_execute_async_catch_executor_exception(self):
+        executor = Mock(execute_async=AsyncMock(side_effect=Exception()))
+        command = Command('foo', self.request, executor, self.data)
+
+        await command.execute_async()
+
+        executor.execute_async.assert_awaited_once_with(command, self.data)
+
+    async def test_execute_async_optimized(self):
+        executor = Mock(execute_async=AsyncMock())
+        command = Command('foo', self.request, executor, self.data)
+        command.optimized = True
+
+        await command.execute_async()
+
+        executor.execute_async.assert_not_awaited()
+
+
+class TestCommandBatch(unittest.TestCase):
+    def setUp(self):
+        self.request = Mock()
+        self.executor = Mock(max_batch_size=2)
+
+    def _new_command(self, value, batch_key=None, executor=None):
+        command = Command(value, self.request, executor or self.executor, value)
+        command.batch_key = batch_key
+        return command
+
+    def test_split(self):
+        command1 = self._new_command('dialplan reload')
+        command2 = self._new_command('sccp reset 1', 'sccp reset')
+        command3 = self._new_command('sccp reset 2', 'sccp reset')
+        command4 = self._new_command('sccp reset 3', 'sccp reset')
+        command5 = self._new_command('sccp reset 4', 'sccp reset', Mock())
+        command6 = self._new_command('moh reload')
+
+        batches = CommandBatch.split(
+            [command1, command2, command3, command4, command5, command6]
+        )
+
+        self.assertEqual(
+            [batch.commands for batch in batches],
+            [
+                [command1],
+                [command2, command3],
+                [command4],
+                [command5],
+                [command6],
+            ],
+        )
+
+    def test_execute_single_command(self):
+        command = self._new_command('sccp reset 1', 'sccp reset')
+
+        CommandBatch([command]).execute()
+
+        self.executor.execute.assert_called_once_with(command, 'sccp reset 1')
+        self.executor.execute_batch.assert_not_called()
+
+    def test_execute(self):
+        command1 = self._new_command('sccp reset 1', 'sccp reset')
+        command2 = self._new_command('sccp reset 2', 'sccp reset')
+        command3 = self._new_command('sccp reset 3', 'sccp reset')
+        command3.optimized = True
+        self.executor.execute_batch.return_value = [None, Exception()]
+
+        CommandBatch([command1, command2, command3]).execute()
+
+        self.executor.execute_batch.assert_called_once_with([command1, command2])
+        self.request.notify_command_executed.assert_called_once_with(command1)
+        self.request.notify_command_failed.assert_called_once_with(command2)
+
+    def test_execute_retry(self):
+        command1 = self._new_command('sccp reset 1', 'sccp reset')
+        command2 = self._new_command('sccp reset 2', 'sccp reset')
+        self.executor.execute_batch.side_effect = RetryCommand(command1, delay=1)
+
+        self.assertRaises(RetryCommand, CommandBatch([command1, command2]).execute)
+
+        self.assertEqual([command1.attempts, command2.attempts], [0, 0])
+        self.request.notify_command_failed.assert_not_called()
+
+
+class TestCommandBatchAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_execute_async_sync_executor(self):
+        request = Mock()
+        executor = Mock(spec=['execute', 'execute_batch'])
+        executor.execute_batch.return_value = [None, None]
+        commands = [
+            Command('sccp reset 1', request, executor, 'sccp reset 1'),
+            Command('sccp reset 2', request, executor, 'sccp reset 2'),
+        ]
+
+        await CommandBatch(commands).execute_async()
+
+        executor.execute_batch.assert_called_once_with(commands)
+        self.assertEqual(request.notify_command_executed.call_count, 2)
+
 
 class TestSimpleCommandFactory(unittest.TestCase):
     def setUp(self):
@@ -0,0 +1,99 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import threading
+import time
+import unittest
+from unittest.mock import ANY, patch
+
+from wazo_sysconfd.plugins.request_handlers.confgen import ConfgenInvalidator
+from wazo_sysconfd.plugins.request_handlers.metrics import CONFGEN_WARM_UP_SAVED
+
+WATCHDOG = 'wazo_sysconfd.plugins.request_handlers.watchdog.Watchdog'
+
+
+@patch(f'{WATCHDOG}.call')
+class TestConfgenInvalidator(unittest.TestCase):
+    def setUp(self):
+        self.invalidator = ConfgenInvalidator('asterisk/pjsip.conf')
+
+    def test_wait_without_request(self, mock_call):
+        self.invalidator.wait()
+
+        mock_call.assert_called_once_with(
+            ['wazo-confgen', 'asterisk/pjsip.conf', '--invalidate'],
+            'wazo-confgen',
+            stdout=ANY,
+            close_fds=True,
+        )
+
+    def test_wait_after_request(self, mock_call):
+        self.invalidator.request()
+        self.invalidator.wait()
+
+        mock_call.assert_called_once()
+
+    def test_requests_during_invalidation_are_collapsed(self, mock_call):
+        started, release = threading.Event(), threading.Event()
+
+        def invalidate(*args, **kwargs):
+            started.set()
+            release.wait(1)
+
+        mock_call.side_effect = invalidate
+
+        self.invalidator.request()
+        started.wait(1)
+        for _ in range(3):
+            self.invalidator.request()
+        release.set()
+        self.invalidator.wait()
+
+        self.assertEqual(mock_call.call_count, 2)
+
+    def test_wait_again_invalidates_again(self, mock_call):
+        self.invalidator.request()
+        self.invalidator.wait()
+        self.invalidator.wait()
+
+        self.assertEqual(mock_call.call_count, 2)
+
+    def test_failed_invalidation_does_not_block(self, mock_call):
+        mock_call.side_effect = OSError()
+
+        self.invalidator.request()
+        self.invalidator.wait()
+
+
+@patch(f'{WATCHDOG}.call')
+class TestConfgenInvalidatorWarmUp(unittest.TestCase):
+    def setUp(self):
+        self.invalidator = ConfgenInvalidator('asterisk/pjsip.conf', warm_up=True)
+
+    def test_file_is_generated_after_invalidation(self, mock_call):
+        self.invalidator.wait()
+
+        self.assertEqual(
+            [c.args[0] for c in mock_call.call_args_list],
+            [
+                ['wazo-confgen', 'asterisk/pjsip.conf', '--invalidate'],
+                ['wazo-confgen', 'asterisk/pjsip.conf'],
+            ],
+        )
+
+    def test_time_saved_is_reported(self, mock_call):
+        mock_call.side_effect = lambda *args, **kwargs: time.sleep(0.05)
+        count = CONFGEN_WARM_UP_SAVED.count(filename='asterisk/pjsip.conf')
+
+        self.invalidator.request()
+        time.sleep(0.2)
+        with self.assertLogs(
+            'wazo_sysconfd.plugins.request_handlers.confgen', 'INFO'
+        ) as logs:
+            self.invalidator.wait()
+
+        self.assertEqual(
+            CONFGEN_WARM_UP_SAVED.count(filename='asterisk/pjsip.conf'), count + 1
+        )
+        saved = float(logs.records[0].args[1])
+        self.assertGreaterEqual(saved, 0.04)
@@ -0,0 +1,76 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from wazo_sysconfd.plugins.request_handlers.cost import CommandCostModel
+
+
+class TestCommandCostModel(unittest.TestCase):
+    def setUp(self):
+        self.timer = Mock(return_value=100)
+        self.model = CommandCostModel(
+            alpha=0.5, expensive_threshold=2, interval_factor=2, timer=self.timer
+        )
+
+    def test_record(self):
+        self.model.record('core reload', 4)
+        self.model.record('core reload', 8)
+
+        self.assertEqual(
+            self.model.stats(),
+            {'core reload': {'cost': 6, 'count': 2, 'min_interval': 12}},
+        )
+
+    def test_cheap_command_has_no_interval(self):
+        self.model.record('module reload app_queue.so', 0.1)
+
+        self.assertEqual(self.model.min_interval('module reload app_queue.so'), 0)
+        self.assertEqual(self.model.delay('module reload app_queue.so'), 0)
+
+    def test_delay(self):
+        self.model.record('core reload', 5)
+
+        self.timer.return_value = 104
+        self.assertEqual(self.model.delay('core reload'), 6)
+        self.timer.return_value = 111
+        self.assertEqual(self.model.delay('core reload'), 0)
+
+    def test_unknown_command(self):
+        self.assertEqual(self.model.delay('dialplan reload'), 0)
+
+
+class TestCommandCostModelPersistence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'costs.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_costs_are_restored(self):
+        CommandCostModel(self.path).record('core reload', 3)
+
+        model = CommandCostModel.from_config({'path': self.path})
+
+        self.assertEqual(model.stats()['core reload']['cost'], 3)
+        # the last execution is not restored
+        self.assertEqual(model.delay('core reload'), 0)
+
+    def test_invalid_file_is_ignored(self):
+        with open(self.path, 'w') as f:
+            f.write('{')
+
+        model = CommandCostModel.from_config({'path': self.path})
+
+        self.assertEqual(model.stats(), {})
+
+    def test_file_is_json(self):
+        CommandCostModel(self.path).record('dialplan reload', 1)
+
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {'dialplan reload': {'cost': 1, 'count': 1}})
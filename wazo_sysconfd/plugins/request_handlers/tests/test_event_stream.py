@@ -0,0 +1,106 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import threading
+import unittest
+from unittest.mock import Mock
+
+from wazo_sysconfd.plugins.request_handlers.event_stream import (
+    EventStream,
+    EventStreamPublisher,
+)
+
+
+def new_event(name, **payload):
+    event = Mock(marshal=Mock(return_value=payload))
+    event.name = name
+    return event
+
+
+class TestEventStream(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.event_stream = EventStream(buffer_size=2, keepalive=0.1)
+
+    async def test_stream(self):
+        stream = self.event_stream.stream()
+        next_message = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+
+        self.event_stream.publish(new_event('request_handlers_progress', uuid='u1'))
+
+        self.assertEqual(
+            await next_message,
+            'event: request_handlers_progress\ndata: {"uuid": "u1"}\n\n',
+        )
+        await stream.aclose()
+
+    async def test_stream_keepalive(self):
+        stream = self.event_stream.stream()
+
+        self.assertEqual(await stream.__anext__(), ': keepalive\n\n')
+        await stream.aclose()
+
+    async def test_publish_from_other_thread(self):
+        subscription = self.event_stream.subscribe()
+        event = new_event('request_handlers_progress', uuid='u1')
+
+        thread = threading.Thread(target=self.event_stream.publish, args=(event,))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(
+            await subscription.get(1), ('request_handlers_progress', {'uuid': 'u1'})
+        )
+
+    async def test_filter_by_request_uuid(self):
+        subscription = self.event_stream.subscribe(request_uuid='u1')
+
+        self.event_stream.publish(new_event('request_handlers_progress', uuid='u2'))
+        self.event_stream.publish(
+            new_event('asterisk_reload_progress', uuid='t1', request_uuids=['u1'])
+        )
+        await asyncio.sleep(0)
+
+        name, payload = await subscription.get(1)
+        self.assertEqual(name, 'asterisk_reload_progress')
+        self.assertIsNone(await subscription.get(0.01))
+
+    async def test_filter_by_resource_type(self):
+        subscription = self.event_stream.subscribe(resource_type='user')
+
+        self.event_stream.publish(
+            new_event('e', uuid='u1', context=[{'resource_type': 'meeting'}])
+        )
+        self.event_stream.publish(
+            new_event('e', uuid='u2', context=[{'resource_type': 'user'}])
+        )
+        await asyncio.sleep(0)
+
+        _, payload = await subscription.get(1)
+        self.assertEqual(payload['uuid'], 'u2')
+        self.assertIsNone(await subscription.get(0.01))
+
+    async def test_slow_subscriber_is_disconnected(self):
+        subscription = self.event_stream.subscribe()
+        stream = self.event_stream.stream(subscription)
+
+        for i in range(4):
+            self.event_stream.publish(new_event('e', uuid=f'u{i}'))
+        await asyncio.sleep(0)
+
+        self.assertTrue(subscription.closed)
+        self.assertEqual([message async for message in stream], [])
+
+
+class TestEventStreamPublisher(unittest.TestCase):
+    def test_publish(self):
+        bus_publisher = Mock()
+        event_stream = Mock()
+        publisher = EventStreamPublisher(bus_publisher, event_stream)
+        event = Mock()
+
+        publisher.publish(event, headers={'a': 'b'})
+
+        bus_publisher.publish.assert_called_once_with(event, headers={'a': 'b'})
+        event_stream.publish.assert_called_once_with(event)
@@ -1,4 +1,4 @@
-# Copyright 2023-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2023-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import unittest
@@ -7,17 +7,15 @@ from uuid import uuid4
 
 from wazo_sysconfd.bus import BusConsumer
 from wazo_sysconfd.plugins.request_handlers.events_handler import EventHandler
-from wazo_sysconfd.plugins.request_handlers.request import RequestHandlersProxy
 
 
 class TestEventHandler(unittest.TestCase):
     def setUp(self):
         self.handler_patcher = patch(
-            'wazo_sysconfd.plugins.request_handlers.events_handler.get_request_handlers_proxy',
-            new_callable=Mock(return_value=Mock(RequestHandlersProxy)),
+            'wazo_sysconfd.plugins.request_handlers.events_handler.forward_request'
         )
 
-        self.get_handlers_proxy = self.handler_patcher.start()
+        self.forward_request = self.handler_patcher.start()
         self.wazo_uuid = wazo_uuid = str(uuid4())
         self.consumer = consumer = Mock(BusConsumer)
         self.event_handler = EventHandler(wazo_uuid, consumer)
@@ -44,7 +42,7 @@ class TestEventHandler(unittest.TestCase):
 
         self.event_handler._on_asterisk_reload(event, headers)
 
-        self.get_handlers_proxy().handle_request.assert_not_called()
+        self.forward_request.assert_not_called()
 
     def test_on_asterisk_reload_progress_from_same_wazo(self):
         event = {
@@ -57,7 +55,7 @@ class TestEventHandler(unittest.TestCase):
 
         self.event_handler._on_asterisk_reload(event, headers)
 
-        self.get_handlers_proxy().handle_request.assert_not_called()
+        self.forward_request.assert_not_called()
 
     def test_on_asterisk_reload_progress_executing(self):
         command = 'module reload res_pjsip.so'
@@ -77,6 +75,46 @@ class TestEventHandler(unittest.TestCase):
             'ipbx': [event['command']],
             'request_uuids': event['request_uuids'],
         }
-        self.get_handlers_proxy().handle_request.assert_called_once_with(
+        self.forward_request.assert_called_once_with(
             expected_payload, {'publish': False}
         )
+
+    def test_on_asterisk_reload_progress_redelivered(self):
+        event = self._new_starting_event('dialplan reload', [str(uuid4())])
+        headers = {'origin_uuid': str(uuid4())}
+
+        self.event_handler._on_asterisk_reload(event, headers)
+        self.event_handler._on_asterisk_reload(event, headers)
+
+        self.forward_request.assert_called_once()
+
+    def test_on_asterisk_reload_progress_same_requests_from_other_task(self):
+        request_uuids = [str(uuid4()), str(uuid4())]
+        event1 = self._new_starting_event('dialplan reload', request_uuids)
+        event2 = self._new_starting_event('dialplan reload', request_uuids[::-1])
+
+        self.event_handler._on_asterisk_reload(event1, {'origin_uuid': str(uuid4())})
+        self.event_handler._on_asterisk_reload(event2, {'origin_uuid': str(uuid4())})
+
+        self.forward_request.assert_called_once()
+
+    def test_on_asterisk_reload_progress_other_requests(self):
+        request_uuid = str(uuid4())
+        event1 = self._new_starting_event('dialplan reload', [request_uuid])
+        event2 = self._new_starting_event('dialplan reload', [request_uuid, 'other'])
+        event3 = self._new_starting_event('module reload app_queue.so', [request_uuid])
+        headers = {'origin_uuid': str(uuid4())}
+
+        self.event_handler._on_asterisk_reload(event1, headers)
+        self.event_handler._on_asterisk_reload(event2, headers)
+        self.event_handler._on_asterisk_reload(event3, headers)
+
+        self.assertEqual(self.forward_request.call_count, 3)
+
+    def _new_starting_event(self, command, request_uuids):
+        return {
+            'uuid': str(uuid4()),
+            'status': 'starting',
+            'command': command,
+            'request_uuids': request_uuids,
+        }
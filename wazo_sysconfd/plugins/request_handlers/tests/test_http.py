@@ -0,0 +1,208 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+from fastapi import FastAPI
+
+from wazo_sysconfd.exceptions import HttpReqError
+from wazo_sysconfd.http_server import unicorn_exception_handler
+from wazo_sysconfd.plugins.request_handlers import http
+from wazo_sysconfd.plugins.request_handlers.dependencies import (
+    get_request_handlers_proxy,
+    provide_metrics,
+)
+from wazo_sysconfd.plugins.request_handlers.event_stream import EventStream
+from wazo_sysconfd.plugins.request_handlers.http import EventStreamResponse
+from wazo_sysconfd.plugins.request_handlers.request import (
+    RequestFactory,
+    RequestHandlers,
+)
+
+
+def new_event(name, **payload):
+    event = Mock(marshal=Mock(return_value=payload))
+    event.name = name
+    return event
+
+
+class HttpTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.proxy = Mock()
+        self.app = FastAPI()
+        self.app.include_router(http.router)
+        self.app.add_exception_handler(HttpReqError, unicorn_exception_handler)
+        self.app.dependency_overrides[get_request_handlers_proxy] = lambda: self.proxy
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.app), base_url='http://sysconfd'
+        )
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+
+class TestExecRequestHandlers(HttpTestCase):
+    async def test_invalid_priority(self):
+        request_handlers = RequestHandlers(
+            RequestFactory(Mock(), Mock()), Mock(), Mock()
+        )
+
+        async def handle_request_async(args, options, timeout, idempotency_key):
+            return request_handlers.handle_request(args, options)
+
+        self.proxy.handle_request_async = AsyncMock(side_effect=handle_request_async)
+
+        response = await self.client.post(
+            '/exec_request_handlers', json={'priority': 'bogus'}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    async def test_too_many_pending_requests(self):
+        self.proxy.handle_request_async = AsyncMock(
+            side_effect=HttpReqError(429, headers={'Retry-After': '5'})
+        )
+
+        response = await self.client.post('/exec_request_handlers', json={})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['retry-after'], '5')
+
+    async def test_idempotency_key(self):
+        self.proxy.handle_request_async = AsyncMock(
+            return_value={'request_uuid': 'uuid'}
+        )
+
+        response = await self.client.post(
+            '/exec_request_handlers', json={}, headers={'Idempotency-Key': 'key'}
+        )
+
+        self.assertEqual(response.json(), {'request_uuid': 'uuid'})
+        self.proxy.handle_request_async.assert_awaited_once_with({}, None, None, 'key')
+
+
+class TestExecRequestHandlersBatch(HttpTestCase):
+    async def test_invalid_request(self):
+        request_handlers = RequestHandlers(
+            RequestFactory(Mock(), Mock()), Mock(), Mock()
+        )
+
+        async def handle_requests_async(args_list, options, timeout):
+            return request_handlers.handle_requests(args_list, options)
+
+        self.proxy.handle_requests_async = AsyncMock(side_effect=handle_requests_async)
+
+        response = await self.client.post(
+            '/exec_request_handlers/batch', json=[{}, {'priority': 'bogus'}]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {'code': 400, 'message': 'invalid request at index 1'}
+        )
+
+    async def test_statuses(self):
+        statuses = [{'request_uuid': 'u1'}, {'request_uuid': 'u2'}]
+        self.proxy.handle_requests_async = AsyncMock(return_value=statuses)
+
+        response = await self.client.post(
+            '/exec_request_handlers/batch?timeout=5',
+            json=[{'ipbx': ['a']}, {'ipbx': ['b']}],
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), statuses)
+        self.proxy.handle_requests_async.assert_awaited_once_with(
+            [{'ipbx': ['a']}, {'ipbx': ['b']}], None, 5
+        )
+
+
+class TestStreamRequestHandlersEvents(HttpTestCase):
+    async def test_stream(self):
+        async def stream_events(subscription):
+            yield 'event: e\ndata: {}\n\n'
+
+        self.proxy.subscribe_events.return_value = EventStream().subscribe()
+        self.proxy.stream_events = stream_events
+
+        response = await self.client.get(
+            '/exec_request_handlers/events?request_uuid=u1'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response.headers['content-type'].startswith('text/event-stream')
+        )
+        self.assertEqual(response.headers['cache-control'], 'no-cache')
+        self.assertEqual(response.text, 'event: e\ndata: {}\n\n')
+        self.proxy.subscribe_events.assert_called_once_with('u1', None)
+
+
+class TestGetRequestHandlersCosts(HttpTestCase):
+    async def test_costs(self):
+        costs = {'core reload': {'cost': 3.0, 'count': 2, 'min_interval': 3.0}}
+        self.proxy.get_command_costs.return_value = costs
+
+        response = await self.client.get('/exec_request_handlers/costs')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), costs)
+
+
+class TestGetRequestHandlersStatus(HttpTestCase):
+    async def test_status(self):
+        self.proxy.get_request_status.return_value = {'request_uuid': 'u1'}
+
+        response = await self.client.get('/exec_request_handlers/u1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'request_uuid': 'u1'})
+        self.proxy.get_request_status.assert_called_once_with('u1')
+
+    async def test_unknown_request(self):
+        self.proxy.get_request_status.return_value = None
+
+        response = await self.client.get('/exec_request_handlers/u1')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class TestGetMetrics(HttpTestCase):
+    async def test_metrics(self):
+        self.app.dependency_overrides[provide_metrics] = lambda: 'a_total 1\n'
+
+        response = await self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'a_total 1\n')
+        self.assertTrue(response.headers['content-type'].startswith('text/plain'))
+
+
+class TestEventStreamResponse(unittest.IsolatedAsyncioTestCase):
+    async def test_disconnected_subscriber_closes_response(self):
+        event_stream = EventStream(buffer_size=1, keepalive=10)
+        subscription = event_stream.subscribe()
+        response = EventStreamResponse(subscription, event_stream.stream(subscription))
+        messages = []
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+            if message.get('body'):
+                # the client stopped reading
+                await asyncio.Event().wait()
+
+        call = asyncio.ensure_future(response({'type': 'http'}, receive, send))
+        event_stream.publish(new_event('e', uuid='u1'))
+        await asyncio.sleep(0.01)
+        for i in range(2, 4):
+            event_stream.publish(new_event('e', uuid=f'u{i}'))
+
+        await asyncio.wait_for(call, 1)
+        self.assertTrue(subscription.closed)
+        self.assertEqual(len(messages), 2)
@@ -0,0 +1,78 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+from unittest.mock import Mock
+
+from wazo_sysconfd.plugins.request_handlers.command import Command
+from wazo_sysconfd.plugins.request_handlers.index import RequestIndex
+from wazo_sysconfd.plugins.request_handlers.request import Request, RequestObserver
+
+
+class TestRequestIndex(unittest.TestCase):
+    def setUp(self):
+        self.executor = Mock()
+        self.index = RequestIndex(max_keys=10, key_ttl=600)
+
+    def _new_request(self, value='dialplan reload'):
+        request = Request([])
+        request.commands.append(Command(value, request, self.executor, value))
+        return request
+
+    def test_digest(self):
+        self.assertEqual(
+            self.index.digest({'ipbx': ['dialplan reload'], 'context': {'a': 1}}, {}),
+            self.index.digest({'context': {'a': 1}, 'ipbx': ['dialplan reload']}, {}),
+        )
+        self.assertNotEqual(
+            self.index.digest({'ipbx': ['dialplan reload']}, {}),
+            self.index.digest({'ipbx': ['moh reload']}, {}),
+        )
+
+    def test_join_pending_request(self):
+        request = self._new_request()
+        self.index.add(request, 'digest')
+        observer = Mock(RequestObserver)
+
+        request_uuid = self.index.join('digest', observers=[observer])
+
+        self.assertEqual(request_uuid, request.uuid)
+        request.execute()
+        observer.on_request_executed.assert_called_once_with(request)
+
+    def test_started_request_is_not_joined(self):
+        request = self._new_request()
+        self.index.add(request, 'digest')
+
+        request.commands[0].execute()
+
+        self.assertIsNone(self.index.join('digest'))
+
+    def test_unknown_request(self):
+        self.index.add(self._new_request(), 'digest')
+
+        self.assertIsNone(self.index.join('other digest'))
+
+    def test_request_without_commands_is_not_indexed(self):
+        self.index.add(Request([]), 'digest')
+
+        self.assertIsNone(self.index.join('digest'))
+
+    def test_join_executed_request_by_idempotency_key(self):
+        request = self._new_request()
+        self.index.add(request, 'digest', 'key')
+        request.execute()
+        observer = Mock(RequestObserver)
+
+        request_uuid = self.index.join('other digest', 'key', [observer])
+
+        self.assertEqual(request_uuid, request.uuid)
+        observer.on_request_executed.assert_called_once_with(request)
+
+    def test_idempotency_key_of_joined_request(self):
+        request = self._new_request()
+        self.index.add(request, 'digest')
+        self.index.join('digest', 'key')
+        request.execute()
+
+        self.assertEqual(self.index.join('other digest', 'key'), request.uuid)
@@ -0,0 +1,120 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from wazo_sysconfd.plugins.request_handlers.journal import RequestJournal
+
+
+class TestRequestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'journal', 'request-handlers.journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_open_empty(self):
+        journal = RequestJournal(self.path)
+
+        self.assertEqual(journal.open(), [])
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_unfinished_request_is_replayed(self):
+        journal = RequestJournal(self.path)
+        journal.open()
+        args = {'ipbx': ['dialplan reload'], 'context': [{'resource_type': 'x'}]}
+
+        journal.request_accepted('uuid-1', args, {}).result(1)
+
+        records = RequestJournal(self.path).open()
+        self.assertEqual(
+            records,
+            [{'type': 'accepted', 'uuid': 'uuid-1', 'args': args, 'options': {}}],
+        )
+
+    def test_completed_request_is_not_replayed(self):
+        journal = RequestJournal(self.path)
+        journal.open()
+
+        journal.request_accepted('uuid-1', {'ipbx': ['dialplan reload']}, {})
+        journal.request_executed('uuid-1')
+        journal.request_accepted('uuid-2', {}, {}).result(1)
+
+        records = RequestJournal(self.path).open()
+        self.assertEqual([record['uuid'] for record in records], ['uuid-2'])
+
+    def test_executed_commands_are_not_replayed(self):
+        journal = RequestJournal(self.path)
+        journal.open()
+        args = {
+            'ipbx': ['module reload res_pjsip.so', 'moh reload'],
+            'chown_autoprov_config': ['something'],
+            'context': [{'resource_type': 'x'}],
+        }
+
+        journal.request_accepted('uuid-1', args, {})
+        journal.command_executed(
+            'uuid-1', ['core reload', 'module reload res_pjsip.so']
+        )
+        journal.request_accepted('uuid-2', {}, {}).result(1)
+
+        records = RequestJournal(self.path).open()
+        self.assertEqual(
+            records[0]['args'],
+            {
+                'ipbx': ['moh reload'],
+                'chown_autoprov_config': ['something'],
+                'context': [{'resource_type': 'x'}],
+            },
+        )
+
+    def test_truncated_record_is_ignored(self):
+        journal = RequestJournal(self.path)
+        journal.open()
+        journal.request_accepted('uuid-1', {}, {}).result(1)
+        with open(self.path, 'a') as f:
+            f.write('{"type": "accep')
+
+        records = RequestJournal(self.path).open()
+
+        self.assertEqual([record['uuid'] for record in records], ['uuid-1'])
+
+    def test_records_are_committed_in_groups(self):
+        journal = RequestJournal(self.path, commit_delay=0.05)
+        journal.open()
+        futures = []
+
+        def accept(i):
+            futures.append(journal.request_accepted(f'uuid-{i}', {}, {}))
+
+        with patch('os.fsync') as fsync:
+            threads = [threading.Thread(target=accept, args=(i,)) for i in range(50)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for future in futures:
+                future.result(1)
+
+        self.assertLess(fsync.call_count, 10)
+        self.assertEqual(len(RequestJournal(self.path).open()), 50)
+
+    def test_journal_is_compacted(self):
+        journal = RequestJournal(self.path, compact_threshold=10)
+        journal.open()
+
+        for i in range(100):
+            journal.request_accepted(f'uuid-{i}', {}, {})
+            journal.request_executed(f'uuid-{i}')
+        journal.request_accepted('uuid-pending', {}, {}).result(1)
+
+        with open(self.path) as f:
+            self.assertLess(len(f.readlines()), 100)
+        records = RequestJournal(self.path).open()
+        self.assertEqual([record['uuid'] for record in records], ['uuid-pending'])
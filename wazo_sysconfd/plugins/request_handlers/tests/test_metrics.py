@@ -0,0 +1,74 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from wazo_sysconfd.plugins.request_handlers.metrics import (
+    Counter,
+    Histogram,
+    Registry,
+    expose_family,
+)
+
+
+class TestCounter(unittest.TestCase):
+    def test_expose(self):
+        counter = Counter('requests_total', 'Requests', ('outcome',))
+
+        counter.inc(outcome='executed')
+        counter.inc(2, outcome='executed')
+        counter.inc(outcome='fail"ed')
+
+        self.assertEqual(
+            counter.expose(),
+            '# HELP requests_total Requests\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{outcome="executed"} 3\n'
+            'requests_total{outcome="fail\\"ed"} 1\n',
+        )
+        self.assertEqual(counter.value(outcome='executed'), 3)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_expose(self):
+        histogram = Histogram(
+            'duration_seconds', 'Duration', ('command',), buckets=(1, 5)
+        )
+
+        histogram.observe(0.5, command='a')
+        histogram.observe(1, command='a')
+        histogram.observe(3, command='a')
+        histogram.observe(10, command='a')
+
+        self.assertEqual(
+            histogram.expose(),
+            '# HELP duration_seconds Duration\n'
+            '# TYPE duration_seconds histogram\n'
+            'duration_seconds_bucket{command="a",le="1"} 2\n'
+            'duration_seconds_bucket{command="a",le="5"} 3\n'
+            'duration_seconds_bucket{command="a",le="+Inf"} 4\n'
+            'duration_seconds_sum{command="a"} 14.5\n'
+            'duration_seconds_count{command="a"} 4\n',
+        )
+        self.assertEqual(histogram.count(command='a'), 4)
+
+
+class TestRegistry(unittest.TestCase):
+    def test_expose(self):
+        registry = Registry()
+        Counter('a_total', 'A', registry=registry).inc()
+        Counter('b_total', 'B', registry=registry)
+
+        self.assertEqual(
+            registry.expose(),
+            '# HELP a_total A\n# TYPE a_total counter\na_total 1\n'
+            '# HELP b_total B\n# TYPE b_total counter\n',
+        )
+
+
+class TestExposeFamily(unittest.TestCase):
+    def test_expose_family(self):
+        self.assertEqual(
+            expose_family('depth', 'gauge', 'Depth', [('', {'lane': 'x'}, 2)]),
+            '# HELP depth Depth\n# TYPE depth gauge\ndepth{lane="x"} 2\n',
+        )
@@ -0,0 +1,135 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import ANY, Mock, call
+
+from wazo_sysconfd.plugins.request_handlers.outbox import BusOutbox, SpilledEvent
+
+
+def new_event(name, **payload):
+    event = Mock(
+        routing_key=f'sysconfd.{name}',
+        headers={'name': name},
+        marshal=Mock(return_value=payload),
+    )
+    event.name = name
+    return event
+
+
+class TestBusOutbox(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spill_path = os.path.join(self.directory, 'bus-outbox.spill')
+        self.bus_publisher = Mock()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_publish_does_not_publish_inline(self):
+        outbox = BusOutbox(self.bus_publisher)
+
+        outbox.publish('event', headers={'a': 'b'})
+
+        self.bus_publisher.publish.assert_not_called()
+        self.assertEqual(outbox.stats()['depth'], 1)
+
+    def test_publish_batch(self):
+        outbox = BusOutbox(self.bus_publisher, batch_size=2)
+        for event in ('e1', 'e2', 'e3'):
+            outbox.publish(event)
+
+        outbox._run_once()
+
+        self.bus_publisher.publish.assert_has_calls(
+            [call('e1', headers=None), call('e2', headers=None)]
+        )
+        stats = outbox.stats()
+        self.assertEqual(stats['depth'], 1)
+        self.assertEqual(stats['published'], 2)
+        self.assertIsNotNone(stats['publish_latency'])
+
+    def test_full_outbox_drops_oldest_events(self):
+        outbox = BusOutbox(self.bus_publisher, max_size=2)
+
+        for event in ('e1', 'e2', 'e3'):
+            outbox.publish(event)
+        outbox._run_once()
+
+        self.bus_publisher.publish.assert_has_calls(
+            [call('e2', headers=None), call('e3', headers=None)]
+        )
+        self.assertEqual(outbox.stats()['dropped'], 1)
+
+    def test_failed_events_are_published_again(self):
+        outbox = BusOutbox(self.bus_publisher)
+        self.bus_publisher.publish.side_effect = [None, Exception(), None, None]
+        for event in ('e1', 'e2', 'e3'):
+            outbox.publish(event)
+
+        outbox._run_once()
+        outbox._run_once()
+
+        self.assertEqual(
+            [c.args[0] for c in self.bus_publisher.publish.call_args_list],
+            ['e1', 'e2', 'e2', 'e3'],
+        )
+
+    def test_failed_events_are_spilled_and_published_in_order(self):
+        outbox = BusOutbox(self.bus_publisher, spill_path=self.spill_path)
+        self.bus_publisher.publish.side_effect = Exception()
+        outbox.publish(new_event('e1'))
+        outbox.publish(new_event('e2'), headers={'a': 'b'})
+
+        outbox._run_once()
+
+        self.assertEqual(outbox.stats()['spilled'], 2)
+        self.assertTrue(os.path.exists(self.spill_path))
+
+        self.bus_publisher.publish.reset_mock(side_effect=True)
+        outbox.publish(new_event('e3'))
+        outbox._run_once()
+        outbox._run_once()
+
+        self.assertEqual(
+            [
+                (c.args[0].name, c.kwargs['headers'])
+                for c in self.bus_publisher.publish.call_args_list
+            ],
+            [('e1', None), ('e2', {'a': 'b'}), ('e3', None)],
+        )
+        self.assertEqual(outbox.stats()['spilled'], 0)
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_spilled_events_are_published_after_restart(self):
+        outbox = BusOutbox(self.bus_publisher, spill_path=self.spill_path)
+        self.bus_publisher.publish.side_effect = Exception()
+        outbox.publish(new_event('e1', uuid='u1'))
+        outbox._run_once()
+
+        self.bus_publisher.publish.reset_mock(side_effect=True)
+        outbox = BusOutbox(self.bus_publisher, spill_path=self.spill_path)
+        outbox._load_spilled_count()
+        outbox._run_once()
+
+        self.bus_publisher.publish.assert_called_once_with(ANY, headers=None)
+        event = self.bus_publisher.publish.call_args.args[0]
+        self.assertIsInstance(event, SpilledEvent)
+        self.assertEqual(event.name, 'e1')
+        self.assertEqual(event.routing_key, 'sysconfd.e1')
+        self.assertEqual(event.headers, {'name': 'e1'})
+        self.assertEqual(event.marshal(), {'uuid': 'u1'})
+
+    def test_spill_file_is_json(self):
+        outbox = BusOutbox(self.bus_publisher, spill_path=self.spill_path)
+        self.bus_publisher.publish.side_effect = Exception()
+        outbox.publish(new_event('e1', uuid='u1'))
+
+        outbox._run_once()
+
+        with open(self.spill_path) as f:
+            self.assertEqual(json.loads(f.readline())['payload'], {'uuid': 'u1'})
@@ -1,20 +1,31 @@
-# Copyright 2015-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import asyncio
+import concurrent.futures
+import threading
+import time
 import unittest
-from unittest.mock import ANY, Mock, sentinel
+from unittest.mock import ANY, AsyncMock, Mock, call, sentinel
 
-from wazo_sysconfd.plugin_helpers.exceptions import HttpReqError
-from wazo_sysconfd.plugins.request_handlers.command import Command
+from wazo_sysconfd.exceptions import HttpReqError
+from wazo_sysconfd.plugins.request_handlers.command import Command, RetryCommand
+from wazo_sysconfd.plugins.request_handlers.index import RequestIndex
 from wazo_sysconfd.plugins.request_handlers.request import (
+    AsyncRequestProcessor,
+    AsyncRequestQueue,
     DuplicateRequestOptimizer,
     Request,
     RequestFactory,
     RequestHandlers,
+    RequestHandlersProxy,
+    RequestPart,
     RequestProcessor,
     RequestQueue,
+    RequestQueueFull,
+    RequestResultObserver,
     SyncRequestHandlers,
-    SyncRequestObserver,
+    request_tenant,
 )
 
 
@@ -38,6 +49,125 @@ class TestRequest(unittest.TestCase):
 
         request.observer.on_request_executed()
 
+    def test_execute_resumes_after_retry(self):
+        command1 = Mock()
+        command2 = Mock()
+        command2.execute.side_effect = [RetryCommand(command2), None]
+        request = Request([command1, command2])
+
+        self.assertRaises(RetryCommand, request.execute)
+        request.execute()
+
+        command1.execute.assert_called_once_with()
+        self.assertEqual(command2.execute.call_count, 2)
+
+    def test_completed_by_merged_command(self):
+        executor = Mock()
+        optimizer = DuplicateRequestOptimizer(executor)
+        request1 = Request([])
+        request2 = Request([])
+        request1.commands = [Command('a', request1, executor, 'a')]
+        request2.commands = [Command('a', request2, executor, 'a')]
+        request2.observers.append(Mock())
+        optimizer.on_request_put(request1)
+        optimizer.on_request_put(request2)
+
+        request1.execute()
+
+        self.assertTrue(request2.completed)
+        request2.observers[0].on_request_executed.assert_called_once_with(request2)
+        request2.execute()
+        request2.observers[0].on_request_executed.assert_called_once_with(request2)
+
+    def test_not_completed_before_merged_command(self):
+        executor = Mock()
+        optimizer = DuplicateRequestOptimizer(executor)
+        request1 = Request([])
+        request2 = Request([])
+        request1.commands = [
+            Command('b', request1, executor, 'b'),
+            Command('a', request1, executor, 'a'),
+        ]
+        request2.commands = [Command('a', request2, executor, 'a')]
+        optimizer.on_request_put(request1)
+        optimizer.on_request_put(request2)
+
+        request2.execute()
+
+        self.assertFalse(request2.completed)
+
+        request1.execute()
+
+        self.assertTrue(request1.completed)
+        self.assertTrue(request2.completed)
+
+    def test_not_completed_until_all_commands_are_finished(self):
+        executor = Mock()
+        request = Request([])
+        command1 = Command('a', request, executor, 'a')
+        command2 = Command('b', request, executor, 'b')
+        request.commands = [command1, command2]
+
+        command1.execute()
+
+        self.assertFalse(request.completed)
+
+
+class TestRequestAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_execute_async(self):
+        command = Mock(execute_async=AsyncMock())
+        observer = Mock()
+        request = Request([command])
+        request.observers.append(observer)
+
+        await request.execute_async()
+
+        command.execute_async.assert_awaited_once_with()
+        observer.on_request_executed.assert_called_once_with(request)
+
+
+class TestRequestPart(unittest.TestCase):
+    def test_execute(self):
+        request = Mock()
+        command = Mock()
+        part = RequestPart(request, [command], last=False)
+
+        part.execute()
+
+        command.execute.assert_called_once_with()
+        self.assertTrue(part.done)
+        request.notify_executed.assert_not_called()
+
+    def test_execute_last_part(self):
+        request = Mock()
+        part = RequestPart(request, [], last=True)
+
+        part.execute()
+
+        request.complete.assert_called_once_with()
+
+    def test_ready(self):
+        previous = RequestPart(Mock(), [], last=False)
+        part = RequestPart(Mock(), [], previous)
+
+        self.assertTrue(previous.ready)
+        self.assertFalse(part.ready)
+
+        previous.execute()
+
+        self.assertTrue(part.ready)
+
+    def test_execute_retry(self):
+        request = Mock()
+        command = Mock()
+        command.execute.side_effect = RetryCommand(command)
+        part = RequestPart(request, [command], last=True)
+
+        self.assertRaises(RetryCommand, part.execute)
+
+        self.assertFalse(part.done)
+        request.notify_executed.assert_not_called()
+
 
 class TestRequestFactory(unittest.TestCase):
     def setUp(self):
@@ -91,6 +221,35 @@ class TestRequestFactory(unittest.TestCase):
 
         self.assertEqual(request.commands, [sentinel.command])
 
+    def test_new_request_priority(self):
+        args = {'ipbx': ['foo'], 'priority': 'low'}
+
+        request = self.request_factory.new_request(args)
+
+        self.assertEqual(request.priority, 'low')
+
+    def test_new_request_priority_inferred_from_commands(self):
+        command1 = Mock(priority=None)
+        command2 = Mock(priority='high')
+        self.asterisk_command_factory.new_command.side_effect = [command1, command2]
+        args = {'ipbx': ['foo', 'sccp reset'], 'chown_autoprov_config': []}
+
+        request = self.request_factory.new_request(args)
+
+        self.assertEqual(request.priority, 'high')
+
+    def test_new_request_default_priority(self):
+        self.asterisk_command_factory.new_command.return_value = Mock(priority=None)
+
+        request = self.request_factory.new_request({'ipbx': ['foo']})
+
+        self.assertEqual(request.priority, 'normal')
+
+    def test_new_request_invalid_priority(self):
+        args = {'ipbx': ['foo'], 'priority': 'urgent'}
+
+        self.assertRaises(ValueError, self.request_factory.new_request, args)
+
 
 class TestDuplicateRequestOptimizer(unittest.TestCase):
     def setUp(self):
@@ -115,6 +274,7 @@ class TestDuplicateRequestOptimizer(unittest.TestCase):
         self.assertFalse(cmd1.optimized)
         self.assertTrue(cmd2.optimized)
         assert cmd1.requests == {request1, request2}
+        self.assertEqual(self.optimizer.merged_count, 1)
 
     def test_on_request_put_same_commands_different_executor(self):
         cmd1 = self._new_command('a')
@@ -168,6 +328,201 @@ class TestDuplicateRequestOptimizer(unittest.TestCase):
         return request.commands
 
 
+class TestDuplicateRequestOptimizerRetry(unittest.TestCase):
+    def setUp(self):
+        self.executor = Mock()
+        self.optimizer = DuplicateRequestOptimizer(self.executor)
+
+    def _new_request(self, value):
+        request = Request([])
+        request.commands.append(Command(value, request, self.executor, value))
+        return request
+
+    def test_command_put_during_retry_is_merged(self):
+        request1 = self._new_request('dialplan reload')
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_get(request1)
+
+        self.optimizer.on_request_retry(request1)
+        request2 = self._new_request('dialplan reload')
+        self.optimizer.on_request_put(request2)
+
+        self.assertTrue(request2.commands[0].optimized)
+        self.assertEqual(request1.commands[0].requests, {request1, request2})
+
+    def test_executed_commands_are_not_pending_again(self):
+        request1 = self._new_request('dialplan reload')
+        request1.executed_count = 1
+
+        self.optimizer.on_request_retry(request1)
+        request2 = self._new_request('dialplan reload')
+        self.optimizer.on_request_put(request2)
+
+        self.assertFalse(request2.commands[0].optimized)
+
+
+class TestDuplicateRequestOptimizerSubsumptions(unittest.TestCase):
+    def setUp(self):
+        self.executor = Mock()
+        self.optimizer = DuplicateRequestOptimizer(
+            self.executor,
+            {
+                'restart': {'reload', 'a', 'b'},
+                'reload': {'a', 'b'},
+            },
+        )
+
+    def test_subsumed_command_put_after_subsuming_command(self):
+        request1 = self._new_request('reload')
+        request2 = self._new_request('a')
+        reload_cmd, a_cmd = request1.commands[0], request2.commands[0]
+
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_put(request2)
+
+        self.assertFalse(reload_cmd.optimized)
+        self.assertTrue(a_cmd.optimized)
+        self.assertEqual(reload_cmd.requests, {request1, request2})
+        self.assertEqual(reload_cmd.absorbed, {'a'})
+
+    def test_subsuming_command_put_after_subsumed_commands(self):
+        request1 = self._new_request('a')
+        request2 = self._new_request('b')
+        request3 = self._new_request('reload')
+        a_cmd, b_cmd = request1.commands[0], request2.commands[0]
+        reload_cmd = request3.commands[0]
+
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_put(request2)
+        self.optimizer.on_request_put(request3)
+
+        self.assertFalse(a_cmd.optimized)
+        self.assertEqual(a_cmd.value, 'reload')
+        self.assertEqual(a_cmd.data, 'reload')
+        self.assertEqual(a_cmd.requests, {request1, request2, request3})
+        self.assertEqual(a_cmd.absorbed, {'a', 'b'})
+        self.assertTrue(b_cmd.optimized)
+        self.assertTrue(reload_cmd.optimized)
+        self.assertEqual(self.optimizer.merged_count, 2)
+
+    def test_upgraded_command_is_released_on_get(self):
+        request1 = self._new_request('a')
+        request2 = self._new_request('reload')
+        request3 = self._new_request('reload')
+
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_put(request2)
+        self.optimizer.on_request_get(request1)
+        self.optimizer.on_request_put(request3)
+
+        self.assertFalse(request3.commands[0].optimized)
+
+    def test_subsumption_is_transitive(self):
+        request1 = self._new_request('a')
+        request2 = self._new_request('reload')
+        request3 = self._new_request('restart')
+        request4 = self._new_request('b')
+        a_cmd = request1.commands[0]
+
+        for request in (request1, request2, request3, request4):
+            self.optimizer.on_request_put(request)
+
+        self.assertEqual(a_cmd.value, 'restart')
+        self.assertEqual(a_cmd.absorbed, {'a', 'reload', 'b'})
+        self.assertEqual(a_cmd.requests, {request1, request2, request3, request4})
+
+    def test_unrelated_commands(self):
+        request1 = self._new_request('a')
+        request2 = self._new_request('b')
+
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_put(request2)
+
+        self.assertFalse(request1.commands[0].optimized)
+        self.assertFalse(request2.commands[0].optimized)
+
+    def _new_request(self, value):
+        request = Request([])
+        request.commands = [Command(value, request, self.executor, value)]
+        return request
+
+
+class TestDuplicateRequestOptimizerPriority(unittest.TestCase):
+    def setUp(self):
+        self.executor = Mock()
+        self.optimizer = DuplicateRequestOptimizer(
+            self.executor, {'reload': {'a', 'b'}}
+        )
+
+    def test_same_command_of_more_urgent_request_is_kept(self):
+        request1 = self._new_request('a', 'low')
+        request2 = self._new_request('a', 'high')
+        low_cmd, high_cmd = request1.commands[0], request2.commands[0]
+
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_put(request2)
+
+        self.assertTrue(low_cmd.optimized)
+        self.assertFalse(high_cmd.optimized)
+        self.assertEqual(high_cmd.requests, {request1, request2})
+
+    def test_same_command_of_less_urgent_request_is_merged(self):
+        request1 = self._new_request('a', 'normal')
+        request2 = self._new_request('a', 'low')
+
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_put(request2)
+
+        self.assertFalse(request1.commands[0].optimized)
+        self.assertTrue(request2.commands[0].optimized)
+
+    def test_subsumed_command_of_more_urgent_request_is_upgraded(self):
+        request1 = self._new_request('reload', 'low')
+        request2 = self._new_request('a', 'high')
+        reload_cmd, a_cmd = request1.commands[0], request2.commands[0]
+
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_put(request2)
+
+        self.assertTrue(reload_cmd.optimized)
+        self.assertFalse(a_cmd.optimized)
+        self.assertEqual(a_cmd.value, 'reload')
+        self.assertEqual(a_cmd.absorbed, {'a'})
+        self.assertEqual(a_cmd.requests, {request1, request2})
+
+    def test_subsuming_command_of_more_urgent_request_is_kept(self):
+        request1 = self._new_request('a', 'low')
+        request2 = self._new_request('reload', 'high')
+        a_cmd, reload_cmd = request1.commands[0], request2.commands[0]
+
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_put(request2)
+
+        self.assertTrue(a_cmd.optimized)
+        self.assertFalse(reload_cmd.optimized)
+        self.assertEqual(reload_cmd.requests, {request1, request2})
+
+    def test_request_aged_before_more_urgent_request_is_not_completed_early(self):
+        request1 = self._new_request('a', 'low')
+        request2 = self._new_request('a', 'high')
+        self.optimizer.on_request_put(request1)
+        self.optimizer.on_request_put(request2)
+
+        request1.execute()
+
+        self.assertFalse(request1.completed)
+
+        request2.execute()
+
+        self.assertTrue(request1.completed)
+        self.assertTrue(request2.completed)
+
+    def _new_request(self, value, priority):
+        request = Request([], priority=priority)
+        request.commands = [Command(value, request, self.executor, value)]
+        return request
+
+
 class TestRequestQueue(unittest.TestCase):
     def setUp(self):
         self.optimizer = Mock()
@@ -183,6 +538,385 @@ class TestRequestQueue(unittest.TestCase):
         self.assertEqual(request, sentinel.request)
         self.optimizer.on_request_get.assert_called_once_with(sentinel.request)
 
+    def test_put_many(self):
+        self.request_queue.put_many([sentinel.request1, sentinel.request2])
+
+        self.assertEqual(
+            self.optimizer.on_request_put.call_args_list,
+            [call(sentinel.request1), call(sentinel.request2)],
+        )
+        self.assertIs(self.request_queue.get(), sentinel.request1)
+        self.assertIs(self.request_queue.get(), sentinel.request2)
+
+
+class TestRequestQueueRetry(unittest.TestCase):
+    def setUp(self):
+        self.optimizer = Mock()
+        self.retry_backoff = Mock()
+        self.retry_backoff.delay.return_value = 0.1
+        self.request_queue = RequestQueue(
+            self.optimizer, retry_backoff=self.retry_backoff
+        )
+
+    def test_retry_does_not_block_other_requests(self):
+        self.request_queue.put(sentinel.request1)
+        self.request_queue.put(sentinel.request2)
+        request = self.request_queue.get()
+
+        self.request_queue.retry(request, 'default', 1)
+
+        self.retry_backoff.delay.assert_called_once_with(1)
+        self.optimizer.on_request_retry.assert_called_once_with(sentinel.request1)
+        self.assertIs(self.request_queue.get(), sentinel.request2)
+        start = time.monotonic()
+        self.assertIs(self.request_queue.get(), sentinel.request1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_retry_with_delay(self):
+        self.request_queue.put(sentinel.request)
+        request = self.request_queue.get()
+
+        self.request_queue.retry(request, 'default', 1, 0.2)
+
+        self.retry_backoff.delay.assert_not_called()
+        self.assertEqual(self.request_queue.retry_stats()['total_wait'], 0.2)
+
+    def test_retried_request_goes_first(self):
+        self.request_queue.put(sentinel.request1)
+        request = self.request_queue.get()
+        self.retry_backoff.delay.return_value = 0
+        self.request_queue.retry(request, 'default', 1)
+        self.request_queue.put(sentinel.request2)
+
+        self.assertIs(self.request_queue.get(), sentinel.request1)
+
+    def test_retry_stats(self):
+        self.request_queue.put(sentinel.request)
+        self.request_queue.retry(self.request_queue.get(), 'default', 1)
+
+        self.assertEqual(
+            self.request_queue.retry_stats(),
+            {'waiting': 1, 'retried': 1, 'total_wait': 0.1},
+        )
+
+
+class TestRequestQueueAdmission(unittest.TestCase):
+    def setUp(self):
+        self.executor = Mock()
+        self.optimizer = DuplicateRequestOptimizer(self.executor)
+
+    def test_too_many_pending_requests(self):
+        request_queue = RequestQueue(self.optimizer, max_pending=1, retry_after=3)
+        request_queue.put(self._new_request('a'))
+
+        with self.assertRaises(RequestQueueFull) as context:
+            request_queue.admit([self._new_request('b')])
+
+        self.assertEqual(context.exception.retry_after, 3)
+        self.assertEqual(request_queue.admission_stats()['rejected'], 1)
+
+    def test_too_many_pending_commands(self):
+        request_queue = RequestQueue(self.optimizer, max_pending_commands=2)
+        request_queue.put(self._new_request('a'))
+
+        request_queue.admit([self._new_request('b')])
+        self.assertRaises(
+            RequestQueueFull, request_queue.admit, [self._new_request('b', 'c')]
+        )
+
+    def test_request_merged_into_pending_commands_is_admitted(self):
+        request_queue = RequestQueue(self.optimizer, max_pending=1)
+        request_queue.put(self._new_request('a', 'b'))
+
+        request_queue.admit([self._new_request('b', 'a')])
+
+    def test_admission_stats(self):
+        request_queue = RequestQueue(
+            self.optimizer, max_pending=10, max_pending_commands=5
+        )
+        request_queue.put(self._new_request('a', 'b'))
+        request_queue.put(self._new_request('b'))
+
+        self.assertEqual(
+            request_queue.admission_stats(),
+            {
+                'pending': 2,
+                'max_pending': 10,
+                'pending_commands': 2,
+                'max_pending_commands': 5,
+                'rejected': 0,
+            },
+        )
+
+    def _new_request(self, *values):
+        request = Request([])
+        request.commands = [
+            Command(value, request, self.executor, value) for value in values
+        ]
+        return request
+
+
+class TestRequestQueuePriority(unittest.TestCase):
+    def setUp(self):
+        self.optimizer = Mock()
+        self.request_queue = RequestQueue(self.optimizer)
+
+    def test_get_most_urgent_request_first(self):
+        low = Request([], priority='low')
+        normal = Request([], priority='normal')
+        high = Request([], priority='high')
+        for request in (low, normal, high):
+            self.request_queue.put(request)
+
+        requests = [self.request_queue.get() for _ in range(3)]
+
+        self.assertEqual(requests, [high, normal, low])
+
+    def test_same_priority_is_fifo(self):
+        request1 = Request([], priority='low')
+        request2 = Request([], priority='low')
+        self.request_queue.put(request1)
+        self.request_queue.put(request2)
+
+        self.assertIs(self.request_queue.get(), request1)
+        self.assertIs(self.request_queue.get(), request2)
+
+    def test_waiting_request_is_aged(self):
+        request_queue = RequestQueue(self.optimizer, aging=0.05)
+        low = Request([], priority='low')
+        high = Request([], priority='high')
+        request_queue.put(low)
+        time.sleep(0.11)
+        request_queue.put(high)
+
+        self.assertIs(request_queue.get(), low)
+        self.assertIs(request_queue.get(), high)
+
+    def test_priority_stats(self):
+        self.request_queue.put(Request([], priority='high'))
+        self.request_queue.put(Request([], priority='low'))
+        self.request_queue.get()
+
+        stats = self.request_queue.priority_stats()
+
+        self.assertEqual(stats['high']['dispatched'], 1)
+        self.assertEqual(stats['high']['pending'], 0)
+        self.assertEqual(stats['low']['dispatched'], 0)
+        self.assertEqual(stats['low']['pending'], 1)
+        self.assertEqual(stats['normal']['average_wait'], 0)
+
+
+class TestRequestQueueFairness(unittest.TestCase):
+    def setUp(self):
+        self.optimizer = Mock()
+        self.request_queue = RequestQueue(self.optimizer)
+
+    def test_tenants_are_served_in_turn(self):
+        a1, a2, a3 = (self._new_request('a') for _ in range(3))
+        b1 = self._new_request('b')
+        for request in (a1, a2, a3, b1):
+            self.request_queue.put(request)
+
+        requests = [self.request_queue.get() for _ in range(4)]
+
+        self.assertEqual(requests, [a1, b1, a2, a3])
+
+    def test_tenants_are_served_by_weight(self):
+        request_queue = RequestQueue(self.optimizer, tenant_weights={'a': 2})
+        a1, a2, a3 = (self._new_request('a') for _ in range(3))
+        b1, b2 = (self._new_request('b') for _ in range(2))
+        for request in (a1, a2, a3, b1, b2):
+            request_queue.put(request)
+
+        requests = [request_queue.get() for _ in range(5)]
+
+        self.assertEqual(requests, [a1, a2, b1, a3, b2])
+
+    def test_tenant_is_charged_by_number_of_commands(self):
+        a1 = self._new_request('a', commands=[Mock(), Mock(), Mock()])
+        a2 = self._new_request('a')
+        b1, b2 = (self._new_request('b') for _ in range(2))
+        for request in (a1, a2, b1, b2):
+            self.request_queue.put(request)
+
+        requests = [self.request_queue.get() for _ in range(4)]
+
+        self.assertEqual(requests, [b1, b2, a1, a2])
+
+    def test_completed_request_is_dropped(self):
+        request1 = self._new_request('a')
+        request2 = self._new_request('b')
+        self.request_queue.put(request1)
+        self.request_queue.put(request2)
+        request1.notify_executed()
+
+        self.assertIs(self.request_queue.get(), request2)
+        self.assertEqual(self.request_queue.depths(), {'default': 0})
+
+    def test_tenant_stats(self):
+        self.request_queue.put(self._new_request('a'))
+        self.request_queue.put(self._new_request('b'))
+        self.request_queue.get()
+
+        stats = self.request_queue.tenant_stats()
+
+        self.assertEqual(stats['a']['dispatched'], 1)
+        self.assertEqual(stats['a']['pending'], 0)
+        self.assertEqual(stats['b']['dispatched'], 0)
+        self.assertEqual(stats['b']['pending'], 1)
+
+    def _new_request(self, tenant_uuid, commands=None):
+        return Request(commands or [], context=[{'tenant_uuid': tenant_uuid}])
+
+
+class TestRequestTenant(unittest.TestCase):
+    def test_tenant_uuid(self):
+        request = Request([], context=[{'resource_type': 'x', 'tenant_uuid': 't'}])
+
+        self.assertEqual(request_tenant(request), 't')
+
+    def test_tenant_uuid_of_resource(self):
+        context = [{'resource_type': 'x', 'resource_body': {'tenant_uuid': 't'}}]
+
+        self.assertEqual(request_tenant(Request([], context=context)), 't')
+
+    def test_no_tenant(self):
+        self.assertEqual(request_tenant(Request([])), 'default')
+        self.assertEqual(
+            request_tenant(Request([], context=[{'resource_type': 'x'}])), 'default'
+        )
+
+
+class TestRequestQueueLanes(unittest.TestCase):
+    def setUp(self):
+        self.optimizer = Mock()
+        self.asterisk_executor = Mock()
+        self.autoprov_executor = Mock()
+        self.request_queue = RequestQueue(
+            self.optimizer, lanes={self.autoprov_executor: 'autoprov'}
+        )
+
+    def test_lanes(self):
+        self.assertEqual(self.request_queue.lanes, ['default', 'autoprov'])
+
+    def test_put_splits_request_by_lane(self):
+        request = self._new_request(self.asterisk_executor, self.autoprov_executor)
+        self.request_queue.put(request)
+
+        self.assertEqual(self.request_queue.depths(), {'default': 1, 'autoprov': 1})
+
+        asterisk_part = self.request_queue.get('default')
+
+        self.assertEqual(asterisk_part.commands, request.commands[:1])
+        self.assertFalse(asterisk_part.last)
+        self.optimizer.on_request_put.assert_called_once_with(request)
+        self.optimizer.on_request_get.assert_called_once_with(asterisk_part)
+
+        asterisk_part.execute()
+        self.request_queue.task_done()
+        autoprov_part = self.request_queue.get('autoprov')
+
+        self.assertEqual(autoprov_part.commands, request.commands[1:])
+        self.assertTrue(autoprov_part.last)
+
+    def test_get_waits_for_previous_part_of_request(self):
+        request = self._new_request(self.asterisk_executor, self.autoprov_executor)
+        self.request_queue.put(request)
+        autoprov_parts = []
+        thread = threading.Thread(
+            target=lambda: autoprov_parts.append(self.request_queue.get('autoprov'))
+        )
+        thread.start()
+
+        thread.join(0.1)
+        self.assertEqual(autoprov_parts, [])
+
+        asterisk_part = self.request_queue.get('default')
+        asterisk_part.execute()
+        self.request_queue.task_done()
+
+        thread.join(1)
+        self.assertEqual(autoprov_parts[0].commands, request.commands[1:])
+
+    def test_get_does_not_wait_for_other_requests(self):
+        request1 = self._new_request(self.asterisk_executor)
+        request2 = self._new_request(self.autoprov_executor)
+        self.request_queue.put(request1)
+        self.request_queue.put(request2)
+
+        autoprov_part = self.request_queue.get('autoprov')
+
+        self.assertIs(autoprov_part.request, request2)
+        self.assertEqual(self.request_queue.depths(), {'default': 1, 'autoprov': 0})
+
+    def test_put_request_without_commands(self):
+        request = Request([])
+        self.request_queue.put(request)
+
+        part = self.request_queue.get('default')
+
+        self.assertIs(part.request, request)
+        self.assertTrue(part.last)
+
+    def _new_request(self, *executors):
+        request = Request([])
+        request.commands = [
+            Command(str(i), request, executor, str(i))
+            for i, executor in enumerate(executors)
+        ]
+        return request
+
+
+class TestRequestQueueDebounce(unittest.TestCase):
+    def setUp(self):
+        self.optimizer = Mock(merged_count=0)
+
+    def test_get_waits_for_debounce_window(self):
+        request_queue = RequestQueue(self.optimizer, debounce_window=0.2)
+        request_queue.put(sentinel.request)
+
+        start = time.monotonic()
+        request = request_queue.get()
+
+        self.assertEqual(request, sentinel.request)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_get_waits_for_requests_in_burst(self):
+        request_queue = RequestQueue(
+            self.optimizer, debounce_window=0.2, debounce_max_latency=5
+        )
+        request_queue.put(sentinel.request1)
+        timer = threading.Timer(0.1, request_queue.put, (sentinel.request2,))
+        timer.start()
+
+        start = time.monotonic()
+        request_queue.get()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+        self.optimizer.on_request_put.assert_any_call(sentinel.request2)
+
+    def test_get_does_not_wait_past_max_latency(self):
+        request_queue = RequestQueue(
+            self.optimizer, debounce_window=0.2, debounce_max_latency=0.3
+        )
+        request_queue.put(sentinel.request1)
+        stop = threading.Event()
+
+        def flood():
+            while not stop.wait(0.05):
+                request_queue.put(sentinel.request2)
+
+        threading.Thread(target=flood, daemon=True).start()
+        try:
+            start = time.monotonic()
+            request = request_queue.get()
+            elapsed = time.monotonic() - start
+        finally:
+            stop.set()
+
+        self.assertEqual(request, sentinel.request1)
+        self.assertLess(elapsed, 0.6)
+
 
 class ExitTestException(BaseException):
     pass
@@ -202,6 +936,65 @@ class TestRequestProcessor(unittest.TestCase):
         except ExitTestException:
             pass
 
+    def test_run_retry(self):
+        request = Mock()
+        command = Mock(attempts=2)
+        request.execute.side_effect = RetryCommand(command)
+        self.request_queue.get.side_effect = [request, ExitTestException()]
+
+        with self.assertRaises(ExitTestException):
+            self.request_processor.run('default')
+
+        self.request_queue.retry.assert_called_once_with(request, 'default', 2, None)
+        self.request_queue.task_done.assert_called_once_with()
+
+
+class TestAsyncRequestQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.optimizer = Mock(merged_count=0)
+        self.request_queue = AsyncRequestQueue(self.optimizer)
+        self.request_queue.bind(asyncio.get_running_loop())
+
+    async def test_put_and_get_async(self):
+        self.request_queue.put(sentinel.request)
+
+        request = await self.request_queue.get_async()
+
+        self.assertEqual(request, sentinel.request)
+        self.optimizer.on_request_get.assert_called_once_with(sentinel.request)
+
+    async def test_get_async_waits_for_put_from_other_thread(self):
+        timer = threading.Timer(0.1, self.request_queue.put, (sentinel.request,))
+        timer.start()
+
+        request = await asyncio.wait_for(self.request_queue.get_async(), 1)
+
+        self.assertEqual(request, sentinel.request)
+
+    async def test_get_async_waits_for_debounce_window(self):
+        request_queue = AsyncRequestQueue(self.optimizer, debounce_window=0.2)
+        request_queue.bind(asyncio.get_running_loop())
+        request_queue.put(sentinel.request)
+
+        start = time.monotonic()
+        request = await request_queue.get_async()
+
+        self.assertEqual(request, sentinel.request)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+
+class TestAsyncRequestProcessor(unittest.IsolatedAsyncioTestCase):
+    async def test_run(self):
+        request_queue = Mock()
+        request = Mock(execute_async=AsyncMock(side_effect=ExitTestException()))
+        request_queue.get_async = AsyncMock(return_value=request)
+        request_processor = AsyncRequestProcessor(request_queue)
+
+        with self.assertRaises(ExitTestException):
+            await request_processor.run()
+
+        request_queue.task_done.assert_called_once_with()
+
 
 class TestRequestHandlers(unittest.TestCase):
     def setUp(self):
@@ -220,6 +1013,16 @@ class TestRequestHandlers(unittest.TestCase):
             self.request_factory.new_request.return_value
         )
 
+    def test_handle_request_queue_full(self):
+        self.request_queue.admit.side_effect = RequestQueueFull(2.5)
+
+        with self.assertRaises(HttpReqError) as context:
+            self.request_handlers.handle_request(sentinel.args, None)
+
+        self.assertEqual(context.exception.code, 429)
+        self.assertEqual(context.exception.headers, {'Retry-After': '3'})
+        self.request_queue.put.assert_not_called()
+
     def test_handle_request_invalid(self):
         self.request_factory.new_request.side_effect = Exception()
 
@@ -228,16 +1031,237 @@ class TestRequestHandlers(unittest.TestCase):
         )
 
 
-class TestSyncRequestObserver(unittest.TestCase):
-    def test_without_timeout(self):
-        request = Mock()
-        observer = SyncRequestObserver()
+class TestRequestHandlersDeduplication(unittest.TestCase):
+    def setUp(self):
+        self.executor = Mock()
+        self.request_factory = Mock()
+        self.request_factory.new_request.side_effect = self._new_request
+        self.request_queue = Mock()
+        self.request_handlers = RequestHandlers(
+            self.request_factory,
+            self.request_queue,
+            Mock(),
+            request_index=RequestIndex(),
+        )
+
+    def _new_request(self, args):
+        request = Request([])
+        for value in args['ipbx']:
+            request.commands.append(Command(value, request, self.executor, value))
+        return request
+
+    def test_identical_pending_request(self):
+        body = {'ipbx': ['dialplan reload']}
+        request_uuid = self.request_handlers.handle_request(body, None)
+
+        self.assertEqual(self.request_handlers.handle_request(body, None), request_uuid)
+        self.request_factory.new_request.assert_called_once()
+        self.request_queue.put.assert_called_once()
+
+    def test_identical_started_request(self):
+        body = {'ipbx': ['dialplan reload']}
+        request_uuid = self.request_handlers.handle_request(body, None)
+        (request,), _ = self.request_queue.put.call_args
+        request.execute()
+
+        self.assertNotEqual(
+            self.request_handlers.handle_request(body, None), request_uuid
+        )
+
+    def test_idempotency_key(self):
+        request_uuid = self.request_handlers.handle_request(
+            {'ipbx': ['dialplan reload']}, None, idempotency_key='key'
+        )
+        (request,), _ = self.request_queue.put.call_args
+        request.execute()
+
+        self.assertEqual(
+            self.request_handlers.handle_request(
+                {'ipbx': ['moh reload']}, None, idempotency_key='key'
+            ),
+            request_uuid,
+        )
+
+    def test_identical_pending_request_with_result(self):
+        body = {'ipbx': ['dialplan reload']}
+        self.request_handlers.handle_request(body, None)
+        (request,), _ = self.request_queue.put.call_args
+
+        request_uuid, result = self.request_handlers.handle_request_with_result(
+            body, None
+        )
+        request.execute()
+
+        self.assertEqual(request_uuid, request.uuid)
+        self.assertEqual(
+            result.result(0), {'request_uuid': request.uuid, 'status': 'completed'}
+        )
+
+    def test_batch(self):
+        body = {'ipbx': ['dialplan reload']}
+        request_uuid = self.request_handlers.handle_request(body, None)
+
+        request_uuids = self.request_handlers.handle_requests(
+            [body, {'ipbx': ['moh reload']}], None
+        )
+
+        self.assertEqual(request_uuids[0], request_uuid)
+        (requests,), _ = self.request_queue.put_many.call_args
+        self.assertEqual([request.uuid for request in requests], request_uuids[1:])
+
+
+class TestRequestHandlersBatch(unittest.TestCase):
+    def setUp(self):
+        self.request_factory = Mock()
+        self.request_factory.new_request.side_effect = lambda args: Request([])
+        self.request_queue = Mock()
+        self.request_handlers = RequestHandlers(
+            self.request_factory, self.request_queue, Mock()
+        )
+
+    def test_handle_requests(self):
+        request_uuids = self.request_handlers.handle_requests(
+            [sentinel.args1, sentinel.args2], None
+        )
+
+        self.request_queue.put_many.assert_called_once_with(ANY)
+        (requests,), _ = self.request_queue.put_many.call_args
+        self.assertEqual(request_uuids, [request.uuid for request in requests])
+        self.request_queue.put.assert_not_called()
+
+    def test_handle_requests_invalid(self):
+        self.request_factory.new_request.side_effect = [Request([]), Exception()]
+
+        with self.assertRaises(HttpReqError) as context:
+            self.request_handlers.handle_requests(
+                [sentinel.args1, sentinel.args2], None
+            )
+
+        self.assertEqual(context.exception.message, 'invalid request at index 1')
+        self.request_queue.put_many.assert_not_called()
+
+    def test_handle_requests_with_result(self):
+        self.request_queue.put_many.side_effect = lambda requests: [
+            request.execute() for request in requests
+        ]
+
+        request_uuids, results = self.request_handlers.handle_requests_with_result(
+            [sentinel.args1, sentinel.args2], None
+        )
+
+        self.assertEqual(
+            [result.result(0) for result in results],
+            [
+                {'request_uuid': request_uuid, 'status': 'completed'}
+                for request_uuid in request_uuids
+            ],
+        )
+
+
+class TestRequestHandlersWithResult(unittest.TestCase):
+    def test_handle_request_with_result(self):
+        request = Request([])
+        request_factory = Mock()
+        request_factory.new_request.return_value = request
+        request_queue = Mock()
+        request_queue.put.side_effect = lambda request: request.execute()
+        request_handlers = RequestHandlers(request_factory, request_queue, Mock())
+
+        request_uuid, result = request_handlers.handle_request_with_result({}, None)
+
+        self.assertEqual(request_uuid, request.uuid)
+        self.assertEqual(
+            result.result(0), {'request_uuid': request.uuid, 'status': 'completed'}
+        )
+
+
+class TestRequestHandlersJournal(unittest.TestCase):
+    def setUp(self):
+        self.bus_publisher = Mock()
+        self.request_factory = Mock()
+        self.request = Mock(observers=[], uuid='uuid-1')
+        self.request_factory.new_request.return_value = self.request
+        self.request_queue = Mock()
+        self.journal = Mock()
+        self.request_handlers = RequestHandlers(
+            self.request_factory, self.request_queue, self.bus_publisher, self.journal
+        )
+
+    def test_handle_request_journals_request_before_queuing(self):
+        manager = Mock()
+        manager.attach_mock(self.journal.request_accepted, 'request_accepted')
+        manager.attach_mock(self.request_queue.put, 'put')
+
+        request_uuid = self.request_handlers.handle_request(
+            sentinel.args, {'sync': False}
+        )
+
+        self.assertEqual(request_uuid, 'uuid-1')
+        self.assertEqual(
+            [name for name, _, _ in manager.mock_calls],
+            ['request_accepted', 'put', 'request_accepted().result'],
+        )
+        self.journal.request_accepted.assert_called_once_with(
+            'uuid-1', sentinel.args, {'sync': False}
+        )
+
+    def test_replay_request_keeps_uuid(self):
+        record = {'uuid': 'uuid-2', 'args': sentinel.args, 'options': {}}
+
+        self.request_handlers.replay_request(record)
+
+        self.assertEqual(self.request.uuid, 'uuid-2')
+        self.request_queue.put.assert_called_once_with(self.request)
+        self.journal.request_accepted.assert_not_called()
+
+    def test_journal_observer(self):
+        self.request_handlers.handle_request(sentinel.args, None)
+        command = Mock(value='core reload', absorbed={'dialplan reload'})
+
+        for observer in self.request.observers:
+            observer.on_command_executed(self.request, command)
+            observer.on_request_executed(self.request)
+
+        self.journal.command_executed.assert_called_once_with(
+            'uuid-1', ['core reload', 'dialplan reload']
+        )
+        self.journal.request_executed.assert_called_once_with('uuid-1')
+
+
+class TestRequestResultObserver(unittest.TestCase):
+    def test_without_status_store(self):
+        request = Mock(uuid='uuid-1')
+        observer = RequestResultObserver()
+
         observer.on_request_executed(request)
-        self.assertTrue(observer.wait())
 
-    def test_with_timeout(self):
-        observer = SyncRequestObserver(0.1)
-        self.assertFalse(observer.wait())
+        self.assertEqual(
+            observer.future.result(0),
+            {'request_uuid': 'uuid-1', 'status': 'completed'},
+        )
+
+    def test_with_status_store(self):
+        request = Mock(uuid='uuid-1')
+        status_store = Mock()
+        observer = RequestResultObserver(status_store)
+
+        observer.on_request_executed(request)
+
+        status_store.get.assert_called_once_with('uuid-1')
+        self.assertEqual(observer.future.result(0), status_store.get.return_value)
+
+    def test_not_executed(self):
+        observer = RequestResultObserver()
+
+        self.assertRaises(concurrent.futures.TimeoutError, observer.future.result, 0.01)
+
+    def test_cancelled(self):
+        observer = RequestResultObserver()
+        observer.future.cancel()
+
+        observer.on_request_executed(Mock())
+
+        self.assertTrue(observer.future.cancelled())
 
 
 class TestSyncRequestHandlers(unittest.TestCase):
@@ -261,3 +1285,94 @@ class TestSyncRequestHandlers(unittest.TestCase):
         self.request_queue.put.assert_called_once_with(
             self.request_factory.new_request.return_value
         )
+
+    def test_handle_request_timeout(self):
+        self.request_queue.put.side_effect = None
+        request_handlers = SyncRequestHandlers(
+            self.request_factory, self.request_queue, self.bus_publisher, timeout=0.01
+        )
+
+        request_uuid = request_handlers.handle_request(sentinel.args, None)
+
+        self.assertEqual(
+            request_uuid, self.request_factory.new_request.return_value.uuid
+        )
+
+
+class TestRequestHandlersProxySynchronous(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.request_handlers = Mock()
+        self.status_store = Mock()
+        self.proxy = RequestHandlersProxy()
+        self.proxy._synchronous = True
+        self.proxy._synchronous_timeout = 30
+        self.proxy._request_handlers = self.request_handlers
+        self.proxy._status_store = self.status_store
+
+    async def test_handle_requests_async(self):
+        results = [concurrent.futures.Future(), concurrent.futures.Future()]
+        results[0].set_result({'request_uuid': 'u1'})
+        results[1].set_result({'request_uuid': 'u2'})
+        self.request_handlers.handle_requests_with_result.return_value = (
+            ['u1', 'u2'],
+            results,
+        )
+
+        statuses = await self.proxy.handle_requests_async([{}, {}], None)
+
+        self.assertEqual(statuses, [{'request_uuid': 'u1'}, {'request_uuid': 'u2'}])
+
+    async def test_handle_requests_async_timeout(self):
+        results = [concurrent.futures.Future(), concurrent.futures.Future()]
+        results[0].set_result({'request_uuid': 'u1'})
+        self.request_handlers.handle_requests_with_result.return_value = (
+            ['u1', 'u2'],
+            results,
+        )
+        self.status_store.get.side_effect = {'u1': {'request_uuid': 'u1'}}.get
+
+        statuses = await self.proxy.handle_requests_async([{}, {}], None, timeout=0.01)
+
+        self.assertEqual(statuses, [{'request_uuid': 'u1'}, {'request_uuid': 'u2'}])
+
+
+class TestRequestHandlersProxyRemoteRequests(unittest.TestCase):
+    def test_handle_remote_requests(self):
+        remote_requests = Mock()
+        remote_requests.get.side_effect = [
+            (sentinel.args1, sentinel.options1),
+            (sentinel.args2, sentinel.options2),
+            ExitTestException(),
+        ]
+        request_handlers = Mock()
+        request_handlers.handle_request.side_effect = [Exception(), 'uuid']
+        proxy = RequestHandlersProxy()
+        proxy._request_handlers = request_handlers
+
+        with self.assertRaises(ExitTestException):
+            proxy._handle_remote_requests(remote_requests)
+
+        request_handlers.handle_request.assert_has_calls(
+            [
+                call(sentinel.args1, sentinel.options1, idempotency_key=None),
+                call(sentinel.args2, sentinel.options2, idempotency_key=None),
+            ]
+        )
+
+
+class TestRequestHandlersProxyMetrics(unittest.TestCase):
+    def test_metrics(self):
+        executor = Mock()
+        proxy = RequestHandlersProxy()
+        proxy._request_queue = RequestQueue(DuplicateRequestOptimizer(executor))
+        for _ in range(2):
+            request = Request([])
+            request.commands = [Command('a', request, executor, 'a')]
+            proxy._request_queue.put(request)
+
+        metrics = proxy.metrics()
+
+        self.assertIn('wazo_sysconfd_request_queue_depth{lane="default"} 2\n', metrics)
+        self.assertIn('wazo_sysconfd_optimizable_commands_total 2\n', metrics)
+        self.assertIn('wazo_sysconfd_merged_commands_total 1\n', metrics)
+        self.assertIn('# TYPE wazo_sysconfd_request_wait_seconds histogram\n', metrics)
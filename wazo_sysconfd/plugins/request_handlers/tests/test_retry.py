@@ -0,0 +1,23 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+from unittest.mock import patch
+
+from wazo_sysconfd.plugins.request_handlers.retry import RetryBackoff
+
+
+class TestRetryBackoff(unittest.TestCase):
+    def test_delay_without_jitter(self):
+        backoff = RetryBackoff(initial_delay=0.5, max_delay=3, jitter=0)
+
+        delays = [backoff.delay(attempt) for attempt in range(1, 6)]
+
+        self.assertEqual(delays, [0.5, 1, 2, 3, 3])
+
+    @patch('random.uniform', return_value=0.25)
+    def test_delay_with_jitter(self, uniform):
+        backoff = RetryBackoff(initial_delay=1, max_delay=10, jitter=0.5)
+
+        self.assertEqual(backoff.delay(3), 3)
+        uniform.assert_called_once_with(0, 0.5)
@@ -0,0 +1,133 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import gc
+import unittest
+import weakref
+from unittest.mock import Mock
+
+from wazo_sysconfd.plugins.request_handlers.command import Command
+from wazo_sysconfd.plugins.request_handlers.request import (
+    DuplicateRequestOptimizer,
+    Request,
+)
+from wazo_sysconfd.plugins.request_handlers.status import RequestStatusStore
+
+
+class TestRequestStatusStore(unittest.TestCase):
+    def setUp(self):
+        self.executor = Mock()
+        self.store = RequestStatusStore(max_requests=10, ttl=60)
+
+    def _new_request(self, *values):
+        request = Request([])
+        for value in values:
+            request.commands.append(Command(value, request, self.executor, value))
+        self.store.add(request)
+        return request
+
+    def test_get_unknown(self):
+        self.assertIsNone(self.store.get('unknown'))
+
+    def test_queued(self):
+        request = self._new_request('dialplan reload')
+
+        status = self.store.get(request.uuid)
+
+        self.assertEqual(status['request_uuid'], request.uuid)
+        self.assertEqual(status['status'], 'queued')
+        self.assertIsNotNone(status['queued_at'])
+        self.assertEqual(
+            [(c['command'], c['status']) for c in status['commands']],
+            [('dialplan reload', 'queued')],
+        )
+
+    def test_completed(self):
+        request = self._new_request('dialplan reload', 'moh reload')
+
+        request.execute()
+
+        status = self.store.get(request.uuid)
+        self.assertEqual(status['status'], 'completed')
+        self.assertIsNotNone(status['started_at'])
+        self.assertIsNotNone(status['finished_at'])
+        for command_status in status['commands']:
+            self.assertEqual(command_status['status'], 'completed')
+            self.assertIsNotNone(command_status['started_at'])
+            self.assertIsNotNone(command_status['finished_at'])
+            self.assertGreaterEqual(command_status['duration'], 0)
+            self.assertFalse(command_status['deduplicated'])
+
+    def test_failed(self):
+        request = self._new_request('dialplan reload', 'moh reload')
+        self.executor.execute.side_effect = [Exception(), None]
+
+        request.execute()
+
+        status = self.store.get(request.uuid)
+        self.assertEqual(status['status'], 'failed')
+        self.assertEqual(
+            [c['status'] for c in status['commands']], ['failed', 'completed']
+        )
+
+    def test_optimized(self):
+        optimizer = DuplicateRequestOptimizer(self.executor)
+        request1 = self._new_request('dialplan reload')
+        request2 = self._new_request('dialplan reload')
+        optimizer.on_request_put(request1)
+        optimizer.on_request_put(request2)
+
+        status = self.store.get(request2.uuid)
+        self.assertEqual(status['status'], 'optimized')
+        self.assertEqual(status['commands'][0]['status'], 'optimized')
+        self.assertEqual(status['commands'][0]['merged_into'], 'dialplan reload')
+
+        request1.execute()
+
+        status = self.store.get(request2.uuid)
+        self.assertEqual(status['commands'][0]['status'], 'completed')
+        self.assertIsNotNone(status['commands'][0]['duration'])
+        self.assertTrue(status['commands'][0]['deduplicated'])
+
+    def test_get_returns_a_copy(self):
+        request = self._new_request('dialplan reload')
+
+        self.store.get(request.uuid)['status'] = 'completed'
+
+        self.assertEqual(self.store.get(request.uuid)['status'], 'queued')
+
+    def test_oldest_requests_are_evicted(self):
+        store = RequestStatusStore(max_requests=1, ttl=60)
+        request1, request2 = Request([]), Request([])
+
+        store.add(request1)
+        store.add(request2)
+
+        self.assertIsNone(store.get(request1.uuid))
+        self.assertIsNotNone(store.get(request2.uuid))
+
+    def test_commands_are_capped(self):
+        store = RequestStatusStore(max_requests=10, ttl=60, max_commands=2)
+        request = Request([])
+        request.commands = [
+            Command(f'sccp reset SEP{i}', request, self.executor, '') for i in range(5)
+        ]
+        store.add(request)
+
+        request.execute()
+
+        status = store.get(request.uuid)
+        self.assertEqual(len(status['commands']), 2)
+        self.assertEqual(status['omitted_commands'], 3)
+        self.assertEqual(status['status'], 'completed')
+
+    def test_completed_request_is_not_kept_alive(self):
+        request = self._new_request('dialplan reload')
+        request_ref = weakref.ref(request)
+        request.execute()
+
+        self.executor.reset_mock()  # the mock references its calls arguments
+        del request
+        gc.collect()
+
+        self.assertIsNone(request_ref())
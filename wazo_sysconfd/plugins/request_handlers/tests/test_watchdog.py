@@ -0,0 +1,92 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from wazo_sysconfd.plugins.request_handlers.metrics import COMMAND_TIMEOUTS
+from wazo_sysconfd.plugins.request_handlers.watchdog import CommandTimeout, Watchdog
+
+SLEEP = [sys.executable, '-c', 'import time; time.sleep(30)']
+# a child that ignores SIGTERM
+STUBBORN = [
+    sys.executable,
+    '-c',
+    'import signal, time\n'
+    'signal.signal(signal.SIGTERM, signal.SIG_IGN)\n'
+    'time.sleep(30)',
+]
+
+
+class TestWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.watchdog = Watchdog(
+            timeouts={'sleep': 0.2, 'stubborn': 1, 'echo': 0},
+            default_timeout=10,
+            kill_grace=0.2,
+        )
+
+    def test_deadline(self):
+        self.assertEqual(self.watchdog.deadline('sleep'), 0.2)
+        self.assertEqual(self.watchdog.deadline('dialplan reload'), 10)
+        self.assertIsNone(self.watchdog.deadline('echo'))
+
+    def test_run(self):
+        result = self.watchdog.run(
+            [sys.executable, '-c', 'print("ok")'],
+            'echo',
+            capture_output=True,
+            text=True,
+        )
+
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, 'ok\n')
+
+    def test_run_timeout_terminates_the_child(self):
+        timeouts = COMMAND_TIMEOUTS.value(command='sleep')
+
+        with self.assertRaises(CommandTimeout) as context:
+            self.watchdog.run(SLEEP, 'sleep')
+
+        self.assertEqual(context.exception.timeout, 0.2)
+        self.assertEqual(COMMAND_TIMEOUTS.value(command='sleep'), timeouts + 1)
+
+    def test_run_timeout_kills_the_child_ignoring_sigterm(self):
+        processes = []
+        popen = subprocess.Popen
+
+        def track(*args, **kwargs):
+            processes.append(popen(*args, **kwargs))
+            return processes[-1]
+
+        with patch('subprocess.Popen', side_effect=track):
+            with self.assertRaises(CommandTimeout):
+                self.watchdog.run(STUBBORN, 'stubborn', capture_output=True)
+
+        self.assertEqual(processes[0].returncode, -9)
+
+    def test_call(self):
+        returncode = self.watchdog.call(
+            [sys.executable, '-c', 'raise SystemExit(3)'], 'echo'
+        )
+
+        self.assertEqual(returncode, 3)
+
+
+class TestWatchdogAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.watchdog = Watchdog(timeouts={'sleep': 0.2}, kill_grace=0.2)
+
+    async def test_run_async(self):
+        returncode, stdout = await self.watchdog.run_async(
+            [sys.executable, '-c', 'print("ok")'], 'echo'
+        )
+
+        self.assertEqual(returncode, 0)
+        self.assertEqual(stdout, b'ok\n')
+
+    async def test_run_async_timeout(self):
+        with self.assertRaises(CommandTimeout):
+            await self.watchdog.run_async(SLEEP, 'sleep')
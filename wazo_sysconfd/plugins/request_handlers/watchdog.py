@@ -0,0 +1,107 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import subprocess
+
+from wazo_sysconfd.plugins.request_handlers.metrics import COMMAND_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+
+class CommandTimeout(Exception):
+    def __init__(self, name, timeout):
+        super().__init__(f'"{name}" did not finish within {timeout} seconds')
+        self.name = name
+        self.timeout = timeout
+
+
+class Watchdog:
+    """Runs the child processes of the commands within a deadline.
+
+    The deadline of a command is given by its name in ``timeouts``, otherwise
+    it is ``default_timeout`` seconds; 0 disables it. A child still running
+    at its deadline is terminated, then killed if it is still running
+    ``kill_grace`` seconds later, and ``CommandTimeout`` is raised.
+    """
+
+    def __init__(
+        self,
+        timeouts: dict | None = None,
+        default_timeout: float = 300,
+        kill_grace: float = 5,
+    ):
+        self._timeouts = timeouts or {}
+        self._default_timeout = default_timeout
+        self._kill_grace = kill_grace
+
+    @classmethod
+    def from_config(cls, config: dict) -> Watchdog:
+        return cls(
+            timeouts=config.get('timeouts'),
+            default_timeout=config.get('default_timeout', 300),
+            kill_grace=config.get('kill_grace', 5),
+        )
+
+    def deadline(self, name: str) -> float | None:
+        return self._timeouts.get(name, self._default_timeout) or None
+
+    def run(self, args, name: str, **kwargs) -> subprocess.CompletedProcess:
+        """Same as ``subprocess.run``, with the deadline of the command."""
+        if kwargs.pop('capture_output', False):
+            kwargs['stdout'] = kwargs['stderr'] = subprocess.PIPE
+        with subprocess.Popen(args, **kwargs) as process:
+            stdout, stderr = self._communicate(process, name)
+        return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+    def call(self, args, name: str, **kwargs) -> int:
+        """Same as ``subprocess.call``, with the deadline of the command."""
+        return self.run(args, name, **kwargs).returncode
+
+    async def run_async(self, args, name: str) -> tuple[int, bytes]:
+        """Run the command in the event loop, return its status and output."""
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        timeout = self.deadline(name)
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            self._on_timeout(name, timeout)
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), self._kill_grace)
+            except asyncio.TimeoutError:
+                logger.error('"%s" is still running, killing it', name)
+                process.kill()
+                await process.wait()
+            raise CommandTimeout(name, timeout)
+        return process.returncode, stdout
+
+    def _communicate(self, process, name):
+        timeout = self.deadline(name)
+        try:
+            return process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._on_timeout(name, timeout)
+            process.terminate()
+            try:
+                process.communicate(timeout=self._kill_grace)
+            except subprocess.TimeoutExpired:
+                logger.error('"%s" is still running, killing it', name)
+                process.kill()
+                # a grandchild may still hold the pipes, they are not read
+                process.wait()
+            raise CommandTimeout(name, timeout)
+
+    @staticmethod
+    def _on_timeout(name, timeout):
+        COMMAND_TIMEOUTS.inc(command=name)
+        logger.error(
+            '"%s" did not finish within %s seconds, terminating it', name, timeout
+        )